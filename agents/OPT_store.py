@@ -1,3 +1,6 @@
+import hmac
+
+
 class OTPStore:
     _store = {}
 
@@ -7,4 +10,12 @@ class OTPStore:
 
     @staticmethod
     def verify(email, code):
-        return OTPStore._store.get(email) == code
+        expected = OTPStore._store.get(email)
+        if expected is None or code is None:
+            return False
+        # Comparaison à temps constant, sur des octets (compare_digest refuse les str non ASCII)
+        if not hmac.compare_digest(expected.encode(), str(code).encode()):
+            return False
+        # Usage unique
+        OTPStore._store.pop(email, None)
+        return True
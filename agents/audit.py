@@ -0,0 +1,427 @@
+import atexit
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from .file_lock import file_lock
+from .log import get_logger
+
+logger = get_logger("audit")
+
+# Chemin absolu : partagé par le serveur d'auth (backendFlask/), l'API d'analyse et les consommateurs
+DEFAULT_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "audit")
+MANIFEST = "_manifest.jsonl"
+
+# Types d'enregistrements
+AUTH_EVENT = "auth_event"
+PREDICTION = "prediction"
+ACTION = "action"
+
+COLUMNS = ["ts", "kind", "source_ip", "did", "user_agent", "tier", "attack_probability", "action", "detail"]
+# Colonnes avec zone map (min/max) et filtre de Bloom dans le manifeste
+ZONE_COLUMNS = ["source_ip", "did"]
+BLOOM_BITS_PER_KEY = 10
+BLOOM_HASHES = 4
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("ts", pa.timestamp("ms")),
+        ("kind", pa.string()),
+        ("source_ip", pa.string()),
+        ("did", pa.string()),
+        ("user_agent", pa.string()),
+        ("tier", pa.string()),
+        ("attack_probability", pa.float64()),
+        ("action", pa.string()),
+        ("detail", pa.string()),
+    ])
+
+
+def _to_ms(value):
+    """Horodatage (str, datetime, epoch secondes) -> millisecondes epoch UTC"""
+    if value is None:
+        return int(time.time() * 1000)
+    if isinstance(value, (int, float)):
+        return int(value * 1000)
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+
+def _text(value):
+    """Valeur texte ou None (NaN pandas compris)"""
+    if value is None or value != value:
+        return None
+    return str(value)
+
+
+def _bloom_hashes(value):
+    digest = hashlib.blake2b(value.encode(), digest_size=4 * BLOOM_HASHES).digest()
+    return [int.from_bytes(digest[4 * i:4 * i + 4], "little") for i in range(BLOOM_HASHES)]
+
+
+def _bloom(values):
+    """
+    Filtre de Bloom (~1 % de faux positifs) des valeurs distinctes d'un fichier :
+    les zone maps min/max ne servent à rien pour une IP isolée, le Bloom si
+    """
+    values = [v for v in values if v is not None]
+    m = max(64, len(values) * BLOOM_BITS_PER_KEY)
+    bits = bytearray((m + 7) // 8)
+    for value in values:
+        for h in _bloom_hashes(value):
+            pos = h % m
+            bits[pos >> 3] |= 1 << (pos & 7)
+    return {"m": m, "bits": base64.b64encode(bytes(bits)).decode()}
+
+
+def _bloom_contains(bloom, hashes):
+    m, bits = bloom["m"], bloom["_bytes"]
+    return all(bits[(h % m) >> 3] & (1 << ((h % m) & 7)) for h in hashes)
+
+
+def _stored(entry):
+    """Entrée de manifeste telle qu'écrite sur disque (sans les filtres décodés)"""
+    return {
+        key: {k: v for k, v in value.items() if k != "_bytes"} if isinstance(value, dict) else value
+        for key, value in entry.items()
+    }
+
+
+class AuditLog:
+    """
+    Journal d'audit en colonnes, en ajout seul (événements d'auth, prédictions, actions) :
+    - tampon mémoire vidé tous les `flush_rows` enregistrements ou `flush_interval` secondes,
+      par un thread d'écriture dédié (aucune écriture Parquet sur le thread appelant)
+    - un fichier Parquet par vidage et par heure : <root>/date=AAAA-MM-JJ/hour=HH/part-<uuid>.parquet
+      (chaque processus écrit ses propres fichiers, écriture atomique)
+    - manifeste <root>/_manifest.jsonl : zone maps par fichier (min/max ts, IP, DID ; niveaux présents)
+    - query() élague les fichiers via le manifeste puis filtre dans Parquet (statistiques
+      des row groups) ; compact() fusionne les heures closes en un fichier trié par IP,
+      lancé par le thread d'écriture à chaque changement d'heure (+ `compact_delay` secondes)
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, flush_rows=5000, flush_interval=30.0, enabled=True,
+                 row_group_size=65_536, compact_delay=None):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self.row_group_size = row_group_size
+        # Délai après la fin d'une heure avant de la compacter (vidages tardifs des autres processus)
+        self.compact_delay = 2 * flush_interval if compact_delay is None else compact_delay
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._compacted_at = None
+        self._manifest_cache = None
+
+    @classmethod
+    def from_env(cls):
+        """AUDIT_LOG=0 désactive le journal (benchmarks, tests)"""
+        return cls(enabled=os.environ.get("AUDIT_LOG", "1") != "0")
+
+    # -------------------------------
+    # 📥 Écriture
+    # -------------------------------
+    def record(self, kind, source_ip=None, did=None, user_agent=None, tier=None,
+               attack_probability=None, action=None, ts=None, **detail):
+        """Ajoute un enregistrement ; les champs supplémentaires vont dans `detail` (JSON)"""
+        if not self.enabled:
+            return
+        self._append([{
+            "ts": _to_ms(ts),
+            "kind": kind,
+            "source_ip": _text(source_ip),
+            "did": _text(did),
+            "user_agent": _text(user_agent),
+            "tier": _text(tier),
+            "attack_probability": None if _text(attack_probability) is None else float(attack_probability),
+            "action": action,
+            "detail": json.dumps(detail, default=str) if detail else None,
+        }])
+
+    def record_predictions(self, df, tiers=None, ts=None):
+        """
+        Une ligne PREDICTION par ligne scorée (colonnes absentes -> null ; `tiers` prioritaire sur df) ;
+        `ts` : horodatage commun, ou un epoch en secondes par ligne
+        """
+        if not self.enabled or df.empty:
+            return
+        n = len(df)
+        if ts is not None and np.ndim(ts) == 1:
+            stamps = (np.asarray(ts, dtype=np.float64) * 1000).astype(np.int64).tolist()
+        else:
+            stamps = [_to_ms(ts)] * n
+
+        def column(name, cast=str):
+            if name not in df.columns:
+                return [None] * n
+            return [None if _text(v) is None else cast(v) for v in df[name].tolist()]
+
+        rows = [
+            {
+                "ts": stamp, "kind": PREDICTION, "source_ip": ip, "did": did, "user_agent": ua,
+                "tier": tier, "attack_probability": prob, "action": None, "detail": None,
+            }
+            for stamp, ip, did, ua, tier, prob in zip(
+                stamps, column("source_ip"), column("did"), column("user_agent"), column("tier") if tiers is None else tiers,
+                column("attack_probability", float),
+            )
+        ]
+        self._append(rows)
+
+    def _append(self, rows):
+        with self._lock:
+            self._buffer.extend(rows)
+            full = len(self._buffer) >= self.flush_rows
+            if self._flusher is None:
+                self._start_flusher()
+        if full:
+            # Vidage confié au thread d'écriture : pas de latence ajoutée à la requête
+            self._wake.set()
+
+    def _start_flusher(self):
+        self._flusher = threading.Thread(target=self._flush_loop, name="audit-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                self._maybe_compact()
+            except Exception as e:
+                logger.error("echec ecriture audit", extra={"fields": {"error": str(e)}})
+
+    def _maybe_compact(self, now=None):
+        """Compacte les heures closes une fois par heure, `compact_delay` secondes après le changement d'heure"""
+        now = time.time() if now is None else now
+        # Dernier changement d'heure dont le délai est écoulé (délai quelconque, même > 1 h)
+        due = (now - self.compact_delay) // 3600 * 3600 + self.compact_delay
+        if self._compacted_at == due:
+            return 0
+        self._compacted_at = due
+        return self.compact(older_than=self.compact_delay)
+
+    def flush(self):
+        """Écrit le tampon : un fichier Parquet par heure présente dans le tampon"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+
+        import pyarrow as pa
+
+        columns = {name: [row[name] for row in rows] for name in COLUMNS}
+        columns["ts"] = pa.array(columns["ts"], pa.int64()).cast(pa.timestamp("ms"))
+        table = pa.table(columns, schema=_schema())
+
+        # Un fichier par heure présente dans le tampon
+        hours = np.asarray(table["ts"].cast(pa.int64())) // 3_600_000
+        entries = []
+        for hour in np.unique(hours):
+            part = table.take(np.flatnonzero(hours == hour))
+            entries.append(self._write_file(part, pd.Timestamp(int(hour) * 3_600_000, unit="ms")))
+        self._append_manifest(entries)
+        return len(rows)
+
+    def _partition_dir(self, hour):
+        return os.path.join(self.root, f"date={hour:%Y-%m-%d}", f"hour={hour:%H}")
+
+    def _write_file(self, table, hour, sort=False):
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        if sort:
+            table = table.sort_by([("source_ip", "ascending"), ("ts", "ascending")])
+        directory = self._partition_dir(hour)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet")
+        pq.write_table(table, path + ".tmp", row_group_size=self.row_group_size)
+        os.replace(path + ".tmp", path)
+
+        entry = {
+            "path": os.path.relpath(path, self.root),
+            "hour": hour.isoformat(),
+            "rows": table.num_rows,
+            "ts_min": _to_ms(pc.min(table["ts"]).as_py()),
+            "ts_max": _to_ms(pc.max(table["ts"]).as_py()),
+            "tiers": sorted(t for t in pc.unique(table["tier"]).to_pylist() if t is not None),
+            "kinds": sorted(pc.unique(table["kind"]).to_pylist()),
+        }
+        for col in ZONE_COLUMNS:
+            bounds = pc.min_max(table[col]).as_py()
+            entry[f"{col}_min"], entry[f"{col}_max"] = bounds["min"], bounds["max"]
+            entry[f"{col}_bloom"] = _bloom(pc.unique(table[col]).to_pylist())
+        return entry
+
+    # -------------------------------
+    # 📒 Manifeste
+    # -------------------------------
+    def _manifest_lock(self):
+        return file_lock(os.path.join(self.root, MANIFEST + ".lock"))
+
+    def _append_manifest(self, entries):
+        with self._manifest_lock():
+            with open(os.path.join(self.root, MANIFEST), "a", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+
+    def manifest(self):
+        """Entrées du manifeste, relu uniquement s'il a changé (filtres de Bloom décodés)"""
+        path = os.path.join(self.root, MANIFEST)
+        if not os.path.exists(path):
+            return []
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        if self._manifest_cache is None or self._manifest_cache[0] != key:
+            with open(path, encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            for entry in entries:
+                for col in ZONE_COLUMNS:
+                    bloom = entry.get(f"{col}_bloom")
+                    if bloom is not None:
+                        bloom["_bytes"] = base64.b64decode(bloom["bits"])
+            self._manifest_cache = (key, entries)
+        return self._manifest_cache[1]
+
+    # -------------------------------
+    # 🔎 Requêtes
+    # -------------------------------
+    @staticmethod
+    def _may_contain(entry, col, value, hashes):
+        """Zone map min/max puis filtre de Bloom"""
+        if value is None:
+            return True
+        if entry[f"{col}_min"] is None or not entry[f"{col}_min"] <= value <= entry[f"{col}_max"]:
+            return False
+        bloom = entry.get(f"{col}_bloom")
+        return bloom is None or _bloom_contains(bloom, hashes)
+
+    def _prune(self, entries, ip, did, start_ms, end_ms, tier, kind):
+        """Fichiers dont les zone maps peuvent contenir des lignes correspondantes"""
+        lookups = [
+            (col, value, _bloom_hashes(value))
+            for col, value in (("source_ip", ip), ("did", did)) if value is not None
+        ]
+        kept = []
+        for e in entries:
+            if start_ms is not None and e["ts_max"] < start_ms:
+                continue
+            if end_ms is not None and e["ts_min"] >= end_ms:
+                continue
+            if not all(self._may_contain(e, col, value, hashes) for col, value, hashes in lookups):
+                continue
+            if tier is not None and tier not in e["tiers"]:
+                continue
+            if kind is not None and kind not in e["kinds"]:
+                continue
+            kept.append(e)
+        return kept
+
+    def query(self, ip=None, did=None, start=None, end=None, tier=None, kind=None, columns=None,
+              limit=None):
+        """
+        Enregistrements filtrés par IP, DID, intervalle [start, end[, niveau et type,
+        triés par date ; élagage par zone maps puis filtres poussés dans la lecture Parquet
+        """
+        import pyarrow.dataset as ds
+
+        start_ms = None if start is None else _to_ms(start)
+        end_ms = None if end is None else _to_ms(end)
+
+        for attempt in range(2):
+            entries = self._prune(self.manifest(), ip, did, start_ms, end_ms, tier, kind)
+            if not entries:
+                return pd.DataFrame(columns=columns or COLUMNS)
+
+            conditions = [ds.field(col) == value
+                          for col, value in (("source_ip", ip), ("did", did), ("tier", tier), ("kind", kind))
+                          if value is not None]
+            if start_ms is not None:
+                conditions.append(ds.field("ts") >= pd.Timestamp(start_ms, unit="ms"))
+            if end_ms is not None:
+                conditions.append(ds.field("ts") < pd.Timestamp(end_ms, unit="ms"))
+            expr = None
+            for condition in conditions:
+                expr = condition if expr is None else expr & condition
+
+            try:
+                dataset = ds.dataset(
+                    [os.path.join(self.root, e["path"]) for e in entries], format="parquet", schema=_schema()
+                )
+                table = dataset.to_table(filter=expr, columns=columns)
+                break
+            except FileNotFoundError:
+                # Compaction concurrente : relire le manifeste une fois
+                if attempt:
+                    raise
+
+        df = table.to_pandas()
+        if "ts" in df.columns:
+            df = df.sort_values("ts", kind="stable")
+        if limit is not None:
+            df = df.head(limit)
+        return df.reset_index(drop=True)
+
+    # -------------------------------
+    # 🗜️ Compaction
+    # -------------------------------
+    def compact(self, older_than=3600):
+        """
+        Fusionne, pour chaque heure close depuis `older_than` secondes, les petits fichiers
+        en un seul fichier trié par IP (zone maps plus sélectives) ; retourne le nombre d'heures compactées
+        """
+        import pyarrow.dataset as ds
+
+        cutoff = _to_ms(time.time() - older_than)
+        compacted = 0
+        with self._manifest_lock():
+            entries = self.manifest()
+            by_hour = {}
+            for e in entries:
+                by_hour.setdefault(e["hour"], []).append(e)
+
+            kept, removed = [], []
+            for hour, group in sorted(by_hour.items()):
+                closed = _to_ms(hour) + 3_600_000 <= cutoff
+                if not closed or len(group) < 2:
+                    kept.extend(group)
+                    continue
+                # Schéma explicite : pas de colonnes date/hour déduites des chemins (partitionnement hive)
+                table = ds.dataset(
+                    [os.path.join(self.root, e["path"]) for e in group], format="parquet", schema=_schema()
+                ).to_table()
+                kept.append(self._write_file(table, pd.Timestamp(hour), sort=True))
+                removed.extend(group)
+                compacted += 1
+
+            if removed:
+                path = os.path.join(self.root, MANIFEST)
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    for entry in kept:
+                        f.write(json.dumps(_stored(entry)) + "\n")
+                os.replace(path + ".tmp", path)
+                for e in removed:
+                    os.remove(os.path.join(self.root, e["path"]))
+
+        if compacted:
+            logger.info("audit compacte", extra={"fields": {"hours": compacted, "files_removed": len(removed)}})
+        return compacted
+
+
+# Journal partagé par le processus
+AUDIT = AuditLog.from_env()
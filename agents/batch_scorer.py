@@ -0,0 +1,237 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import pandas as pd
+
+from .campaign import CampaignCorrelator, CAMPAIGN_FEATURES
+from .collector import DataCollector
+from .detector_XGBoost import DetectorXGB
+from .detector_isolationforest import DetectorIF
+
+INPUT_EXTENSIONS = (".csv", ".parquet", ".xlsx")
+
+# Colonnes brutes recopiées telles quelles à côté des prédictions
+PASSTHROUGH = ["id", "timestamp", "source_ip", "user_agent", "did", "device_id", "geo", "is_attack"]
+
+CHECKPOINT_FILE = "_checkpoint.json"
+
+# Etat propre à chaque processus du pool (modèles chargés une seule fois)
+_worker = {}
+
+
+def _init_worker(config):
+    collector = DataCollector(input_path=None, scaler_path=config["scaler_path"],
+                              model_path=config["xgb_model_path"])
+    # Re-scoring en masse : pas d'explications par ligne
+    xgb = DetectorXGB(model_path=config["xgb_model_path"], explain=None)
+    # Un thread par processus : le parallélisme vient du pool
+    xgb.load_model().set_params(n_jobs=1)
+
+    detector_if = None
+    if config.get("if_model_path"):
+        detector_if = DetectorIF(model_path=config["if_model_path"])
+        detector_if.load_model().n_jobs = 1
+
+    _worker.update(collector=collector, xgb=xgb, detector_if=detector_if)
+
+
+def _score_chunk(chunk, columns, out_path):
+    """Prétraite et score un bloc, puis l'écrit en Parquet (écriture atomique)"""
+    features = _worker["collector"].preprocess_batch(chunk, columns=columns)
+
+    out = chunk.loc[features.index, [c for c in PASSTHROUGH if c in chunk.columns]].copy()
+    scored = _worker["xgb"].predict_df(features)
+    # Probabilité brute et niveau du Reactor présents si le modèle a une table de calibration
+    for col in ["attack_probability", "raw_probability", "tier", "is_attack_pred"]:
+        if col in scored.columns:
+            out[col] = scored[col]
+
+    if _worker["detector_if"] is not None:
+        anomalies = _worker["detector_if"].predict_df(features)
+        out["anomaly_score"] = anomalies["anomaly_score"]
+        out["is_anomaly"] = anomalies["is_attack_pred"]
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    out.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, out_path)
+    return len(chunk)
+
+
+class BatchScorer:
+    """
+    Re-scoring hors ligne de l'historique :
+    - lecture en flux par blocs (CSV, Parquet, Excel ; fichier ou répertoire partitionné)
+    - inférence DetectorXGB (+ DetectorIF optionnel) dans un pool de processus
+    - sortie Parquet partitionnée comme l'entrée : <sortie>/<partition>/part-00000.parquet
+    - checkpoint après chaque bloc pour reprendre après un crash (même taille de bloc exigée :
+      les clés part-NNNNN désignent des plages de lignes)
+    - features de campagne rejouées bloc par bloc dans l'ordre du fichier, l'état du
+      corrélateur conservé d'un bloc au suivant (comme à l'entraînement), si le modèle les utilise
+    """
+
+    def __init__(self, input_path, output_dir, xgb_model_path="models/xgboost_model.pkl",
+                 if_model_path=None, scaler_path="models/scaler.pkl",
+                 processed_file="data/processed/processed_data.csv",
+                 chunk_size=100_000, workers=None):
+        self.input_path = input_path
+        self.output_dir = output_dir
+        self.processed_file = processed_file
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+        self.config = {
+            "xgb_model_path": xgb_model_path,
+            "if_model_path": if_model_path,
+            "scaler_path": scaler_path,
+        }
+        self.checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+
+    # -------------------------------
+    # 📂 Lecture en flux
+    # -------------------------------
+    def _input_files(self):
+        """(partition relative, chemin) pour chaque fichier d'entrée, en ordre stable"""
+        if os.path.isfile(self.input_path):
+            stem = os.path.splitext(os.path.basename(self.input_path))[0]
+            yield stem, self.input_path
+            return
+
+        for root, dirs, files in os.walk(self.input_path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(INPUT_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    rel = os.path.splitext(os.path.relpath(path, self.input_path))[0]
+                    yield rel, path
+
+    def _read_chunks(self, path):
+        if path.endswith(".csv"):
+            yield from pd.read_csv(path, chunksize=self.chunk_size)
+        elif path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=self.chunk_size):
+                yield batch.to_pandas()
+        else:
+            df = pd.read_excel(path, engine="openpyxl")
+            for start in range(0, len(df), self.chunk_size):
+                yield df.iloc[start:start + self.chunk_size]
+
+    def _tasks(self, with_campaigns=False):
+        for rel, path in self._input_files():
+            # Un corrélateur par fichier ; les blocs déjà traités (reprise) sont rejoués aussi
+            correlator = CampaignCorrelator() if with_campaigns else None
+            for i, chunk in enumerate(self._read_chunks(path)):
+                key = f"{rel}/part-{i:05d}"
+                if correlator is not None:
+                    if "source_ip" in chunk.columns and "timestamp" in chunk.columns:
+                        chunk = chunk.copy()
+                        chunk[CAMPAIGN_FEATURES] = correlator.replay_frame(chunk).to_numpy()
+                    else:
+                        print(f"[WARN] {path} : pas de source_ip/timestamp, features de campagne à zéro "
+                              f"(hors distribution d'entraînement)")
+                        correlator = None
+                yield key, chunk
+
+    # -------------------------------
+    # 💾 Checkpoint
+    # -------------------------------
+    def _read_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path) as f:
+            return json.load(f)
+
+    def _load_checkpoint(self):
+        """Blocs déjà traités ; refuse une reprise avec une autre taille de bloc"""
+        checkpoint = self._read_checkpoint()
+        if checkpoint is None:
+            return set()
+        if checkpoint.get("chunk_size") != self.chunk_size:
+            raise ValueError(
+                f"Checkpoint écrit avec chunk_size={checkpoint.get('chunk_size')}, reprise demandée avec "
+                f"{self.chunk_size} : relancez avec la même taille de bloc, ou sans reprise (--no-resume)."
+            )
+        return set(checkpoint["done"])
+
+    def _clear_previous_run(self):
+        """Sans reprise : supprime les blocs du checkpoint précédent (ils pourraient ne pas être réécrits)"""
+        checkpoint = self._read_checkpoint()
+        if checkpoint is None:
+            return
+        for key in checkpoint["done"]:
+            path = os.path.join(self.output_dir, key + ".parquet")
+            if os.path.exists(path):
+                os.remove(path)
+        os.remove(self.checkpoint_path)
+
+    def _save_checkpoint(self, done):
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"chunk_size": self.chunk_size, "done": sorted(done)}, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    # -------------------------------
+    # 🚀 Exécution
+    # -------------------------------
+    def run(self, resume=True):
+        """Re-score toute l'entrée ; retourne un résumé (lignes, durée, débit)"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        if not resume:
+            self._clear_previous_run()
+        done = self._load_checkpoint()
+        if done:
+            print(f"[INFO] Reprise : {len(done)} blocs déjà traités")
+
+        columns = None
+        if os.path.exists(self.processed_file):
+            columns = list(pd.read_csv(self.processed_file, nrows=0).columns)
+
+        rows_done = 0
+        skipped = 0
+        start = time.perf_counter()
+        max_in_flight = 2 * self.workers
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.config,)) as pool:
+            pending = {}
+
+            def drain(return_when):
+                nonlocal rows_done
+                finished, _ = wait(pending, return_when=return_when)
+                for future in finished:
+                    key = pending.pop(future)
+                    rows_done += future.result()
+                    done.add(key)
+                    self._save_checkpoint(done)
+                    elapsed = time.perf_counter() - start
+                    print(f"[INFO] {key} : {rows_done} lignes en {elapsed:.1f}s "
+                          f"({rows_done / elapsed:,.0f} lignes/s)")
+
+            # Rejeu des campagnes seulement si le modèle a été entraîné avec
+            with_campaigns = columns is not None and set(CAMPAIGN_FEATURES) <= set(columns)
+            for key, chunk in self._tasks(with_campaigns):
+                if key in done:
+                    skipped += len(chunk)
+                    continue
+                out_path = os.path.join(self.output_dir, key + ".parquet")
+                pending[pool.submit(_score_chunk, chunk, columns, out_path)] = key
+                # Contre-pression : borne le nombre de blocs en mémoire
+                if len(pending) >= max_in_flight:
+                    drain(FIRST_COMPLETED)
+
+            while pending:
+                drain(FIRST_COMPLETED)
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            "rows": rows_done,
+            "skipped_rows": skipped,
+            "seconds": round(elapsed, 2),
+            "rows_per_s": round(rows_done / elapsed, 1) if elapsed else None,
+            "output_dir": self.output_dir,
+        }
+        print(f"[OK] Re-scoring terminé : {summary}")
+        return summary
@@ -0,0 +1,24 @@
+import os
+import joblib
+
+
+def sidecar_path(model_path, name):
+    """Chemin d'un artefact rangé à côté du modèle (ex: models/xgboost_model.baseline.pkl)"""
+    root, _ = os.path.splitext(model_path)
+    return f"{root}.{name}.pkl"
+
+
+def save_sidecar(model_path, name, obj):
+    """Sauvegarde un artefact associé au modèle (baseline, calibration, ...)"""
+    path = sidecar_path(model_path, name)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    joblib.dump(obj, path)
+    return path
+
+
+def load_sidecar(model_path, name, default=None):
+    """Charge un artefact associé au modèle, ou `default` s'il n'existe pas"""
+    path = sidecar_path(model_path, name)
+    if not os.path.exists(path):
+        return default
+    return joblib.load(path)
@@ -0,0 +1,93 @@
+import numpy as np
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+
+from .bundle import save_sidecar, load_sidecar
+
+# Codes de niveau (index dans TIERS) utilisés par le Reactor
+TIERS = np.array(["normal", "mfa", "critique"])
+
+# Seuils fixes des niveaux (probabilité brute), quand le modèle n'a pas de table de calibration
+CRITICAL_THRESHOLD = 0.75
+MFA_THRESHOLD = 0.4
+
+# Taux de faux positifs visés sur le hold-out pour chaque niveau
+DEFAULT_TARGET_FPR = {"mfa": 0.05, "critique": 0.01}
+
+# Seuils minimaux (probabilité brute) : quand presque tous les négatifs du hold-out
+# arrondissent à 0 sur la grille, le quantile tombe à 0 et tout score non nul serait
+# critique ; "critique" (= attaque prédite) ne descend pas sous la frontière du modèle
+MIN_THRESHOLDS = {"mfa": 0.1, "critique": 0.5}
+
+MIN_POSITIVES = 10
+
+
+def _logit(p, eps=1e-6):
+    p = np.clip(p, eps, 1 - eps)
+    return np.log(p / (1 - p))
+
+
+class CalibrationTable:
+    """
+    Table de calibration précalculée, sauvegardée avec le modèle :
+    - `calibrated[i]` : probabilité calibrée pour une probabilité brute i / (grid_size - 1)
+    - `tier_codes[i]` : niveau (index dans TIERS) pour ce même point de la grille
+    - `thresholds` : seuils des niveaux exprimés en probabilité brute
+    Au scoring : un seul predict_proba puis une indexation vectorisée donne les deux.
+    """
+
+    def __init__(self, calibrated, tier_codes, thresholds, method, fpr=None):
+        self.calibrated = np.asarray(calibrated, dtype=np.float32)
+        self.tier_codes = np.asarray(tier_codes, dtype=np.int8)
+        self.grid_size = len(self.calibrated)
+        self.thresholds = thresholds
+        self.method = method
+        self.fpr = fpr or {}
+
+    @classmethod
+    def fit(cls, raw_proba, y, method="isotonic", target_fpr=None, grid_size=1001):
+        """Ajuste la calibration (isotonic ou platt) et les seuils sur un jeu hold-out"""
+        raw_proba = np.asarray(raw_proba, dtype=float)
+        y = np.asarray(y).astype(int)
+        if y.sum() < MIN_POSITIVES or (1 - y).sum() < MIN_POSITIVES:
+            raise ValueError("Hold-out trop petit pour calibrer (pas assez d'exemples par classe).")
+
+        grid = np.linspace(0, 1, grid_size)
+        if method == "isotonic":
+            iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip").fit(raw_proba, y)
+            calibrated = iso.predict(grid)
+        elif method == "platt":
+            lr = LogisticRegression().fit(_logit(raw_proba).reshape(-1, 1), y)
+            calibrated = lr.predict_proba(_logit(grid).reshape(-1, 1))[:, 1]
+        else:
+            raise ValueError(f"Méthode de calibration inconnue : {method}")
+
+        # Points de fonctionnement, en probabilité brute (plus fine que la calibration isotonique,
+        # constante par paliers) : seuil t tel que FPR(p > t) <= cible sur les négatifs du hold-out
+        target_fpr = target_fpr or DEFAULT_TARGET_FPR
+        holdout = grid[np.rint(raw_proba * (grid_size - 1)).astype(int)]
+        negatives = holdout[y == 0]
+        thresholds = {
+            tier: max(float(np.quantile(negatives, 1 - fpr, method="higher")), MIN_THRESHOLDS.get(tier, 0.0))
+            for tier, fpr in target_fpr.items()
+        }
+        thresholds["critique"] = max(thresholds["critique"], thresholds["mfa"])
+
+        tier_codes = np.searchsorted([thresholds["mfa"], thresholds["critique"]], grid, side="left")
+        achieved = {
+            tier: round(float((negatives > t).mean()), 4) for tier, t in thresholds.items()
+        }
+        return cls(calibrated, tier_codes, thresholds, method, fpr=achieved)
+
+    def lookup(self, raw_proba):
+        """(probabilités calibrées, codes de niveau) pour un vecteur de probabilités brutes"""
+        idx = np.rint(np.asarray(raw_proba, dtype=float) * (self.grid_size - 1)).astype(np.intp)
+        np.clip(idx, 0, self.grid_size - 1, out=idx)
+        return self.calibrated[idx], self.tier_codes[idx]
+
+    def save(self, model_path):
+        return save_sidecar(model_path, "calibration", self)
+
+    @staticmethod
+    def load(model_path):
+        return load_sidecar(model_path, "calibration")
@@ -0,0 +1,420 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Features par composante ajoutées à chaque événement (préfixe commun pour le modèle).
+# Uniquement structurelles : le taux d'attaque d'une composante (issues prédites en service,
+# labels à l'entraînement) créerait un biais entraînement/service et une boucle auto-renforcée ;
+# il reste disponible pour les alertes (describe, top).
+CAMPAIGN_FEATURES = ["campaign_ips", "campaign_dids", "campaign_uas", "campaign_events"]
+
+# Chemin absolu : journal partagé par tous les consommateurs (CAMPAIGN_STORE_PATH pour un autre)
+DEFAULT_PATH = os.environ.get("CAMPAIGN_STORE_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "campaign", "campaign.db"
+)
+
+# Types de nœuds du graphe
+IP, DID, UA = 0, 1, 2
+
+# Colonne identifiant le compte visé : DID (API d'auth), sinon device_id (dataset historique)
+ACCOUNT_COLUMNS = ("did", "device_id")
+
+
+def ua_family(user_agent):
+    """'python-requests/2.25.1' -> 'python-requests' (famille, sans version)"""
+    if not isinstance(user_agent, str) or not user_agent:
+        return None
+    return user_agent.split("/", 1)[0].split(" ", 1)[0].strip().lower() or None
+
+
+def _account_column(df):
+    return next((c for c in ACCOUNT_COLUMNS if c in df.columns), None)
+
+
+class UnionFind:
+    """
+    Union-find sur des identifiants entiers compacts (union par taille, compression de chemin),
+    avec statistiques agrégées par racine : [ips, dids, uas, événements, attaques]
+    """
+
+    def __init__(self):
+        self.parent = []
+        self.size = []
+        self.stats = []
+
+    def add(self, kind):
+        node = len(self.parent)
+        self.parent.append(node)
+        self.size.append(1)
+        stats = [0, 0, 0, 0, 0]
+        stats[kind] = 1
+        self.stats.append(stats)
+        return node
+
+    def find(self, node):
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        self.stats[a] = [x + y for x, y in zip(self.stats[a], self.stats[b])]
+        return a
+
+
+class CampaignStore:
+    """
+    Journal partagé des observations du corrélateur (SQLite, mode WAL) :
+    chaque processus y écrit ses arêtes (link) et issues (record), puis rejoue
+    toutes les lignes nouvelles, les siennes comme celles des autres consommateurs :
+    tous les processus voient le même graphe de campagnes
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS observations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                ip TEXT NOT NULL,
+                did TEXT,
+                ua TEXT,
+                attack INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_observations_ts ON observations(ts);
+        """)
+
+    def _conn(self):
+        """Une connexion par thread (sqlite3 n'est pas partageable entre threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, ts, rows, attacks=None):
+        """Ajoute des lignes (ip, did, ua) ; attack NULL pour une arête, 0/1 pour une issue"""
+        attacks = [None] * len(rows) if attacks is None else [int(bool(a)) for a in attacks]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO observations (ts, ip, did, ua, attack) VALUES (?, ?, ?, ?, ?)",
+                [(ts, ip, did, ua, attack) for (ip, did, ua), attack in zip(rows, attacks)],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def since(self, last_id, min_ts=0.0):
+        """Lignes d'identifiant > last_id (et ts >= min_ts), dans l'ordre d'écriture"""
+        return self._conn().execute(
+            "SELECT id, ts, ip, did, ua, attack FROM observations WHERE id > ? AND ts >= ? ORDER BY id",
+            (last_id, min_ts),
+        ).fetchall()
+
+    def prune(self, before):
+        """Supprime les lignes sorties de la fenêtre de tous les corrélateurs"""
+        self._conn().execute("DELETE FROM observations WHERE ts < ?", (before,))
+
+
+class CampaignCorrelator:
+    """
+    Corrélation de campagnes sur une fenêtre glissante :
+    - graphe IP <-> DID <-> famille d'UA, composantes connexes par union-find
+    - nœuds internés en entiers compacts ; arêtes rangées par tranches de `bucket` secondes
+    - à l'expiration d'une tranche, le graphe est reconstruit sur la fenêtre restante
+      (union-find ne sait pas retirer d'arête ; coût amorti sur une tranche)
+    - une famille d'UA vue depuis plus de `max_hub_degree` IPs est un hub (navigateur
+      courant...) : elle ne relie plus les composantes
+    - features par événement : tailles de sa composante et nombre d'événements déjà
+      enregistrés (record) dans cette composante
+    - avec un CampaignStore, le graphe est construit depuis le journal partagé :
+      une campagne répartie sur plusieurs consommateurs reste une seule composante
+    """
+
+    def __init__(self, window=900.0, bucket=60.0, max_hub_degree=500, clock=time.time, store=None):
+        self.window = window
+        self.bucket = bucket
+        self.max_hub_degree = max_hub_degree
+        self.clock = clock
+        self.store = store
+        self._cursor = 0
+        self._last_prune = None
+        # Tranches : [début, arêtes [(ip, did, ua)], issues [(ip, attaque)]]
+        self._buckets = deque()
+        self._hubs = set()
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._ids = {}
+        self._keys = []
+        self._uf = UnionFind()
+        self._ua_ips = {}
+
+    # -------------------------------
+    # 🧩 Graphe
+    # -------------------------------
+    def _node(self, kind, value):
+        key = (kind, value)
+        node = self._ids.get(key)
+        if node is None:
+            node = self._ids[key] = self._uf.add(kind)
+            self._keys.append(key)
+        return node
+
+    def _add_edges(self, ip, did, ua):
+        """Relie l'IP à son DID et à sa famille d'UA ; retourne True si un nouveau hub apparaît"""
+        ip_node = self._node(IP, ip)
+        if did is not None:
+            self._uf.union(ip_node, self._node(DID, did))
+        if ua is None or ua in self._hubs:
+            return False
+        ua_node = self._node(UA, ua)
+        ips = self._ua_ips.setdefault(ua_node, set())
+        ips.add(ip_node)
+        if len(ips) > self.max_hub_degree:
+            self._hubs.add(ua)
+            return True
+        self._uf.union(ip_node, ua_node)
+        return False
+
+    def _record(self, ip, attack):
+        root = self._uf.find(self._node(IP, ip))
+        self._uf.stats[root][3] += 1
+        self._uf.stats[root][4] += int(attack)
+
+    def _rebuild(self):
+        """Reconstruit le graphe à partir des tranches encore dans la fenêtre"""
+        self._reset()
+        # Hubs recalculés sur la fenêtre restante
+        ua_ips = {}
+        for _, edges, _ in self._buckets:
+            for ip, _, ua in edges:
+                if ua is not None:
+                    ua_ips.setdefault(ua, set()).add(ip)
+        self._hubs = {ua for ua, ips in ua_ips.items() if len(ips) > self.max_hub_degree}
+
+        for _, edges, _ in self._buckets:
+            for ip, did, ua in edges:
+                self._add_edges(ip, did, ua)
+        for _, _, outcomes in self._buckets:
+            for ip, attack in outcomes:
+                self._record(ip, attack)
+
+    def _advance(self, now):
+        """Ouvre une nouvelle tranche si besoin et expire celles sorties de la fenêtre"""
+        if not self._buckets or now >= self._buckets[-1][0] + self.bucket:
+            self._buckets.append([now, [], []])
+        expired = False
+        while self._buckets and self._buckets[0][0] + self.bucket <= now - self.window:
+            self._buckets.popleft()
+            expired = True
+        if expired:
+            self._rebuild()
+        return self._buckets[-1]
+
+    @staticmethod
+    def _rows(df):
+        account = _account_column(df)
+        ips = df["source_ip"].astype(str).tolist()
+        dids = df[account].tolist() if account else [None] * len(df)
+        uas = [ua_family(ua) for ua in df["user_agent"]] if "user_agent" in df.columns else [None] * len(df)
+        return [
+            (ip, None if did is None or did != did else str(did), ua)
+            for ip, did, ua in zip(ips, dids, uas)
+        ]
+
+    def _features(self, ip):
+        ips, dids, uas, events, _ = self._uf.stats[self._uf.find(self._node(IP, ip))]
+        return [ips, dids, uas, events]
+
+    def _sync(self, now):
+        """Rejoue les lignes du journal partagé écrites depuis la dernière synchronisation"""
+        rows = self.store.since(self._cursor, now - self.window - self.bucket)
+        new_hub = False
+        for row_id, ts, ip, did, ua, attack in rows:
+            bucket = self._advance(ts)
+            if attack is None:
+                bucket[1].append((ip, did, ua))
+                new_hub |= self._add_edges(ip, did, ua)
+            else:
+                if (IP, ip) not in self._ids:
+                    bucket[1].append((ip, did, ua))
+                    self._add_edges(ip, did, ua)
+                bucket[2].append((ip, bool(attack)))
+                self._record(ip, attack)
+            self._cursor = row_id
+        self._advance(now)
+        if new_hub:
+            self._rebuild()
+
+        if self._last_prune is None or now - self._last_prune > self.window:
+            self.store.prune(now - self.window - self.bucket)
+            self._last_prune = now
+
+    def sync(self):
+        """Intègre les observations des autres processus (sans effet sans journal partagé)"""
+        if self.store is None:
+            return
+        with self._lock:
+            self._sync(self.clock())
+
+    # -------------------------------
+    # 📥 API
+    # -------------------------------
+    def link(self, df, now=None):
+        """
+        Ajoute les arêtes des événements bruts (source_ip, did/device_id, user_agent)
+        et retourne leurs features de campagne (DataFrame aligné sur df)
+        """
+        if "source_ip" not in df.columns or df.empty:
+            return pd.DataFrame(0.0, index=df.index, columns=CAMPAIGN_FEATURES)
+
+        rows = self._rows(df)
+        with self._lock:
+            now = self.clock() if now is None else now
+            if self.store is not None:
+                self.store.append(now, rows)
+                self._sync(now)
+            else:
+                edges = self._advance(now)[1]
+                new_hub = False
+                for row in rows:
+                    edges.append(row)
+                    new_hub |= self._add_edges(*row)
+                if new_hub:
+                    self._rebuild()
+            features = [self._features(ip) for ip, _, _ in rows]
+        return pd.DataFrame(features, index=df.index, columns=CAMPAIGN_FEATURES, dtype=np.float64)
+
+    def record(self, df, flags, now=None):
+        """Enregistre l'issue (attaque ou non) des événements : alimente le taux d'attaque"""
+        if "source_ip" not in df.columns or df.empty:
+            return
+        rows = self._rows(df)
+        with self._lock:
+            now = self.clock() if now is None else now
+            if self.store is not None:
+                self.store.append(now, rows, attacks=flags)
+                self._sync(now)
+                return
+            bucket = self._advance(now)
+            for (ip, did, ua), flag in zip(rows, flags):
+                if (IP, ip) not in self._ids:
+                    bucket[1].append((ip, did, ua))
+                    self._add_edges(ip, did, ua)
+                bucket[2].append((ip, bool(flag)))
+                self._record(ip, flag)
+
+    def replay_frame(self, df, time_column="timestamp"):
+        """
+        Features de campagne pour un historique, rejoué dans l'ordre chronologique sur l'état
+        courant : chaque événement enregistré après son propre calcul (comme en service : link
+        au prétraitement, record après le scoring). Appelé bloc par bloc, fenêtre et graphe
+        sont conservés d'un bloc au suivant (mémoire bornée par la fenêtre)
+        """
+        times = pd.to_datetime(df[time_column], errors="coerce")
+        first = times.min()
+        if pd.isna(first):
+            seconds = np.zeros(len(df))
+        else:
+            # Horodatages invalides : placés au début du bloc
+            seconds = ((times - first).dt.total_seconds().fillna(0) + first.timestamp()).to_numpy()
+
+        features = np.zeros((len(df), len(CAMPAIGN_FEATURES)))
+        rows = self._rows(df)
+        with self._lock:
+            for i in np.argsort(seconds, kind="stable"):
+                bucket = self._advance(seconds[i])
+                bucket[1].append(rows[i])
+                if self._add_edges(*rows[i]):
+                    self._rebuild()
+                features[i] = self._features(rows[i][0])
+                bucket[2].append((rows[i][0], False))
+                self._record(rows[i][0], False)
+        return pd.DataFrame(features, index=df.index, columns=CAMPAIGN_FEATURES)
+
+    @classmethod
+    def replay(cls, df, time_column="timestamp", **kwargs):
+        """Features de campagne d'un historique complet (entraînement), sur un corrélateur neuf"""
+        return cls(**kwargs).replay_frame(df, time_column)
+
+    # -------------------------------
+    # 📊 Campagnes
+    # -------------------------------
+    def campaign_of(self, ip):
+        """Identifiant de la campagne d'une IP (clé du nœud racine), ou None"""
+        with self._lock:
+            node = self._ids.get((IP, ip))
+            return None if node is None else self._keys[self._uf.find(node)]
+
+    def same_campaign(self, key, other):
+        """Deux clés de nœuds appartiennent-elles (encore) à la même composante ?"""
+        with self._lock:
+            a, b = self._ids.get(key), self._ids.get(other)
+            return a is not None and b is not None and self._uf.find(a) == self._uf.find(b)
+
+    def describe(self, key, sample=5):
+        """Résumé d'une campagne : tailles, taux d'attaque, échantillon d'IPs/DIDs/UAs"""
+        with self._lock:
+            node = self._ids.get(key)
+            if node is None:
+                return None
+            root = self._uf.find(node)
+            ips, dids, uas, events, attacks = self._uf.stats[root]
+            members = {IP: [], DID: [], UA: []}
+            for other, (kind, value) in enumerate(self._keys):
+                if len(members[kind]) < sample and self._uf.find(other) == root:
+                    members[kind].append(value)
+        return {
+            "ips": ips,
+            "dids": dids,
+            "user_agents": uas,
+            "events": events,
+            "attacks": attacks,
+            "attack_rate": round(attacks / events, 4) if events else 0.0,
+            "sample_ips": members[IP],
+            "sample_dids": members[DID],
+            "sample_user_agents": members[UA],
+        }
+
+    def top(self, n=10, min_events=10):
+        """Campagnes actives les plus offensives (par nombre d'attaques prédites enregistrées)"""
+        self.sync()
+        with self._lock:
+            roots = [
+                node for node in range(len(self._uf.parent))
+                if self._uf.parent[node] == node and self._uf.stats[node][3] >= min_events
+            ]
+            roots.sort(key=lambda r: self._uf.stats[r][4], reverse=True)
+            keys = [self._keys[r] for r in roots[:n]]
+        return [self.describe(key) for key in keys]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "nodes": len(self._keys),
+                "buckets": len(self._buckets),
+                "hub_user_agents": sorted(self._hubs),
+            }
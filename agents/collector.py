@@ -1,18 +1,33 @@
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
 import matplotlib.pyplot as plt
 import os
-import joblib
+
+from .bundle import sidecar_path
+from .campaign import CampaignCorrelator, CAMPAIGN_FEATURES
+from .file_lock import file_lock
+from .log import get_logger
+from .scaler import StreamingScaler, SCALED_COLUMNS
+
+logger = get_logger("collector")
 
 class DataCollector:
-    def __init__(self, input_path, output_dir="data/processed", scaler_path="models/scaler.pkl"):
+    def __init__(self, input_path, output_dir="data/processed", scaler_path="models/scaler.pkl",
+                 model_path=None, campaign=None):
         self.input_path = input_path
         self.output_dir = os.path.abspath(output_dir)
-        self.scaler = StandardScaler()
         self.scaler_path = scaler_path
+        # Modèle dont le scaler figé (sidecar) sert au prétraitement des données à scorer
+        self.model_path = model_path
+        # CampaignCorrelator optionnel : features de campagne (IP <-> DID <-> UA) par événement
+        self.campaign = campaign
         self.output_file = os.path.join(self.output_dir, "processed_data.csv")
 
-    def load_data(self):
+    def _processed_lock(self):
+        """Verrou exclusif (entre processus) sur le dataset prétraité"""
+        return file_lock(self.output_file + ".lock")
+
+    def load_data(self, refit=False):
         print(f"Chargement des donnees depuis : {self.input_path}")
 
         # Charger le dataset
@@ -29,6 +44,16 @@ class DataCollector:
 
         df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
         df = df.dropna(subset=["timestamp"])
+
+        # Features de campagne : historique rejoué dans l'ordre, mêmes paramètres que le corrélateur live
+        if self.campaign is not None:
+            df[CAMPAIGN_FEATURES] = CampaignCorrelator.replay(
+                df,
+                window=self.campaign.window,
+                bucket=self.campaign.bucket,
+                max_hub_degree=self.campaign.max_hub_degree,
+            )
+
         df["hour"] = df["timestamp"].dt.hour
         df["day_of_week"] = df["timestamp"].dt.dayofweek
         df.drop(columns=["timestamp"], inplace=True)
@@ -42,17 +67,20 @@ class DataCollector:
         df.drop(columns=["user_agent", "source_ip"], inplace=True, errors="ignore")
         df = pd.get_dummies(df, columns=["geo"], drop_first=True)
 
-        # Normalisation
-        cols_to_scale = ["response_time_ms", "attempts"]
-        df[cols_to_scale] = self.scaler.fit_transform(df[cols_to_scale])
-
-        # Sauvegarde du scaler pour usage futur (API)
-        os.makedirs(os.path.dirname(self.scaler_path), exist_ok=True)
-        joblib.dump(self.scaler, self.scaler_path)
+        # Normalisation : mise à jour incrémentale du scaler (seules les lignes jamais vues
+        # du fichier d'entrée), refit complet seulement sur demande
+        scaler = None if refit else StreamingScaler.load(self.scaler_path)
+        if scaler is None or not scaler.sources:
+            # Absent, ou scaler hérité (lignes absorbées inconnues) : fit initial
+            scaler = StreamingScaler(SCALED_COLUMNS)
+        if scaler.update_source(os.path.abspath(self.input_path), df[SCALED_COLUMNS].to_numpy()):
+            scaler.save(self.scaler_path)
+            print(f" Scaler mis a jour ({scaler.n_samples} echantillons, version {scaler.version})")
+        df = scaler.transform_frame(df)
 
         # Sauvegarde du dataset prétraité
-        os.makedirs(self.output_dir, exist_ok=True)
-        df.to_csv(self.output_file, index=False)
+        with self._processed_lock():
+            df.to_csv(self.output_file, index=False)
         print(f" Donnees pretraitees sauvegardees dans : {self.output_file}\n")
 
         # === 📊 Affichage de la distribution des classes (is_attack) ===
@@ -83,14 +111,57 @@ class DataCollector:
 
         return df
 
-    def preprocess_single(self, new_data: dict):
-        """Prétraiter une seule ligne reçue via API Flutter (non labellisée)"""
-        df = pd.DataFrame([new_data])
+    def feature_columns(self):
+        """Colonnes du dataset principal (lecture de l'en-tête seulement)"""
+        if not os.path.exists(self.output_file):
+            return None
+        return pd.read_csv(self.output_file, nrows=0).columns
+
+    def _cached_scaler(self, path):
+        """Scaler de `path`, rechargé uniquement si le fichier a changé"""
+        if not os.path.exists(path):
+            return None
+        key = os.stat(path).st_mtime_ns
+        cache = self.__dict__.setdefault("_scaler_cache", {})
+        if path not in cache or cache[path][0] != key:
+            cache[path] = (key, StreamingScaler.load(path))
+        return cache[path][1]
+
+    def load_scaler(self):
+        """Scaler de scoring : figé avec le modèle s'il existe, sinon le scaler courant"""
+        if self.model_path and os.path.exists(sidecar_path(self.model_path, "scaler")):
+            return self._cached_scaler(sidecar_path(self.model_path, "scaler"))
+        return self._cached_scaler(self.scaler_path)
+
+    def dataset_scaler(self):
+        """Scaler courant : celui avec lequel load_data a écrit le dataset prétraité"""
+        return self._cached_scaler(self.scaler_path)
+
+    def to_dataset_scale(self, df):
+        """
+        Lignes prétraitées pour le scoring (scaler du modèle) -> échelle du dataset (scaler courant),
+        pour que tout le fichier d'entraînement partage une seule standardisation
+        """
+        scoring, dataset = self.load_scaler(), self.dataset_scaler()
+        if scoring is None or dataset is None or scoring.same_scaling(dataset):
+            return df
+        df = df.copy()
+        values = scoring.inverse_transform(df[dataset.columns].to_numpy(dtype=np.float64))
+        df[dataset.columns] = dataset.transform(values, copy=False)
+        return df
+
+    def preprocess_batch(self, df, columns=None):
+        """Prétraite un lot d'événements bruts avec le scaler existant (pas de refit)"""
+        df = df.copy()
+        df.drop(columns=["id"], inplace=True, errors="ignore")
 
-        # Prétraitement similaire
         df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
         df = df.dropna(subset=["timestamp"])
 
+        # Features de campagne (met à jour le graphe live)
+        if self.campaign is not None:
+            df[CAMPAIGN_FEATURES] = self.campaign.link(df)
+
         df["hour"] = df["timestamp"].dt.hour
         df["day_of_week"] = df["timestamp"].dt.dayofweek
         df.drop(columns=["timestamp"], inplace=True)
@@ -100,44 +171,61 @@ class DataCollector:
         ).astype(int)
         df.drop(columns=["user_agent", "source_ip"], inplace=True, errors="ignore")
 
-        # Encodage geo
-        df = pd.get_dummies(df, columns=["geo"], drop_first=True)
+        # Encodage geo : toutes les modalités, l'alignement retire la modalité de référence
+        # (drop_first sur un petit lot supprimerait la seule modalité présente)
+        df = pd.get_dummies(df, columns=["geo"])
 
         # Alignement avec le dataset principal
-        if os.path.exists(self.output_file):
-            old_df = pd.read_csv(self.output_file)
-            for col in old_df.columns:
-                if col not in df.columns:
-                    df[col] = 0
+        if columns is None:
+            columns = self.feature_columns()
+        if columns is not None:
             # Exclure le label is_attack pour la donnée API
-            if "is_attack" in df.columns:
-                df.drop(columns=["is_attack"], inplace=True)
-            df = df[old_df.drop(columns=["is_attack"], errors="ignore").columns]
+            columns = [c for c in columns if c != "is_attack"]
+            df = df.reindex(columns=columns, fill_value=0)
         else:
-            print(" Aucun dataset existant trouve, la nouvelle donnée sera initialisee seule.")
+            logger.warning("aucun dataset existant, la nouvelle donnee sera initialisee seule")
 
         # ⚙️ Normalisation avec le scaler existant (pas de refit)
-        if os.path.exists(self.scaler_path):
-            scaler = joblib.load(self.scaler_path)
-            cols_to_scale = ["response_time_ms", "attempts"]
-            df[cols_to_scale] = scaler.transform(df[cols_to_scale])
+        scaler = self.load_scaler()
+        if scaler is not None:
+            df = scaler.transform_frame(df)
         else:
-            print(" Aucun scaler trouve, les valeurs ne seront pas normalisées.")
+            logger.warning("aucun scaler trouve, valeurs non normalisees")
 
         return df
 
-    def add_new_data(self, new_data: dict):
-        """Ajoute une nouvelle donnée prétraitée au dataset existant"""
-        new_df = self.preprocess_single(new_data)
-
-        if os.path.exists(self.output_file):
-            df_existing = pd.read_csv(self.output_file)
-            updated_df = pd.concat([df_existing, new_df], ignore_index=True)
-        else:
-            updated_df = new_df
+    def preprocess_single(self, new_data: dict):
+        """Prétraiter une seule ligne reçue via API Flutter (non labellisée)"""
+        return self.preprocess_batch(pd.DataFrame([new_data]))
+
+    def append_processed(self, new_df):
+        """Ajoute des lignes prétraitées en fin de dataset, sans réécrire le fichier (sûr entre processus)"""
+        new_df = self.to_dataset_scale(new_df)
+        with self._processed_lock():
+            columns = self.feature_columns()
+            if columns is None:
+                new_df.to_csv(self.output_file, index=False, encoding="utf-8")
+            else:
+                new_df.reindex(columns=columns).to_csv(
+                    self.output_file, mode="a", header=False, index=False, encoding="utf-8"
+                )
 
-        updated_df.to_csv(self.output_file, index=False, encoding="utf-8")
-        print(f" Nouvelle donnee ajoutee a : {self.output_file}")
-        print(f"Taille actuelle du dataset : {updated_df.shape[0]} lignes")
+    def add_new_data(self, new_data: dict):
+        """Ajoute une nouvelle donnée prétraitée au dataset existant (échelle du dataset)"""
+        new_df = self.to_dataset_scale(self.preprocess_single(new_data))
+
+        # Lecture + réécriture sous le même verrou que append_processed (consommateurs de la file)
+        with self._processed_lock():
+            if os.path.exists(self.output_file):
+                df_existing = pd.read_csv(self.output_file)
+                updated_df = pd.concat([df_existing, new_df], ignore_index=True)
+            else:
+                updated_df = new_df
+
+            updated_df.to_csv(self.output_file, index=False, encoding="utf-8")
+        logger.info(
+            "nouvelle donnee ajoutee",
+            extra={"fields": {"path": self.output_file, "rows": updated_df.shape[0]}},
+        )
 
         return updated_df
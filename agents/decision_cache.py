@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .metrics import METRICS
+
+# Pas de quantification (en écarts-types, les colonnes sont standardisées par le collector ;
+# features de campagne : comptages bruts, sinon jugées continues et le cache serait contourné)
+DEFAULT_QUANTIZE = {
+    "response_time_ms": 0.05,
+    "campaign_ips": 5,
+    "campaign_dids": 5,
+    "campaign_events": 5,
+}
+
+
+class DecisionCache:
+    """
+    Cache LRU + TTL des décisions du modèle :
+    - clé = vecteur de features quantifié (colonnes dans l'ordre du modèle)
+    - colonnes listées dans `quantize` : arrondies au pas donné ; autres : valeur exacte
+    - une colonne non quantifiée qui dépasse `max_levels` valeurs distinctes est jugée
+      continue : le cache est alors contourné (chaque clé serait unique)
+    - vidé automatiquement quand la version du modèle change
+    """
+
+    def __init__(self, max_entries=50_000, ttl=300.0, quantize=None, max_levels=256,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.quantize = DEFAULT_QUANTIZE if quantize is None else quantize
+        self.max_levels = max_levels
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._levels = {}
+        self._continuous = set()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def ensure_version(self, version):
+        """Invalide le cache si le modèle a changé (entrées et colonnes jugées continues)"""
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                # Le nouveau modèle peut avoir d'autres features : détection de continuité à refaire
+                self._levels.clear()
+                self._continuous.clear()
+                self._version = version
+
+    def _track_levels(self, col, values):
+        seen = self._levels.setdefault(col, set())
+        if len(seen) <= self.max_levels:
+            seen.update(np.unique(values).tolist())
+            if len(seen) > self.max_levels:
+                self._continuous.add(col)
+
+    def keys_for(self, X):
+        """Clés (bytes) par ligne, ou None si une colonne est trop continue pour être mise en cache"""
+        values = X.to_numpy(dtype=np.float64, copy=True)
+        with self._lock:
+            for j, col in enumerate(X.columns):
+                step = self.quantize.get(col)
+                if step:
+                    values[:, j] = np.floor(values[:, j] / step)
+                else:
+                    values[:, j] = np.round(values[:, j], 6)
+                    self._track_levels(col, values[:, j])
+            if self._continuous.intersection(X.columns):
+                self.bypassed += len(X)
+                METRICS.inc("decision_cache_bypass", len(X))
+                return None
+
+        values = np.ascontiguousarray(values)
+        return [row.tobytes() for row in values]
+
+    def get_many(self, keys):
+        """Décisions en cache (None pour les absentes ou expirées)"""
+        now = self.clock()
+        out = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[0] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    out.append(entry[1])
+                else:
+                    if entry is not None:
+                        del self._entries[key]
+                    out.append(None)
+            hits = sum(v is not None for v in out)
+            self.hits += hits
+            self.misses += len(out) - hits
+        METRICS.inc("decision_cache_hits", hits)
+        METRICS.inc("decision_cache_misses", len(out) - hits)
+        return out
+
+    def put_many(self, keys, decisions):
+        now = self.clock()
+        with self._lock:
+            for key, decision in zip(keys, decisions):
+                self._entries[key] = (now, decision)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "continuous_columns": sorted(self._continuous),
+            }
@@ -15,21 +15,46 @@ from sklearn.metrics import (
     ConfusionMatrixDisplay,
     roc_auc_score
 )
-from imblearn.over_sampling import SMOTE
+from sklearn.model_selection import train_test_split
+
+from .bundle import sidecar_path
+from .calibration import CalibrationTable, MFA_THRESHOLD, TIERS
+from .explain import explain, DEFAULT_TOP_K
+from .log import get_logger
+from .monitor import DriftMonitor
+from .rebalance import rebalance
+from .scaler import StreamingScaler
+
+logger = get_logger("detector_xgb")
 
 
 class DetectorXGB:
     """
     Détecteur basé sur XGBoost :
     - Entraîne un modèle supervisé sur les données prétraitées
-    - Équilibre les classes via SMOTE
+    - Rééquilibre les classes (SMOTE par défaut, ou poids / sous-échantillonnage / SMOTE approché)
     - Évalue les performances (Accuracy, Precision, Recall, F1, ROC-AUC)
     - Prédit les attaques sur de nouvelles données
+    - Explique les prédictions (contributions des features, XGBoost pred_contribs)
     """
 
-    def __init__(self, processed_dir="data/processed", model_path="models/xgboost_detector.pkl"):
+    def __init__(self, processed_dir="data/processed", model_path="models/xgboost_detector.pkl",
+                 rebalance="smote", cache=None, calibration="isotonic", calibration_size=0.2,
+                 explain="alerts", explain_top_k=DEFAULT_TOP_K, scaler_path="models/scaler.pkl"):
         self.processed_dir = processed_dir
         self.model_path = model_path
+        # Scaler du collector, figé avec le modèle à l'entraînement
+        self.scaler_path = scaler_path
+        # Stratégie de rééquilibrage (voir agents/rebalance.py)
+        self.rebalance_strategy = rebalance
+        # DecisionCache optionnel (agents/decision_cache.py)
+        self.cache = cache
+        # Calibration fitée sur un hold-out (None pour désactiver)
+        self.calibration = calibration
+        self.calibration_size = calibration_size
+        # Explications : "alerts" (niveau mfa ou critique), "all", ou None
+        self.explain = explain
+        self.explain_top_k = explain_top_k
 
     # -------------------------------
     # 📂 Chargement du dataset
@@ -48,44 +73,26 @@ class DetectorXGB:
             return pd.read_csv(latest)
 
     # -------------------------------
-    # ⚖️ Équilibrage via SMOTE
+    # ⚖️ Rééquilibrage des classes
     # -------------------------------
-    def balance_smote(self, df):
-        """Applique SMOTE pour équilibrer les classes"""
-        if 'is_attack' not in df.columns:
-            print(" Pas de colonne 'is_attack' — SMOTE non appliqué.")
-            return df
-
-        X = df.select_dtypes(include=['int64', 'float64']).drop(columns=['is_attack'], errors='ignore')
-        y = df['is_attack']
-
-        print(f"[INFO] Avant SMOTE : {y.value_counts().to_dict()}")
-
-        smote = SMOTE(random_state=42)
-        X_res, y_res = smote.fit_resample(X, y)
-
-        # Afficher la distribution après SMOTE
-        plt.figure(figsize=(5, 4))
-        pd.Series(y_res).value_counts().plot(kind='bar', color=['#3498db', '#e74c3c'])
-        plt.title("Distribution des classes après SMOTE")
-        plt.xlabel("Classe (is_attack)")
-        plt.ylabel("Nombre d'échantillons")
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
-        plt.tight_layout()
-        plt.savefig("data/processed/smote_distribution.png")
-        plt.close()
-
-        print(f"[INFO] Apres SMOTE : {pd.Series(y_res).value_counts().to_dict()}")
-        print("[OK] Image sauvegardee : data/processed/smote_distribution.png")
-
-        X_res['is_attack'] = y_res
-        return X_res
+    def build_model(self):
+        """Modèle XGBoost avec les hyperparamètres du détecteur"""
+        return XGBClassifier(
+            n_estimators=300,
+            learning_rate=0.05,
+            max_depth=6,
+            subsample=0.8,
+            colsample_bytree=0.8,
+            random_state=42,
+            eval_metric='logloss'
+        )
 
     # -------------------------------
     # 🧠 Entraînement du modèle
     # -------------------------------
-    def train(self, path=None):
+    def train(self, path=None, strategy=None):
         """Entraîne XGBoost sur les données prétraitées"""
+        strategy = strategy or self.rebalance_strategy
         df = self.load_processed(path)
 
         # Garder uniquement les données ayant un label (exclure celles de l’API Flutter)
@@ -94,27 +101,62 @@ class DetectorXGB:
         else:
             raise ValueError("La colonne 'is_attack' est obligatoire pour l'entraînement.")
 
-        # Appliquer SMOTE
-        df = self.balance_smote(df)
+        # Hold-out de calibration, jamais rééquilibré ; sans assez d'exemples par classe
+        # (petit jeu, classe rare), entraînement sur tout le jeu et sortie non calibrée
+        holdout = None
+        if self.calibration and self.calibration_size:
+            try:
+                df, holdout = train_test_split(
+                    df, test_size=self.calibration_size, stratify=df['is_attack'], random_state=42
+                )
+            except ValueError as e:
+                print(f"[WARN] Calibration ignorée (hold-out impossible) : {e}")
 
-        X = df.drop(columns=['is_attack'])
-        y = df['is_attack']
+        # Données réelles (avant SMOTE) pour la baseline de dérive
+        X_real = df.select_dtypes(include=['int64', 'float64']).drop(columns=['is_attack'], errors='ignore')
 
-        print(f"[INFO] Entrainement sur {len(X)} échantillons et {len(X.columns)} features.")
+        # Rééquilibrage ; "weights" fournit les poids par ligne dans fit_params["sample_weight"]
+        X, y, fit_params = rebalance(df, strategy, plot_path="data/processed/smote_distribution.png")
 
-        # Modèle XGBoost
-        model = XGBClassifier(
-            n_estimators=300,
-            learning_rate=0.05,
-            max_depth=6,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            scale_pos_weight=1,
-            random_state=42,
-            eval_metric='logloss'
-        )
+        print(f"[INFO] Entrainement sur {len(X)} échantillons et {len(X.columns)} features (rééquilibrage : {strategy}).")
 
-        model.fit(X, y)
+        # Modèle XGBoost
+        model = self.build_model()
+
+        model.fit(X, y, **fit_params)
+
+        # Calibration + points de fonctionnement (sauvegardés avant le modèle : un
+        # rechargement déclenché par le nouveau modèle trouve toujours la bonne table)
+        calibration = None
+        if holdout is not None:
+            X_hold = holdout.select_dtypes(include=['int64', 'float64']).drop(columns=['is_attack'], errors='ignore')
+            raw_hold = model.predict_proba(X_hold.reindex(columns=X.columns, fill_value=0))[:, 1]
+            try:
+                calibration = CalibrationTable.fit(raw_hold, holdout['is_attack'], method=self.calibration)
+                path_calib = calibration.save(self.model_path)
+                print(f"[OK] Calibration ({self.calibration}) sauvegardée dans : {path_calib}")
+                print(f"[INFO] Seuils : {calibration.thresholds} — FPR hold-out : {calibration.fpr}")
+            except ValueError as e:
+                print(f"[WARN] Calibration ignorée : {e}")
+        if calibration is None and os.path.exists(sidecar_path(self.model_path, "calibration")):
+            # Pas de table obsolète à côté d'un nouveau modèle
+            os.remove(sidecar_path(self.model_path, "calibration"))
+
+        # Scaler utilisé pour produire les données d'entraînement, versionné avec le modèle
+        scaler = StreamingScaler.load(self.scaler_path)
+        if scaler is not None:
+            print(f"[OK] Scaler (version {scaler.version}) sauvegardé dans : {scaler.save_with_model(self.model_path)}")
+        elif os.path.exists(sidecar_path(self.model_path, "scaler")):
+            os.remove(sidecar_path(self.model_path, "scaler"))
+
+        # Baseline de dérive (scores tels qu'ils seront produits au scoring)
+        X_real = X_real.reindex(columns=X.columns, fill_value=0)
+        real_proba = model.predict_proba(X_real)[:, 1]
+        if calibration is not None:
+            real_proba = calibration.lookup(real_proba)[0]
+        baseline = DriftMonitor.build_baseline(X_real, scores={"attack_probability": real_proba})
+        baseline_path = DriftMonitor.save_baseline(self.model_path, baseline)
+        print(f"[OK] Baseline de dérive sauvegardée dans : {baseline_path}")
 
         # Sauvegarde du modèle
         os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
@@ -164,14 +206,65 @@ class DetectorXGB:
     # -------------------------------
     # 🔍 Prédiction sur nouveaux échantillons
     # -------------------------------
-    def predict_df(self, df):
-        """Prédit si une nouvelle donnée est une attaque (1) ou normale (0)"""
+    def model_version(self):
+        """Identifiant de la version du modèle sur disque (mtime, taille)"""
+        stat = os.stat(self.model_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load_model(self):
+        """Modèle sauvegardé, rechargé uniquement si le fichier a changé"""
         if not os.path.exists(self.model_path):
             raise FileNotFoundError(f"Modèle introuvable : {self.model_path}")
+        version = self.model_version()
+        cached = getattr(self, "_model_cache", None)
+        if cached is None or cached[0] != version:
+            self._model_cache = (version, joblib.load(self.model_path), CalibrationTable.load(self.model_path))
+        return self._model_cache[1]
+
+    def load_calibration(self):
+        """Table de calibration associée au modèle chargé (None si absente)"""
+        self.load_model()
+        return self._model_cache[2]
+
+    def _predict(self, model, X):
+        """Probabilités brutes : un seul predict_proba"""
+        return model.predict_proba(X)[:, 1]
+
+    def _predict_cached(self, model, X):
+        """Ne calcule que les lignes absentes du cache de décisions"""
+        self.cache.ensure_version(self.model_version())
+        keys = self.cache.keys_for(X)
+        if keys is None:
+            return self._predict(model, X)
+
+        cached = self.cache.get_many(keys)
+        proba = np.array([np.nan if decision is None else decision for decision in cached])
+        misses = np.flatnonzero(np.isnan(proba))
+
+        if misses.size:
+            miss_proba = self._predict(model, X.iloc[misses])
+            proba[misses] = miss_proba
+            self.cache.put_many([keys[i] for i in misses], miss_proba.tolist())
+
+        return proba
+
+    def _attach_explanations(self, model, X, df, mask=None):
+        """
+        Colonne `explanation` : top-k contributions [(feature, valeur), ...] ;
+        avec un masque, seules ces lignes sont expliquées (coût proportionnel aux alertes)
+        """
+        rows = np.arange(len(X)) if mask is None else np.flatnonzero(mask)
+        explanations = [None] * len(X)
+        if rows.size:
+            for i, explanation in zip(rows, explain(model, X.iloc[rows], self.explain_top_k)):
+                explanations[i] = explanation
+        df["explanation"] = explanations
 
-        model = joblib.load(self.model_path)
+    def predict_df(self, df):
+        """Prédit si une nouvelle donnée est une attaque (1) ou normale (0)"""
+        model = self.load_model()
         X = df.select_dtypes(include=['int64', 'float64']).copy()
-        for col in ['is_attack', 'anomaly_score', 'is_attack_pred']:
+        for col in ['is_attack', 'anomaly_score', 'is_attack_pred', 'attack_probability', 'raw_probability']:
             if col in X.columns:
                 X = X.drop(columns=[col])
 
@@ -180,12 +273,28 @@ class DetectorXGB:
         if train_features is not None:
             X = X.reindex(columns=train_features, fill_value=0)
 
-        preds = model.predict(X)
-        proba = model.predict_proba(X)[:, 1]
+        if self.cache is not None:
+            proba = self._predict_cached(model, X)
+        else:
+            proba = self._predict(model, X)
 
         df = df.copy()
-        df["attack_probability"] = proba
-        df["is_attack_pred"] = preds
+        calibration = self.load_calibration()
+        if calibration is not None:
+            # Une indexation : probabilité calibrée + niveau ; attaque = niveau critique
+            calibrated, tier_codes = calibration.lookup(proba)
+            df["raw_probability"] = proba
+            df["attack_probability"] = calibrated
+            df["tier"] = TIERS[tier_codes]
+            df["is_attack_pred"] = (tier_codes == len(TIERS) - 1).astype(int)
+            alerts = tier_codes > 0
+        else:
+            df["attack_probability"] = proba
+            df["is_attack_pred"] = (proba > 0.5).astype(int)
+            alerts = proba >= MFA_THRESHOLD
+
+        if self.explain:
+            self._attach_explanations(model, X, df, None if self.explain == "all" else alerts)
 
-        print(f"[INFO] Predictions effectuees sur {len(df)} lignes.")
+        logger.info("predictions effectuees", extra={"fields": {"rows": len(df)}})
         return df
@@ -2,7 +2,6 @@ import os
 import joblib
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from sklearn.ensemble import IsolationForest
 from sklearn.metrics import (
     accuracy_score,
@@ -11,21 +10,28 @@ from sklearn.metrics import (
     f1_score,
     confusion_matrix
 )
-from imblearn.over_sampling import SMOTE
+from .log import get_logger
+from .monitor import DriftMonitor
+from .rebalance import rebalance
+
+logger = get_logger("detector_if")
 
 
 class DetectorIF:
     """
     Détecteur basé sur Isolation Forest :
     - Entraîne un modèle sur les données prétraitées
-    - Équilibre les classes via SMOTE
+    - Pas de rééquilibrage par défaut (modèle non supervisé : le label ne sert qu'à l'évaluation)
     - Évalue les performances
     - Fait des prédictions sur de nouvelles données
     """
 
-    def __init__(self, processed_dir="data/processed", model_path="models/isolation_forest.pkl"):
+    def __init__(self, processed_dir="data/processed", model_path="models/isolation_forest.pkl",
+                 rebalance="none"):
         self.processed_dir = processed_dir
         self.model_path = model_path
+        # Stratégie de rééquilibrage (voir agents/rebalance.py)
+        self.rebalance_strategy = rebalance
 
     def load_processed(self, path=None):
         """Charge le dernier dataset prétraité"""
@@ -40,39 +46,9 @@ class DetectorIF:
             print(f"[INFO] Chargement du fichier : {latest}")
             return pd.read_csv(latest)
 
-    def balance_smote(self, df):
-        """Applique SMOTE pour équilibrer les classes"""
-        if 'is_attack' not in df.columns:
-            print(" Pas de colonne 'is_attack' — SMOTE non appliqué.")
-            return df
-
-        X = df.select_dtypes(include=['int64', 'float64']).drop(columns=['is_attack'], errors='ignore')
-        y = df['is_attack']
-
-        print(f"[INFO] Avant SMOTE : {y.value_counts().to_dict()}")
-
-        smote = SMOTE(random_state=42)
-        X_res, y_res = smote.fit_resample(X, y)
-
-        # Afficher la distribution après SMOTE
-        plt.figure(figsize=(5, 4))
-        pd.Series(y_res).value_counts().plot(kind='bar', color=['#3498db', '#e74c3c'])
-        plt.title("Distribution des classes après SMOTE")
-        plt.xlabel("Classe (is_attack)")
-        plt.ylabel("Nombre d'échantillons")
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
-        plt.tight_layout()
-        plt.savefig("data/processed/smote_distribution.png")
-        plt.close()
-
-        print(f"[INFO] Après SMOTE : {pd.Series(y_res).value_counts().to_dict()}")
-        print("[OK] Image sauvegardée : data/processed/smote_distribution.png")
-
-        X_res['is_attack'] = y_res
-        return X_res
-
-    def train(self, path=None):
+    def train(self, path=None, strategy=None):
         """Entraîne Isolation Forest sur les données prétraitées"""
+        strategy = strategy or self.rebalance_strategy
         df = self.load_processed(path)
 
         # Garder uniquement les données ayant un label (exclure celles de l’API Flutter)
@@ -81,14 +57,15 @@ class DetectorIF:
         else:
             raise ValueError("La colonne 'is_attack' est obligatoire pour l'entraînement.")
 
-        df = self.balance_smote(df)
+        # Données réelles (avant rééquilibrage) pour la baseline de dérive
+        X_real = df.select_dtypes(include=['int64', 'float64']).drop(columns=['is_attack'], errors='ignore')
 
-        X = df.drop(columns=['is_attack'])
-        y_true = df['is_attack']
+        X, y_true, fit_params = rebalance(df, strategy, plot_path="data/processed/smote_distribution.png")
 
         contamination = 0.05
         print(f"[INFO] Nombre de features : {len(X.columns)}")
         print(f"[INFO] Contamination utilisée : {contamination}")
+        print(f"[INFO] Rééquilibrage : {strategy}")
 
         clf = IsolationForest(
             n_estimators=200,
@@ -96,13 +73,21 @@ class DetectorIF:
             random_state=42,
             n_jobs=-1
         )
-        clf.fit(X)
+        clf.fit(X, **fit_params)
 
         # Sauvegarde du modèle
         os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
         joblib.dump(clf, self.model_path)
         print(f" Modèle IsolationForest sauvegardé dans : {self.model_path}")
 
+        # Baseline de dérive sauvegardée avec le modèle
+        X_real = X_real.reindex(columns=X.columns, fill_value=0)
+        baseline = DriftMonitor.build_baseline(
+            X_real, scores={"anomaly_score": clf.decision_function(X_real)}
+        )
+        baseline_path = DriftMonitor.save_baseline(self.model_path, baseline)
+        print(f" Baseline de dérive sauvegardée dans : {baseline_path}")
+
         preds = clf.predict(X)
         preds = np.where(preds == -1, 1, 0)
 
@@ -131,12 +116,24 @@ class DetectorIF:
 
         return clf, metrics
 
-    def predict_df(self, df):
-        """Prédit si une nouvelle donnée est une attaque (1) ou normale (0)"""
+    def model_version(self):
+        """Identifiant de la version du modèle sur disque (mtime, taille)"""
+        stat = os.stat(self.model_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load_model(self):
+        """Modèle sauvegardé, rechargé uniquement si le fichier a changé"""
         if not os.path.exists(self.model_path):
             raise FileNotFoundError(f"Modèle introuvable : {self.model_path}")
+        version = self.model_version()
+        cached = getattr(self, "_model_cache", None)
+        if cached is None or cached[0] != version:
+            self._model_cache = (version, joblib.load(self.model_path))
+        return self._model_cache[1]
 
-        clf = joblib.load(self.model_path)
+    def predict_df(self, df):
+        """Prédit si une nouvelle donnée est une attaque (1) ou normale (0)"""
+        clf = self.load_model()
         X = df.select_dtypes(include=['int64', 'float64']).copy()
         for col in ['is_attack', 'anomaly_score', 'is_attack_pred']:
             if col in X.columns:
@@ -154,5 +151,5 @@ class DetectorIF:
         df["anomaly_score"] = scores
         df["is_attack_pred"] = np.where(preds == -1, 1, 0)
 
-        print(f" Prédictions effectuées sur {len(df)} lignes.")
+        logger.info("predictions effectuees", extra={"fields": {"rows": len(df)}})
         return df
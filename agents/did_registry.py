@@ -0,0 +1,78 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Chemin absolu : partagé par le serveur d'auth (backendFlask/) et le Reactor
+# (DID_REGISTRY_PATH pour un autre registre, ex. benchmarks)
+DEFAULT_PATH = os.environ.get("DID_REGISTRY_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "registry", "dids.db"
+)
+
+
+class DIDRegistry:
+    """
+    Registre persistant des DIDs (SQLite, mode WAL) :
+    - clés publiques, quorum et email de contact MFA par DID
+    - écrit par /auth/register, lu par le Reactor pour résoudre le destinataire MFA
+    Utilisable depuis plusieurs threads et plusieurs processus.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS dids (
+                did TEXT PRIMARY KEY,
+                public_keys TEXT NOT NULL,
+                quorum INTEGER NOT NULL,
+                email TEXT,
+                registered_at REAL NOT NULL
+            );
+        """)
+
+    def _conn(self):
+        """Une connexion par thread (sqlite3 n'est pas partageable entre threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def register(self, did, public_keys, quorum, email=None):
+        """Enregistre (ou remplace) un DID"""
+        self._conn().execute(
+            "INSERT OR REPLACE INTO dids (did, public_keys, quorum, email, registered_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (did, json.dumps(public_keys), quorum, email, time.time()),
+        )
+
+    def load_all(self):
+        """{did: {"publicKeys": [...], "quorum": n, "email": ...}} (format de l'API d'auth)"""
+        rows = self._conn().execute("SELECT did, public_keys, quorum, email FROM dids").fetchall()
+        return {
+            did: {"publicKeys": json.loads(keys), "quorum": quorum, "email": email}
+            for did, keys, quorum, email in rows
+        }
+
+    def email_for(self, did):
+        return self.emails_for([did]).get(did)
+
+    def emails_for(self, dids):
+        """{did: email} pour un lot de DIDs, en une requête (DIDs inconnus ou sans email absents)"""
+        dids = list({d for d in dids if d})
+        emails = {}
+        # Limite SQLite sur le nombre de paramètres d'une requête
+        for start in range(0, len(dids), 500):
+            chunk = dids[start:start + 500]
+            rows = self._conn().execute(
+                f"SELECT did, email FROM dids WHERE email IS NOT NULL AND did IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            emails.update(rows)
+        return emails
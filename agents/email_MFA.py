@@ -1,17 +1,40 @@
-import random
+import secrets
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+import numpy as np
+
+from .log import get_logger
+
+logger = get_logger("email_mfa")
+
+OTP_DIGITS = 6
+
 class EmailMFA:
 
     @staticmethod
     def generate_otp():
         """Génère automatiquement un code OTP sécurisé à 6 chiffres"""
-        return str(random.randint(100000, 999999))
+        return EmailMFA.generate_otps(1)[0]
 
     @staticmethod
-    def send_email(to_email, otp, email_from, email_password):
+    def generate_otps(n, digits=OTP_DIGITS):
+        """
+        Génère `n` codes OTP en un seul tirage cryptographique (secrets) ;
+        rejet des valeurs au-delà du plus grand multiple de 10**digits (pas de biais modulo)
+        """
+        modulus = 10 ** digits
+        limit = (2 ** 32 // modulus) * modulus
+        codes = np.empty(0, dtype=np.uint32)
+        while len(codes) < n:
+            # Marge de 1 % pour que le rejet ne force presque jamais un second tirage
+            draw = np.frombuffer(secrets.token_bytes(4 * (n - len(codes) + n // 100 + 8)), dtype=np.uint32)
+            codes = np.concatenate([codes, draw[draw < limit]])
+        return [f"{code:0{digits}d}" for code in (codes[:n] % modulus).tolist()]
+
+    @staticmethod
+    def build_message(to_email, otp, email_from):
         subject = "Votre Code MFA"
         body = f"Votre code MFA est : {otp}\n\nNe le partagez jamais."
 
@@ -20,6 +43,11 @@ class EmailMFA:
         msg["To"] = to_email
         msg["Subject"] = subject
         msg.attach(MIMEText(body, "plain"))
+        return msg
+
+    @staticmethod
+    def send_email(to_email, otp, email_from, email_password):
+        msg = EmailMFA.build_message(to_email, otp, email_from)
 
         try:
             server = smtplib.SMTP("smtp.gmail.com", 587)
@@ -28,9 +56,9 @@ class EmailMFA:
             server.sendmail(email_from, to_email, msg.as_string())
             server.quit()
 
-            print(f"[EMAIL] OTP envoyé à {to_email}")
+            logger.info("OTP envoye", extra={"fields": {"to": to_email}})
             return True
 
         except Exception as e:
-            print("[ERREUR ENVOI EMAIL] :", e)
+            logger.error("erreur envoi email", extra={"fields": {"to": to_email, "error": str(e)}})
             return False
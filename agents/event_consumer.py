@@ -0,0 +1,192 @@
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from .log import get_logger
+from .metrics import METRICS
+
+logger = get_logger("event_consumer")
+
+# Informations brutes supprimées au prétraitement mais utiles au Reactor
+RAW_COLUMNS = ["source_ip", "user_agent", "did"]
+
+
+class EventConsumer:
+    """
+    Consommateur de la file d'événements d'authentification :
+    - réserve des lots (claim), prétraite en lot, score, persiste puis réagit
+    - ack seulement après réaction : en cas de crash, le bail expire et le lot
+      est relivré (au moins une fois, des doublons restent possibles)
+    - le bail est prolongé toutes les `lease_seconds / 3` secondes pendant le traitement
+      (SMTP lent dans le Reactor) : un lot vivant n'est jamais réservé par un autre consommateur
+    - seule l'étape sans effet de bord (prétraitement + scoring) est coupée en deux
+      récursivement en cas d'échec ; les événements scorés sont ensuite persistés en un
+      seul ajout puis passés au Reactor un par un, une seule fois chacun
+    - les événements en échec (scoring ou réaction) sont nackés avec `retry_delay` ; après
+      `max_attempts` livraisons, la file range l'événement en dead letter
+    - toutes les `stats_interval` secondes, les métriques et le moniteur de dérive du
+      processus sont publiés dans la file (agrégés par /monitor et /metrics de server.py)
+    """
+
+    def __init__(self, queue, collector, detector, reactor, batch_size=256,
+                 lease_seconds=60, poll_interval=0.2, retry_delay=5.0, monitor=None, stats_interval=10.0):
+        self.queue = queue
+        self.collector = collector
+        self.detector = detector
+        self.reactor = reactor
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.monitor = monitor
+        self.stats_interval = stats_interval
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self._published_at = None
+        self._stop = threading.Event()
+
+    def score(self, events):
+        """
+        Prétraite et score un lot [(id, auth_log), ...] : (features, résultat scoré),
+        indexés par id d'événement. Rejouable : seul le graphe de campagne est mis à jour,
+        et un lien déjà présent ne change pas ses composantes
+        """
+        raw = pd.DataFrame([record for _, record in events], index=[event_id for event_id, _ in events])
+
+        with METRICS.timer("preprocess"):
+            features = self.collector.preprocess_batch(raw)
+        if len(features) < len(raw):
+            logger.warning(
+                "evenements invalides ignores",
+                extra={"fields": {"count": len(raw) - len(features)}},
+            )
+        if features.empty:
+            return features, features
+
+        with METRICS.timer("inference"):
+            result = self.detector.predict_df(features)
+
+        for col in RAW_COLUMNS:
+            if col in raw.columns:
+                result[col] = raw.loc[result.index, col]
+        return features, result
+
+    @contextmanager
+    def _heartbeat(self, ids):
+        """Prolonge le bail de `ids` en tâche de fond tant que le bloc s'exécute"""
+        done = threading.Event()
+
+        def beat():
+            while not done.wait(self.lease_seconds / 3):
+                try:
+                    self.queue.extend_lease(ids, self.lease_seconds)
+                except Exception as e:
+                    logger.warning("prolongation du bail impossible", extra={"fields": {"error": str(e)}})
+
+        thread = threading.Thread(target=beat, name="lease-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def _score_isolated(self, events):
+        """
+        Score un lot ; en cas d'échec, bissection pour isoler les événements fautifs.
+        Retourne ([(features, résultat), ...], ids en échec)
+        """
+        try:
+            return [self.score(events)], []
+        except Exception as e:
+            if len(events) == 1:
+                logger.error("evenement en echec", extra={"fields": {"id": events[0][0], "error": str(e)}})
+                return [], [events[0][0]]
+            METRICS.inc("queue_batch_splits")
+            mid = len(events) // 2
+            scored_left, failed_left = self._score_isolated(events[:mid])
+            scored_right, failed_right = self._score_isolated(events[mid:])
+            return scored_left + scored_right, failed_left + failed_right
+
+    def _react(self, result):
+        """Réaction événement par événement : un échec n'entraîne pas de nouvelle réaction pour les autres"""
+        failed = []
+        with METRICS.timer("reactor_dispatch"):
+            for event_id in result.index:
+                try:
+                    self.reactor.react(result.loc[[event_id]])
+                except Exception as e:
+                    logger.error("reaction en echec", extra={"fields": {"id": event_id, "error": str(e)}})
+                    failed.append(event_id)
+        return failed
+
+    def process(self, events):
+        """
+        Traite un lot [(id, auth_log), ...] : scoring isolé, une persistance, une réaction par événement.
+        Retourne (ids traités, ids en échec)
+        """
+        scored, failed = self._score_isolated(events)
+        parts = [(features, result) for features, result in scored if not features.empty]
+        if parts:
+            features = pd.concat([f for f, _ in parts])
+            result = pd.concat([r for _, r in parts])
+            try:
+                with METRICS.timer("persist"):
+                    self.collector.append_processed(features)
+            except Exception as e:
+                # Rien n'est persisté ni signalé : tout le lot scoré sera relivré
+                logger.error("persistance en echec", extra={"fields": {"count": len(features), "error": str(e)}})
+                failed = failed + result.index.tolist()
+            else:
+                failed = failed + self._react(result)
+
+        failed_set = set(failed)
+        return [event_id for event_id, _ in events if event_id not in failed_set], failed
+
+    def run_once(self):
+        """Réserve et traite un lot ; retourne le nombre d'événements consommés"""
+        events = self.queue.claim(self.batch_size, self.lease_seconds)
+        if not events:
+            return 0
+
+        with self._heartbeat([event_id for event_id, _ in events]), METRICS.timer("queue_batch"):
+            ok, failed = self.process(events)
+
+        if failed:
+            METRICS.inc("queue_batch_errors")
+            METRICS.inc("events_failed", len(failed))
+            logger.error("evenements en echec, remise en file", extra={"fields": {"count": len(failed)}})
+            self.queue.nack(failed, delay=self.retry_delay)
+        if ok:
+            self.queue.ack(ok)
+            METRICS.inc("events_consumed", len(ok))
+        return len(ok)
+
+    def publish_stats(self, force=False):
+        """Publie métriques et moniteur dans la file, au plus toutes les `stats_interval` secondes"""
+        now = time.monotonic()
+        if not force and self._published_at is not None and now - self._published_at < self.stats_interval:
+            return
+        self._published_at = now
+        stats = {"metrics": METRICS.export_state()}
+        if self.monitor is not None:
+            stats["monitor"] = self.monitor.export_state()
+        try:
+            self.queue.publish_stats(self.worker, stats)
+        except Exception as e:
+            logger.warning("publication des statistiques impossible", extra={"fields": {"error": str(e)}})
+
+    def run(self):
+        """Boucle de consommation jusqu'à stop()"""
+        logger.info("consommateur demarre", extra={"fields": {"batch_size": self.batch_size}})
+        while not self._stop.is_set():
+            if self.run_once() == 0:
+                self._stop.wait(self.poll_interval)
+            self.publish_stats()
+        self.publish_stats(force=True)
+
+    def stop(self):
+        self._stop.set()
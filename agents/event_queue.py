@@ -0,0 +1,195 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .log import get_logger
+
+logger = get_logger("event_queue")
+
+# Chemin absolu : partagé par le serveur d'auth (backendFlask/) et les consommateurs
+# (EVENT_QUEUE_PATH pour une autre file, ex. benchmarks)
+DEFAULT_PATH = os.environ.get("EVENT_QUEUE_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "queue", "auth_events.db"
+)
+
+
+class QueueFull(Exception):
+    """Levée par enqueue() quand la profondeur maximale est atteinte (contre-pression)"""
+
+
+class EventQueue:
+    """
+    File d'événements durable sur SQLite (mode WAL) :
+    - enqueue() : ajout d'un enregistrement JSON ; QueueFull au-delà de `max_depth`
+    - claim()   : réserve un lot avec un bail (lease) ; sans ack avant expiration,
+                  le lot redevient disponible (livraison au moins une fois)
+    - extend_lease() : prolonge le bail d'un lot encore en traitement
+    - ack() / nack() : suppression après traitement / remise en file avec délai
+    - au-delà de `max_attempts` livraisons, l'événement part dans `dead_letters`
+    - publish_stats() / worker_stats() : état (métriques, dérive) publié par chaque
+      consommateur, agrégé par le service d'analyse
+    Utilisable depuis plusieurs threads et plusieurs processus.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_depth=100_000, max_attempts=5,
+                 depth_check_every=100):
+        self.path = path
+        self.max_depth = max_depth
+        self.max_attempts = max_attempts
+        self.depth_check_every = depth_check_every
+        self._local = threading.local()
+        self._depth_lock = threading.Lock()
+        self._cached_depth = 0
+        self._since_check = depth_check_every
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                available_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_events_available ON events(available_at, id);
+            CREATE TABLE IF NOT EXISTS dead_letters (
+                id INTEGER PRIMARY KEY,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER NOT NULL,
+                failed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS worker_stats (
+                worker TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL,
+                payload TEXT NOT NULL
+            );
+        """)
+
+    def _conn(self):
+        """Une connexion par thread (sqlite3 n'est pas partageable entre threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL : aucune perte si le processus crashe (seulement en cas de coupure OS)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # -------------------------------
+    # 📥 Production
+    # -------------------------------
+    def depth(self):
+        return self._conn().execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def enqueue(self, record):
+        """Ajoute un événement ; la profondeur est revérifiée tous les `depth_check_every` ajouts"""
+        with self._depth_lock:
+            self._since_check += 1
+            if self._since_check >= self.depth_check_every or self._cached_depth >= self.max_depth:
+                self._cached_depth = self.depth()
+                self._since_check = 0
+            if self._cached_depth >= self.max_depth:
+                raise QueueFull(f"File pleine ({self._cached_depth} événements en attente)")
+            self._cached_depth += 1
+
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO events (payload, enqueued_at, available_at) VALUES (?, ?, ?)",
+            (json.dumps(record, default=str), now, now),
+        )
+        return cur.lastrowid
+
+    # -------------------------------
+    # 📤 Consommation
+    # -------------------------------
+    def claim(self, batch_size=256, lease_seconds=60):
+        """Réserve jusqu'à `batch_size` événements disponibles : [(id, record), ...]"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, payload, enqueued_at, attempts FROM events "
+                "WHERE available_at <= ? ORDER BY id LIMIT ?",
+                (now, batch_size),
+            ).fetchall()
+
+            dead = [r for r in rows if r[3] >= self.max_attempts]
+            live = [r for r in rows if r[3] < self.max_attempts]
+
+            if dead:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO dead_letters (id, payload, enqueued_at, attempts, failed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(r[0], r[1], r[2], r[3], now) for r in dead],
+                )
+                conn.executemany("DELETE FROM events WHERE id = ?", [(r[0],) for r in dead])
+                logger.warning("evenements en dead letter", extra={"fields": {"count": len(dead)}})
+
+            conn.executemany(
+                "UPDATE events SET available_at = ?, attempts = attempts + 1 WHERE id = ?",
+                [(now + lease_seconds, r[0]) for r in live],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return [(r[0], json.loads(r[1])) for r in live]
+
+    def _write_many(self, sql, params):
+        """Exécute un lot d'écritures dans une seule transaction"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(sql, params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def extend_lease(self, ids, lease_seconds=60):
+        """Repousse l'expiration du bail des événements encore en cours de traitement"""
+        available_at = time.time() + lease_seconds
+        self._write_many("UPDATE events SET available_at = ? WHERE id = ?", [(available_at, i) for i in ids])
+
+    def ack(self, ids):
+        """Supprime les événements traités"""
+        self._write_many("DELETE FROM events WHERE id = ?", [(i,) for i in ids])
+
+    def nack(self, ids, delay=5.0):
+        """Rend les événements disponibles à nouveau après `delay` secondes"""
+        available_at = time.time() + delay
+        self._write_many("UPDATE events SET available_at = ? WHERE id = ?", [(available_at, i) for i in ids])
+
+    # -------------------------------
+    # 📊 État des consommateurs
+    # -------------------------------
+    def publish_stats(self, worker, stats):
+        """Remplace l'état publié par le consommateur `worker` (dict JSON)"""
+        self._write_many(
+            "INSERT OR REPLACE INTO worker_stats (worker, updated_at, payload) VALUES (?, ?, ?)",
+            [(worker, time.time(), json.dumps(stats))],
+        )
+
+    def worker_stats(self, max_age=300):
+        """États publiés depuis moins de `max_age` secondes : {worker: stats} (consommateurs arrêtés exclus)"""
+        rows = self._conn().execute(
+            "SELECT worker, payload FROM worker_stats WHERE updated_at >= ?", (time.time() - max_age,)
+        ).fetchall()
+        return {worker: json.loads(payload) for worker, payload in rows}
+
+    def stats(self):
+        conn = self._conn()
+        return {
+            "depth": conn.execute("SELECT COUNT(*) FROM events").fetchone()[0],
+            "in_flight": conn.execute(
+                "SELECT COUNT(*) FROM events WHERE available_at > ? AND attempts > 0", (time.time(),)
+            ).fetchone()[0],
+            "dead_letters": conn.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0],
+        }
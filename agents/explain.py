@@ -0,0 +1,50 @@
+import numpy as np
+import xgboost as xgb
+
+# Nombre de contributions retenues par prédiction
+DEFAULT_TOP_K = 3
+
+
+def contributions(model, X):
+    """
+    Contributions par feature (espace log-odds) pour toutes les lignes de X,
+    en un seul appel natif XGBoost (pred_contribs) ; la colonne de biais est retirée
+    """
+    dmatrix = xgb.DMatrix(X.to_numpy(dtype=np.float32), feature_names=list(X.columns))
+    contribs = model.get_booster().predict(dmatrix, pred_contribs=True)
+    return contribs[:, :-1]
+
+
+def top_k(contribs, feature_names, k=DEFAULT_TOP_K):
+    """
+    Les k contributions les plus fortes (en valeur absolue) par ligne :
+    argpartition O(n_features) puis tri des seules k retenues
+    -> [[(feature, contribution), ...], ...]
+    """
+    k = min(k, contribs.shape[1])
+    if k == 0 or len(contribs) == 0:
+        return [[] for _ in range(len(contribs))]
+
+    magnitude = np.abs(contribs)
+    idx = np.argpartition(-magnitude, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(magnitude, idx, axis=1), axis=1)
+    idx = np.take_along_axis(idx, order, axis=1)
+    values = np.take_along_axis(contribs, idx, axis=1)
+
+    names = np.asarray(feature_names)[idx]
+    return [
+        [(str(name), round(float(value), 4)) for name, value in zip(row_names, row_values)]
+        for row_names, row_values in zip(names, values)
+    ]
+
+
+def explain(model, X, k=DEFAULT_TOP_K):
+    """Top-k contributions pour chaque ligne de X"""
+    return top_k(contributions(model, X), X.columns, k)
+
+
+def format_explanation(explanation):
+    """Texte lisible (email, logs) : 'attempts (+1.21), geo_CN (+0.40)'"""
+    if not explanation:
+        return "non disponible"
+    return ", ".join(f"{name} ({value:+.2f})" for name, value in explanation)
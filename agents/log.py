@@ -0,0 +1,76 @@
+import json
+import logging
+import threading
+import time
+
+
+class JsonFormatter(logging.Formatter):
+    """Formate chaque enregistrement en une ligne JSON (champs structurés via extra={"fields": {...}})"""
+
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        payload.update(getattr(record, "fields", {}))
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            payload["suppressed"] = suppressed
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limite le débit par message (token bucket par (logger, gabarit du message)) :
+    - `rate` messages/seconde en régime permanent, rafales jusqu'à `burst`
+    - le nombre de messages supprimés est reporté sur le prochain message émis
+    - WARNING et au-delà ne sont jamais filtrés
+    """
+
+    def __init__(self, rate=5.0, burst=20):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, suppressed = self._buckets.get(key, (self.burst, now, 0))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, suppressed + 1)
+                return False
+            self._buckets[key] = (tokens - 1, now, 0)
+
+        record.suppressed = suppressed
+        return True
+
+
+_configured = False
+_config_lock = threading.Lock()
+
+
+def get_logger(name, level=logging.INFO):
+    """Logger structuré (JSON) et limité en débit, partagé par les agents"""
+    global _configured
+    with _config_lock:
+        if not _configured:
+            handler = logging.StreamHandler()
+            handler.setFormatter(JsonFormatter())
+            handler.addFilter(RateLimitFilter())
+            root = logging.getLogger("blockchain")
+            root.addHandler(handler)
+            root.setLevel(level)
+            root.propagate = False
+            _configured = True
+    return logging.getLogger(f"blockchain.{name}")
@@ -0,0 +1,233 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+from .log import get_logger
+
+logger = get_logger("metrics")
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class LatencyHistogram:
+    """
+    Histogramme log-linéaire façon HDR, en microsecondes :
+    - valeurs exactes sous 2^sub_bits µs, puis 2^(sub_bits-1) sous-bacs par octave
+    - erreur relative bornée (~3% avec sub_bits=5), mémoire fixe, enregistrement O(1)
+    """
+
+    def __init__(self, sub_bits=5, max_us=1 << 36):
+        self.sub_bits = sub_bits
+        self.sub_count = 1 << sub_bits
+        self.half = self.sub_count // 2
+        self.max_us = max_us
+        self.counts = [0] * (self._index(max_us) + 1)
+        self.count = 0
+        self.sum_us = 0
+        self.max_seen_us = 0
+
+    def _index(self, v):
+        if v < self.sub_count:
+            return v
+        shift = v.bit_length() - self.sub_bits
+        return self.sub_count + (shift - 1) * self.half + ((v >> shift) - self.half)
+
+    def _upper_bound(self, index):
+        if index < self.sub_count:
+            return index
+        shift = (index - self.sub_count) // self.half + 1
+        sub = (index - self.sub_count) % self.half + self.half
+        return ((sub + 1) << shift) - 1
+
+    def record(self, us):
+        us = min(max(int(us), 0), self.max_us)
+        self.counts[self._index(us)] += 1
+        self.count += 1
+        self.sum_us += us
+        if us > self.max_seen_us:
+            self.max_seen_us = us
+
+    def export_state(self):
+        """Bacs non vides et agrégats (JSON) : fusion possible dans un autre processus"""
+        return {
+            "counts": {index: c for index, c in enumerate(self.counts) if c},
+            "count": self.count,
+            "sum_us": self.sum_us,
+            "max_us": self.max_seen_us,
+        }
+
+    def merge_state(self, state):
+        """Ajoute un histogramme exporté de même précision (clés JSON converties en entiers)"""
+        for index, c in state["counts"].items():
+            self.counts[int(index)] += c
+        self.count += state["count"]
+        self.sum_us += state["sum_us"]
+        self.max_seen_us = max(self.max_seen_us, state["max_us"])
+
+    def percentile(self, q):
+        """Valeur (µs) sous laquelle se trouvent q% des observations"""
+        if self.count == 0:
+            return 0
+        target = q * self.count
+        seen = 0
+        for index, c in enumerate(self.counts):
+            seen += c
+            if c and seen >= target:
+                return min(self._upper_bound(index), self.max_seen_us)
+        return self.max_seen_us
+
+
+class MetricsRegistry:
+    """Latences par étape (histogrammes HDR) et compteurs, exportables au format Prometheus"""
+
+    def __init__(self, prefix="blockchain"):
+        self.prefix = prefix
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe_ns(self, stage, ns):
+        with self._lock:
+            hist = self._histograms.get(stage)
+            if hist is None:
+                hist = self._histograms[stage] = LatencyHistogram()
+            hist.record(ns // 1000)
+
+    @contextmanager
+    def timer(self, stage):
+        """Chronomètre une étape avec une horloge monotone"""
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.observe_ns(stage, time.perf_counter_ns() - start)
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def export_state(self):
+        """État brut (histogrammes, compteurs) publié par les consommateurs de la file"""
+        with self._lock:
+            return {
+                "histograms": {stage: h.export_state() for stage, h in self._histograms.items()},
+                "counters": dict(self._counters),
+            }
+
+    def merge_state(self, state):
+        """Ajoute l'état exporté d'un autre processus ; retourne le registre"""
+        with self._lock:
+            for stage, hist_state in state["histograms"].items():
+                hist = self._histograms.get(stage)
+                if hist is None:
+                    hist = self._histograms[stage] = LatencyHistogram()
+                hist.merge_state(hist_state)
+            for name, value in state["counters"].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+        return self
+
+    def snapshot(self):
+        """Percentiles (ms) par étape + compteurs"""
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": h.count,
+                    "mean_ms": round(h.sum_us / h.count / 1000, 3) if h.count else 0.0,
+                    **{f"p{q * 100:g}_ms": round(h.percentile(q) / 1000, 3) for q in QUANTILES},
+                    "max_ms": round(h.max_seen_us / 1000, 3),
+                }
+                for stage, h in self._histograms.items()
+            }
+            return {"stages": stages, "counters": dict(self._counters)}
+
+    def render_prometheus(self):
+        """Exposition texte Prometheus (summary par étape + compteurs)"""
+        name = f"{self.prefix}_stage_latency_seconds"
+        lines = [
+            f"# HELP {name} Latence par étape du pipeline verify -> analyze -> react",
+            f"# TYPE {name} summary",
+        ]
+        with self._lock:
+            for stage, h in sorted(self._histograms.items()):
+                for q in QUANTILES:
+                    lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {h.percentile(q) / 1e6:.6f}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum_us / 1e6:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+
+            for counter, value in sorted(self._counters.items()):
+                metric = f"{self.prefix}_{counter}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class SlowRequestProfiler:
+    """
+    Profileur échantillonné pour les requêtes lentes :
+    - une requête sur `sample_every` est exécutée sous cProfile (0 = désactivé)
+    - le profil n'est conservé que si la requête dépasse `slow_ms`
+    - un seul profil actif à la fois (cProfile n'est pas réentrant entre threads)
+    """
+
+    def __init__(self, sample_every=0, slow_ms=500, output_dir="data/profiles", top=20):
+        self.sample_every = sample_every
+        self.slow_ms = slow_ms
+        self.output_dir = output_dir
+        self.top = top
+        self._seen = 0
+        self._busy = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """PROFILE_SAMPLE_EVERY / PROFILE_SLOW_MS activent le profileur"""
+        return cls(
+            sample_every=int(os.environ.get("PROFILE_SAMPLE_EVERY", "0")),
+            slow_ms=float(os.environ.get("PROFILE_SLOW_MS", "500")),
+        )
+
+    def _should_sample(self):
+        if self.sample_every <= 0:
+            return False
+        self._seen += 1
+        return self._seen % self.sample_every == 0
+
+    @contextmanager
+    def profile(self, name):
+        if not self._should_sample() or not self._busy.acquire(blocking=False):
+            yield
+            return
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            yield
+        finally:
+            profiler.disable()
+            self._busy.release()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms >= self.slow_ms:
+                self._dump(profiler, name, elapsed_ms)
+
+    def _dump(self, profiler, name, elapsed_ms):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{name}-{int(time.time() * 1000)}.prof")
+        profiler.dump_stats(path)
+
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(self.top)
+        logger.warning(
+            "requete lente profilee",
+            extra={"fields": {"stage": name, "elapsed_ms": round(elapsed_ms, 1), "profile": path}},
+        )
+        logger.debug(out.getvalue())
+
+
+# Registre et profileur partagés par le processus
+METRICS = MetricsRegistry()
+PROFILER = SlowRequestProfiler.from_env()
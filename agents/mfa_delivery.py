@@ -0,0 +1,310 @@
+import asyncio
+import atexit
+import json
+import os
+import smtplib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .audit import AUDIT, ACTION
+from .email_MFA import EmailMFA
+from .log import get_logger
+from .metrics import METRICS
+from .OPT_store import OTPStore
+
+logger = get_logger("mfa_delivery")
+
+
+# -------------------------------
+# 📮 Transports
+# -------------------------------
+class SMTPTransport:
+    """
+    Envoi SMTP, une connexion persistante par thread de livraison
+    (STARTTLS + login une seule fois, reconnexion si le serveur coupe)
+    """
+
+    def __init__(self, email_from, email_password, host="smtp.gmail.com", port=587, timeout=10):
+        self.email_from = email_from
+        self.email_password = email_password
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        server.starttls()
+        server.login(self.email_from, self.email_password)
+        self._local.server = server
+        with self._lock:
+            self._connections.append(server)
+        return server
+
+    def send(self, to_email, otp):
+        msg = EmailMFA.build_message(to_email, otp, self.email_from).as_string()
+        server = getattr(self._local, "server", None) or self._connect()
+        try:
+            server.sendmail(self.email_from, to_email, msg)
+        except smtplib.SMTPServerDisconnected:
+            self._connect().sendmail(self.email_from, to_email, msg)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for server in connections:
+            try:
+                server.quit()
+            except Exception:
+                pass
+
+
+class FileTransport:
+    """Transport local (tests, développement) : un challenge JSON par ligne"""
+
+    def __init__(self, path="data/mfa_outbox.jsonl"):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def send(self, to_email, otp):
+        line = json.dumps({"to": to_email, "otp": otp, "sent_at": time.time()})
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def close(self):
+        pass
+
+
+def transport_from_env():
+    """
+    Transport configuré par l'environnement (aucun secret dans le code) :
+    MFA_TRANSPORT=file -> FileTransport, sinon SMTP avec MFA_EMAIL_FROM / MFA_EMAIL_PASSWORD
+    """
+    if os.environ.get("MFA_TRANSPORT") == "file":
+        return FileTransport(os.environ.get("MFA_OUTBOX", "data/mfa_outbox.jsonl"))
+    return SMTPTransport(
+        email_from=os.environ.get("MFA_EMAIL_FROM", ""),
+        email_password=os.environ.get("MFA_EMAIL_PASSWORD", ""),
+        host=os.environ.get("MFA_SMTP_HOST", "smtp.gmail.com"),
+        port=int(os.environ.get("MFA_SMTP_PORT", "587")),
+    )
+
+
+# -------------------------------
+# 🚚 Livraison concurrente
+# -------------------------------
+class MFADelivery:
+    """
+    Livraison MFA asynchrone, sans bloquer le scoring :
+    - submit() résout les destinataires par DID (registre, une requête par lot),
+      génère les OTP en un seul tirage et met les challenges en file, puis rend la main
+    - une boucle asyncio (thread dédié) et `workers` coroutines livrent en parallèle
+      via le transport (appels bloquants dans un pool de `workers` threads)
+    - file bornée à `max_pending` : au-delà, les challenges sont abandonnés (compteur)
+    - un même destinataire ne reçoit pas plus d'un code toutes les `cooldown` secondes
+      (fenêtre ouverte par un envoi réussi ; un challenge abandonné ou en échec ne bloque pas)
+    - l'OTP n'est enregistré (OTPStore) qu'après un envoi réussi
+    - stop() (appelé aussi à la sortie du processus) livre ce qui reste en file
+    """
+
+    def __init__(self, transport, registry=None, workers=16, max_pending=10_000, cooldown=30.0,
+                 fallback_to=None, clock=time.monotonic):
+        self.transport = transport
+        self.registry = registry
+        self.workers = workers
+        self.max_pending = max_pending
+        self.cooldown = cooldown
+        # Destinataire si le DID est inconnu du registre (None : challenge ignoré)
+        self.fallback_to = fallback_to
+        self.clock = clock
+        self._recent = OrderedDict()
+        # Destinataires dont un challenge est en file ou en cours d'envoi
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._queue = None
+        self._thread = None
+        self._executor = None
+        self._tasks = []
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.skipped = 0
+
+    # -------------------------------
+    # Cycle de vie
+    # -------------------------------
+    def start(self):
+        """Démarre la boucle de livraison (appelé automatiquement au premier submit)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mfa-send")
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), name="mfa-delivery", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        ready.wait()
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [self._loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._loop.call_soon(ready.set)
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def _shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def drain(self, timeout=None):
+        """Attend que tous les challenges en file soient livrés"""
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._queue.join(), self._loop).result(timeout)
+
+    def stop(self, timeout=30):
+        """Livre ce qui reste en file puis arrête la boucle et le transport"""
+        if self._thread is None:
+            return
+        self.drain(timeout)
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
+        self.transport.close()
+        self._thread = None
+        atexit.unregister(self.stop)
+
+    # -------------------------------
+    # Production (thread du Reactor)
+    # -------------------------------
+    def _resolve(self, dids):
+        emails = self.registry.emails_for(dids) if self.registry is not None else {}
+        return [emails.get(did) or self.fallback_to for did in dids]
+
+    def _throttle(self, recipients):
+        """
+        Un seul challenge par destinataire : ni pendant la fenêtre `cooldown` qui suit
+        un envoi réussi, ni tant qu'un challenge est déjà en file ; [(email, did), ...]
+        """
+        kept = []
+        with self._lock:
+            now = self.clock()
+            while self._recent and now - next(iter(self._recent.values())) > self.cooldown:
+                self._recent.popitem(last=False)
+            for to_email, did in recipients:
+                if to_email is None or to_email in self._recent or to_email in self._pending:
+                    continue
+                self._pending.add(to_email)
+                kept.append((to_email, did))
+        return kept
+
+    def _release(self, to_email, sent):
+        """Fin d'un challenge : ouvre la fenêtre anti-rafale seulement si l'envoi a réussi"""
+        with self._lock:
+            self._pending.discard(to_email)
+            if sent:
+                self._recent[to_email] = self.clock()
+                self._recent.move_to_end(to_email)
+
+    def submit(self, rows):
+        """
+        Met en file un challenge MFA par ligne (rows : dicts ou Series avec `did`) ;
+        retourne le nombre de challenges mis en file
+        """
+        dids = [row.get("did") for row in rows]
+        if not dids:
+            return 0
+        recipients = self._throttle(list(zip(self._resolve(dids), dids)))
+        skipped = len(dids) - len(recipients)
+        if not recipients:
+            self._count(skipped=skipped)
+            return 0
+
+        self.start()
+        otps = EmailMFA.generate_otps(len(recipients))
+        challenges = [(to_email, otp, did) for (to_email, did), otp in zip(recipients, otps)]
+        future = asyncio.run_coroutine_threadsafe(self._enqueue(challenges), self._loop)
+        queued = future.result()
+        for to_email, _, _ in challenges[queued:]:
+            self._release(to_email, sent=False)
+        self._count(queued=queued, dropped=len(challenges) - queued, skipped=skipped)
+        return queued
+
+    async def _enqueue(self, challenges):
+        queued = 0
+        for challenge in challenges:
+            try:
+                self._queue.put_nowait(challenge)
+                queued += 1
+            except asyncio.QueueFull:
+                break
+        return queued
+
+    def _count(self, queued=0, dropped=0, skipped=0):
+        with self._lock:
+            self.queued += queued
+            self.dropped += dropped
+            self.skipped += skipped
+        METRICS.inc("mfa_queued", queued)
+        if dropped:
+            METRICS.inc("mfa_dropped", dropped)
+            logger.warning("file MFA pleine, challenges abandonnes", extra={"fields": {"count": dropped}})
+        if skipped:
+            METRICS.inc("mfa_skipped", skipped)
+
+    # -------------------------------
+    # Livraison (boucle asyncio)
+    # -------------------------------
+    async def _worker(self):
+        while True:
+            to_email, otp, did = await self._queue.get()
+            try:
+                await self._loop.run_in_executor(self._executor, self._deliver, to_email, otp, did)
+            except RuntimeError:
+                # Pool déjà arrêté (fin de l'interpréteur) : livraison directe pour ne rien perdre
+                self._deliver(to_email, otp, did)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, to_email, otp, did=None):
+        try:
+            with METRICS.timer("mfa_send"):
+                self.transport.send(to_email, otp)
+        except Exception as e:
+            self._release(to_email, sent=False)
+            with self._lock:
+                self.failed += 1
+            METRICS.inc("mfa_failed")
+            logger.error("erreur envoi OTP", extra={"fields": {"to": to_email, "error": str(e)}})
+            AUDIT.record(ACTION, did=did, tier="mfa", action="mfa_failed", to=to_email)
+            return False
+
+        OTPStore.save(to_email, otp)
+        self._release(to_email, sent=True)
+        AUDIT.record(ACTION, did=did, tier="mfa", action="mfa_sent", to=to_email)
+        with self._lock:
+            self.sent += 1
+        METRICS.inc("mfa_sent")
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self.queued,
+                "sent": self.sent,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "skipped": self.skipped,
+                "pending": self._queue.qsize() if self._queue is not None else 0,
+            }
@@ -0,0 +1,198 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .bundle import save_sidecar, load_sidecar
+
+
+# Bacs par défaut pour les scores bornés dans [0, 1]
+PROBA_EDGES = list(np.linspace(0.05, 0.95, 19))
+
+PSI_ALERT = 0.2
+KS_ALERT = 0.1
+# En dessous de ce nombre d'observations, PSI/KS sont trop bruités pour alerter
+MIN_ROWS_FOR_DRIFT = 100
+EPS = 1e-6
+
+
+class FeatureHistogram:
+    """
+    Histogramme à bacs fixes (mémoire constante) :
+    - `edges` : bornes internes, len(edges) + 1 bacs (débordements inclus)
+    - mise à jour vectorisée, O(log bacs) par valeur
+    """
+
+    def __init__(self, edges):
+        self.edges = [float(e) for e in edges]
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+
+    def update_many(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if values.size:
+            idx = np.searchsorted(self.edges, values, side="right")
+            self.counts += np.bincount(idx, minlength=len(self.counts))
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def proportions(self):
+        total = self.counts.sum()
+        if total == 0:
+            return np.zeros(len(self.counts))
+        return self.counts / total
+
+
+def psi(expected, actual):
+    """Population Stability Index entre deux distributions discrétisées"""
+    e = np.clip(np.asarray(expected, dtype=float), EPS, None)
+    a = np.clip(np.asarray(actual, dtype=float), EPS, None)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def ks(expected, actual):
+    """Statistique de Kolmogorov-Smirnov approchée sur les bornes des bacs"""
+    return float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual))))
+
+
+def _quantile_edges(values, bins):
+    """Bornes internes par quantiles ; dédoublonnées pour les variables discrètes"""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return []
+    qs = np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])
+    edges = np.unique(qs)
+    # Variable binaire / quasi constante : une borne entre les valeurs observées
+    if edges.size == 0 or np.unique(values).size <= 2:
+        uniq = np.unique(values)
+        edges = (uniq[:-1] + uniq[1:]) / 2 if uniq.size > 1 else uniq
+    return edges.tolist()
+
+
+class DriftMonitor:
+    """
+    Moniteur de dérive en ligne :
+    - Histogrammes à mémoire constante des features et des scores
+      (attack_probability, anomaly_score)
+    - PSI / KS par rapport à la baseline d'entraînement sauvegardée avec le modèle
+    - Compteurs d'alertes par niveau du Reactor
+    """
+
+    def __init__(self, baseline=None):
+        self.baseline = baseline or {"edges": {}, "expected": {}}
+        self._lock = threading.Lock()
+        self.histograms = {
+            col: FeatureHistogram(edges) for col, edges in self.baseline["edges"].items()
+        }
+        self.tier_counts = {}
+        self.n_rows = 0
+
+    # -------------------------------
+    # 📐 Baseline (temps d'entraînement)
+    # -------------------------------
+    @staticmethod
+    def build_baseline(X, scores=None, bins=10):
+        """Construit la baseline (bornes + proportions attendues) à partir des données d'entraînement"""
+        columns = {col: X[col] for col in X.select_dtypes(include=["number", "bool"]).columns}
+        for name, values in (scores or {}).items():
+            columns[name] = values
+
+        edges, expected = {}, {}
+        for col, values in columns.items():
+            values = np.asarray(values, dtype=float)
+            if col == "attack_probability":
+                col_edges = PROBA_EDGES
+            else:
+                col_edges = _quantile_edges(values, bins)
+            hist = FeatureHistogram(col_edges)
+            hist.update_many(values)
+            edges[col] = hist.edges
+            expected[col] = hist.proportions().tolist()
+
+        return {"edges": edges, "expected": expected, "n_rows": int(len(X))}
+
+    @staticmethod
+    def save_baseline(model_path, baseline):
+        return save_sidecar(model_path, "baseline", baseline)
+
+    @classmethod
+    def from_model(cls, model_path):
+        """Crée un moniteur à partir de la baseline associée au modèle (vide si absente)"""
+        return cls(load_sidecar(model_path, "baseline"))
+
+    # -------------------------------
+    # 🔄 Mise à jour en ligne
+    # -------------------------------
+    def update_df(self, df):
+        """Mise à jour vectorisée pour un lot de lignes scorées"""
+        with self._lock:
+            self.n_rows += len(df)
+            for col, hist in self.histograms.items():
+                if col in df.columns:
+                    hist.update_many(pd.to_numeric(df[col], errors="coerce"))
+
+    def record_tier(self, tier, n=1):
+        with self._lock:
+            self.tier_counts[tier] = self.tier_counts.get(tier, 0) + n
+
+    def export_state(self):
+        """Comptes bruts (JSON) publiés par les consommateurs de la file"""
+        with self._lock:
+            return {
+                "histograms": {col: hist.counts.tolist() for col, hist in self.histograms.items()},
+                "tier_counts": dict(self.tier_counts),
+                "n_rows": self.n_rows,
+            }
+
+    def merge_state(self, state):
+        """Ajoute les comptes d'un autre processus (colonnes de bacs différents ignorées : autre baseline)"""
+        with self._lock:
+            self.n_rows += state["n_rows"]
+            for col, counts in state["histograms"].items():
+                hist = self.histograms.get(col)
+                if hist is not None and len(counts) == len(hist.counts):
+                    hist.counts += np.asarray(counts, dtype=np.int64)
+            for tier, count in state["tier_counts"].items():
+                self.tier_counts[tier] = self.tier_counts.get(tier, 0) + count
+        return self
+
+    # -------------------------------
+    # 📊 Snapshot
+    # -------------------------------
+    def snapshot(self):
+        """Etat courant : PSI/KS par colonne, dérive détectée, taux d'alertes par niveau"""
+        with self._lock:
+            features = {}
+            for col, hist in self.histograms.items():
+                if hist.total == 0:
+                    continue
+                expected = self.baseline["expected"][col]
+                actual = hist.proportions()
+                col_psi = psi(expected, actual)
+                col_ks = ks(expected, actual)
+                features[col] = {
+                    "count": hist.total,
+                    "psi": round(col_psi, 4),
+                    "ks": round(col_ks, 4),
+                    "drift": hist.total >= MIN_ROWS_FOR_DRIFT
+                    and (col_psi > PSI_ALERT or col_ks > KS_ALERT),
+                }
+
+            total_tiers = sum(self.tier_counts.values())
+            tiers = {
+                tier: {
+                    "count": count,
+                    "rate": round(count / total_tiers, 4) if total_tiers else 0.0,
+                }
+                for tier, count in self.tier_counts.items()
+            }
+
+            return {
+                "rows": self.n_rows,
+                "drift_detected": any(f["drift"] for f in features.values()),
+                "features": features,
+                "tiers": tiers,
+            }
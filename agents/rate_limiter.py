@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+
+ALLOW = "allow"
+MFA = "mfa"
+REJECT = "reject"
+
+_SEVERITY = {ALLOW: 0, MFA: 1, REJECT: 2}
+
+# Pénalité maximale : remplissage au plus (1 + MAX_PENALTY) fois plus lent
+MAX_PENALTY = 10.0
+
+
+class AdaptiveTokenBucket:
+    """
+    Token buckets par clé, en mémoire bornée :
+    - `rate` jetons/seconde, capacité `burst` ; mise à jour O(1) par requête
+    - sous `mfa_fraction * burst` jetons restants : MFA forcée ; plus de jeton : rejet
+    - chaque rejet ajoute une pénalité qui ralentit le remplissage (décroît avec le temps),
+      plafonnée à `max_penalty` (0 : pas de pénalité)
+    - éviction LRU au-delà de `max_keys` clés, et des clés inactives depuis `idle_ttl` secondes
+    """
+
+    def __init__(self, rate, burst, mfa_fraction=0.3, max_keys=100_000, idle_ttl=600,
+                 penalty_decay=60.0, max_penalty=MAX_PENALTY, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.mfa_fraction = mfa_fraction
+        self.max_keys = max_keys
+        self.idle_ttl = idle_ttl
+        self.penalty_decay = penalty_decay
+        self.max_penalty = max_penalty
+        self.clock = clock
+        # clé -> [jetons, dernier accès, pénalité]
+        self._state = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        while self._state:
+            _, last, _ = next(iter(self._state.values()))
+            if len(self._state) > self.max_keys or now - last > self.idle_ttl:
+                self._state.popitem(last=False)
+            else:
+                break
+
+    def hit(self, key, cost=1.0):
+        """Consomme `cost` jetons pour `key` et retourne ALLOW, MFA ou REJECT"""
+        now = self.clock()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                state = self._state[key] = [float(self.burst), now, 0.0]
+            else:
+                self._state.move_to_end(key)
+                elapsed = now - state[1]
+                state[2] = max(0.0, state[2] - elapsed / self.penalty_decay)
+                state[0] = min(self.burst, state[0] + elapsed * self.rate / (1.0 + state[2]))
+                state[1] = now
+
+            if state[0] < cost:
+                state[2] = min(state[2] + 1.0, self.max_penalty)
+                decision = REJECT
+            else:
+                state[0] -= cost
+                decision = MFA if state[0] < self.mfa_fraction * self.burst else ALLOW
+
+            self._evict(now)
+            return decision
+
+    def __len__(self):
+        return len(self._state)
+
+
+class AuthRateLimiter:
+    """
+    Limiteur combiné IP + DID : la décision la plus sévère des deux l'emporte.
+    Le bucket DID se vide depuis n'importe quelle IP : il n'est pas pénalisé par défaut
+    et sa décision est plafonnée à MFA, seul le bucket IP peut rejeter. Sinon un attaquant
+    qui change d'IP verrouillerait le vrai propriétaire du DID (429 en continu).
+    """
+
+    def __init__(self, ip_rate=1.0, ip_burst=20, did_rate=0.2, did_burst=10, did_max_penalty=0.0, **kwargs):
+        self.by_ip = AdaptiveTokenBucket(ip_rate, ip_burst, **kwargs)
+        self.by_did = AdaptiveTokenBucket(did_rate, did_burst, **{**kwargs, "max_penalty": did_max_penalty})
+
+    def check(self, ip, did=None):
+        decision = self.by_ip.hit(ip)
+        if decision == REJECT or did is None:
+            # Rejet par IP : on ne pénalise pas le DID visé
+            return decision
+        did_decision = min(self.by_did.hit(did), MFA, key=_SEVERITY.get)
+        return max(decision, did_decision, key=_SEVERITY.get)
@@ -1,22 +1,56 @@
+import os
 import smtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+from .audit import AUDIT, ACTION
+from .calibration import CRITICAL_THRESHOLD, MFA_THRESHOLD
+from .explain import format_explanation
+from .log import get_logger
+from .metrics import METRICS
 from .security_action import SecurityActions
 
+logger = get_logger("reactor")
+
+
+# Compte d'envoi des OTP (MFA synchrone, sans MFADelivery) : lu dans l'environnement
+MFA_EMAIL_FROM = os.environ.get("MFA_EMAIL_FROM", "")
+MFA_EMAIL_PASSWORD = os.environ.get("MFA_EMAIL_PASSWORD", "")
+
+# Une seule alerte par campagne pendant cette durée (secondes)
+CAMPAIGN_ALERT_COOLDOWN = 900
+
 
 class Reactor:
 
-    def __init__(self, email_from, email_password, email_to):
+    def __init__(self, email_from, email_password, email_to, monitor=None, mfa=None, campaign=None):
         self.email_from = email_from
         self.email_password = email_password
         self.email_to = email_to
+        # DriftMonitor optionnel : distributions des scores + taux d'alertes par niveau
+        self.monitor = monitor
+        # MFADelivery optionnel : challenges MFA envoyés en lot, hors de la boucle de réaction
+        self.mfa = mfa
+        # CampaignCorrelator optionnel : issues enregistrées par composante, alertes groupées
+        self.campaign = campaign
+        self._alerted_campaigns = {}
+
+    @staticmethod
+    def tier(prob):
+        """Niveau de réaction pour une probabilité brute (sans table de calibration)"""
+        if prob > CRITICAL_THRESHOLD:
+            return "critique"
+        if prob >= MFA_THRESHOLD:
+            return "mfa"
+        return "normal"
 
     def send_alert_email(self, row):
         ip = row.get("source_ip", "non-disponible")
         ua = row.get("user_agent", "non-disponible")
         attempts = row.get("attempts", "N/A")
         prob = round(row["attack_probability"], 3)
+        explanation = format_explanation(row.get("explanation"))
 
         subject = "Alerte Sécurité — Attaque détectée"
         body = (
@@ -25,10 +59,50 @@ class Reactor:
             f"- IP source : {ip}\n"
             f"- Probabilité d'attaque : {prob}\n"
             f"- User-Agent : {ua}\n"
-            f"- Nombre de tentatives : {attempts}\n\n"
+            f"- Nombre de tentatives : {attempts}\n"
+            f"- Principaux facteurs (contribution au score) : {explanation}\n\n"
             f"Veuillez vérifier immédiatement."
         )
 
+        sent = self._send_email(subject, body)
+        if sent:
+            logger.info("alerte envoyee", extra={"fields": {"source_ip": ip, "attack_probability": prob}})
+        AUDIT.record(
+            ACTION, source_ip=row.get("source_ip"), did=row.get("did"), user_agent=row.get("user_agent"),
+            tier="critique", attack_probability=prob, action="alert_email", sent=sent,
+        )
+
+    def send_campaign_email(self, campaign, rows):
+        """Une alerte pour toute une campagne (composante IP <-> DID <-> UA)"""
+        top = max(rows, key=lambda r: r["attack_probability"])
+        explanation = format_explanation(top.get("explanation"))
+
+        subject = "Alerte Sécurité — Campagne d'attaque détectée"
+        body = (
+            f"Une campagne d'attaque coordonnée vient d'être détectée \n\n"
+            f"Détails :\n"
+            f"- Événements critiques dans ce lot : {len(rows)}\n"
+            f"- IPs impliquées : {campaign['ips']} (ex. {', '.join(campaign['sample_ips'])})\n"
+            f"- DIDs visés : {campaign['dids']} (ex. {', '.join(campaign['sample_dids'])})\n"
+            f"- Familles d'User-Agent : {', '.join(campaign['sample_user_agents']) or 'non-disponible'}\n"
+            f"- Taux d'attaque prédit de la campagne : {campaign['attack_rate']} "
+            f"({campaign['attacks']}/{campaign['events']} événements)\n"
+            f"- Probabilité d'attaque max : {round(top['attack_probability'], 3)}\n"
+            f"- Principaux facteurs (contribution au score) : {explanation}\n\n"
+            f"Les événements suivants de cette campagne ne seront pas réalertés "
+            f"pendant {CAMPAIGN_ALERT_COOLDOWN // 60} minutes.\n"
+            f"Veuillez vérifier immédiatement."
+        )
+        sent = self._send_email(subject, body)
+        if sent:
+            logger.info("alerte campagne envoyee", extra={"fields": {**campaign, "critical_events": len(rows)}})
+        AUDIT.record(
+            ACTION, source_ip=top.get("source_ip"), did=top.get("did"), user_agent=top.get("user_agent"),
+            tier="critique", attack_probability=top["attack_probability"], action="campaign_alert",
+            sent=sent, critical_events=len(rows), campaign=campaign,
+        )
+
+    def _send_email(self, subject, body):
         msg = MIMEMultipart()
         msg["From"] = self.email_from
         msg["To"] = self.email_to
@@ -41,46 +115,98 @@ class Reactor:
             server.login(self.email_from, self.email_password)
             server.sendmail(self.email_from, self.email_to, msg.as_string())
             server.quit()
-            print(" Alerte envoyée avec succès.")
+            return True
         except Exception as e:
-            print(" Erreur lors de l'envoi du mail :", e)
+            logger.error("erreur envoi alerte", extra={"fields": {"error": str(e)}})
+            return False
+
+    def alert_campaigns(self, rows):
+        """
+        Regroupe les événements critiques par campagne (composante à plusieurs IPs) :
+        un email par campagne, puis silence pendant CAMPAIGN_ALERT_COOLDOWN (même si la
+        campagne s'étend). Une IP isolée garde l'alerte par événement, sans silence.
+        """
+        now = time.monotonic()
+        self._alerted_campaigns = {
+            key: t for key, t in self._alerted_campaigns.items() if now - t < CAMPAIGN_ALERT_COOLDOWN
+        }
+
+        groups = {}
+        for row in rows:
+            key = self.campaign.campaign_of(str(row.get("source_ip")))
+            groups.setdefault(key, []).append(row)
+
+        for key, group in groups.items():
+            campaign = self.campaign.describe(key) if key is not None else None
+            if campaign is None or campaign["ips"] <= 1:
+                # Événements d'une IP isolée : alerte classique
+                for row in group:
+                    self.send_alert_email(row)
+                continue
+            if any(self.campaign.same_campaign(key, alerted) for alerted in self._alerted_campaigns):
+                METRICS.inc("campaign_alerts_suppressed", len(group))
+                AUDIT.record(
+                    ACTION, source_ip=group[0].get("source_ip"), did=group[0].get("did"), tier="critique",
+                    action="campaign_alert_suppressed", critical_events=len(group),
+                )
+                continue
+
+            self._alerted_campaigns[key] = now
+            METRICS.inc("campaign_alerts")
+            self.send_campaign_email(campaign, group)
 
     def react(self, prediction_df):
+        if self.monitor is not None:
+            self.monitor.update_df(prediction_df)
 
-        print("\n=== RÉACTEUR : ANALYSE DE SÉCURITÉ ===")
+        if self.campaign is not None and "source_ip" in prediction_df.columns:
+            self.campaign.record(prediction_df, prediction_df["is_attack_pred"].to_numpy())
 
+        tiers = []
+        mfa_rows = []
+        critical_rows = []
         for _, row in prediction_df.iterrows():
             prob = row["attack_probability"]
-            print("\n--- Résultat ---")
-            print(f"Probabilité d'attaque : {round(prob, 3)}")
+            # Niveau précalculé par la table de calibration du modèle, sinon seuils fixes
+            tier = row["tier"] if "tier" in row else self.tier(prob)
+            tiers.append(tier)
+            if self.monitor is not None:
+                self.monitor.record_tier(tier)
+
+            fields = {"attack_probability": round(float(prob), 3), "tier": tier}
+            if tier != "normal" and row.get("explanation"):
+                fields["explanation"] = row["explanation"]
+            logger.info("decision", extra={"fields": fields})
 
             # =======================
             # MENACE CRITIQUE
             # =======================
-            if prob > 0.75:
-                print(" ATTACK CRITIQUE")
-                print("Action : Envoi d’un mail d’alerte")
+            if tier == "critique" and self.campaign is not None:
+                critical_rows.append(row)
+
+            elif tier == "critique":
                 self.send_alert_email(row)
 
             # =======================
             # RISQUE MODÉRÉ → MFA
             # =======================
-            elif 0.4 <= prob <= 0.75:
-                print("RISQUE MODÉRÉ : MFA")
+            elif tier == "mfa" and self.mfa is not None:
+                mfa_rows.append(row)
+
+            elif tier == "mfa":
                 mfa_ok = SecurityActions.trigger_mfa_email(
                     row,
-                    email_from="nouha.hadhri@enis.tn",
-                    email_password="pgnesdsamjdymahx"
+                    email_from=MFA_EMAIL_FROM,
+                    email_password=MFA_EMAIL_PASSWORD
                 )
 
-                if mfa_ok:
-                    print(" En attente de validation MFA utilisateur...")
-                else:
-                    print(" MFA non déclenché")
+                if not mfa_ok:
+                    logger.warning("MFA non declenche", extra={"fields": {"attack_probability": float(prob)}})
 
-            # =======================
-            # TRAFIC NORMAL
-            # =======================
-            else:
-                print(" TRAFIC NORMAL")
-                print("Aucune action requise")
+            # Trafic normal : aucune action requise
+
+        AUDIT.record_predictions(prediction_df, tiers=tiers)
+        if critical_rows:
+            self.alert_campaigns(critical_rows)
+        if mfa_rows:
+            self.mfa.submit(mfa_rows)
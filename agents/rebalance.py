@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from sklearn.neighbors import NearestNeighbors
+
+from .log import get_logger
+
+logger = get_logger("rebalance")
+
+STRATEGIES = ("none", "weights", "undersample", "smote_sample", "smote")
+
+
+def split_xy(df):
+    """Features numériques et label, comme attendu par les détecteurs"""
+    X = df.select_dtypes(include=['int64', 'float64']).drop(columns=['is_attack'], errors='ignore')
+    y = df['is_attack'].astype(int)
+    return X, y
+
+
+def class_weights(y):
+    """Poids par échantillon inversement proportionnels à la fréquence de la classe"""
+    y = np.asarray(y)
+    counts = np.bincount(y, minlength=2).astype(float)
+    weights = len(y) / (2 * np.clip(counts, 1, None))
+    return weights[y]
+
+
+def undersample(X, y, ratio=1.0, random_state=42):
+    """Sous-échantillonne la classe majoritaire jusqu'à minoritaire / majoritaire = ratio"""
+    rng = np.random.default_rng(random_state)
+    y = np.asarray(y)
+    minority = int(np.argmin(np.bincount(y, minlength=2)))
+    idx_min = np.flatnonzero(y == minority)
+    idx_maj = np.flatnonzero(y != minority)
+
+    n_keep = min(len(idx_maj), int(np.ceil(len(idx_min) / ratio)))
+    keep = np.sort(np.concatenate([idx_min, rng.choice(idx_maj, size=n_keep, replace=False)]))
+    return X.iloc[keep].reset_index(drop=True), pd.Series(y[keep], name='is_attack')
+
+
+def smote_sampled(X, y, ratio=1.0, k_neighbors=5, max_minority=5000, random_state=42):
+    """
+    SMOTE approché :
+    - l'index k-NN est construit sur un sous-ensemble d'au plus `max_minority` lignes minoritaires
+    - on génère juste assez de points pour atteindre minoritaire / majoritaire = ratio
+    """
+    rng = np.random.default_rng(random_state)
+    y = np.asarray(y)
+    minority = int(np.argmin(np.bincount(y, minlength=2)))
+    idx_min = np.flatnonzero(y == minority)
+    n_needed = int(ratio * (len(y) - len(idx_min))) - len(idx_min)
+    if n_needed <= 0 or len(idx_min) < 2:
+        return X.reset_index(drop=True), pd.Series(y, name='is_attack')
+
+    if len(idx_min) > max_minority:
+        idx_min = rng.choice(idx_min, size=max_minority, replace=False)
+    base = X.iloc[idx_min].to_numpy(dtype=float)
+
+    k = min(k_neighbors, len(base) - 1)
+    _, neighbors = NearestNeighbors(n_neighbors=k + 1).fit(base).kneighbors(base)
+
+    seeds = rng.integers(0, len(base), size=n_needed)
+    picks = neighbors[seeds, rng.integers(1, k + 1, size=n_needed)]
+    gaps = rng.random((n_needed, 1))
+    synthetic = base[seeds] + gaps * (base[picks] - base[seeds])
+
+    X_res = pd.concat([X, pd.DataFrame(synthetic, columns=X.columns)], ignore_index=True)
+    y_res = pd.Series(np.concatenate([y, np.full(n_needed, minority)]), name='is_attack')
+    return X_res, y_res
+
+
+def smote_full(X, y, random_state=42):
+    """SMOTE complet (imblearn) sur toute la matrice — comportement historique"""
+    from imblearn.over_sampling import SMOTE
+
+    X_res, y_res = SMOTE(random_state=random_state).fit_resample(X, y)
+    return X_res, pd.Series(np.asarray(y_res), name='is_attack')
+
+
+def plot_distribution(y, path, title):
+    plt.figure(figsize=(5, 4))
+    pd.Series(y).value_counts().plot(kind='bar', color=['#3498db', '#e74c3c'])
+    plt.title(title)
+    plt.xlabel("Classe (is_attack)")
+    plt.ylabel("Nombre d'échantillons")
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def rebalance(df, strategy="smote", random_state=42, plot_path=None, **options):
+    """
+    Etape de rééquilibrage des classes, retourne (X, y, fit_params) :
+    - none         : données inchangées
+    - weights      : données inchangées, poids par échantillon dans fit_params["sample_weight"]
+    - undersample  : sous-échantillonnage aléatoire de la classe majoritaire
+    - smote_sample : SMOTE approché (k-NN sur un sous-ensemble de la classe minoritaire)
+    - smote        : SMOTE complet (imblearn)
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Stratégie de rééquilibrage inconnue : {strategy} (parmi {STRATEGIES})")
+
+    X, y = split_xy(df)
+    before = y.value_counts().to_dict()
+    fit_params = {}
+
+    if strategy == "weights":
+        fit_params["sample_weight"] = class_weights(y)
+    elif strategy == "undersample":
+        X, y = undersample(X, y, random_state=random_state, **options)
+    elif strategy == "smote_sample":
+        X, y = smote_sampled(X, y, random_state=random_state, **options)
+    elif strategy == "smote":
+        X, y = smote_full(X, y, random_state=random_state)
+
+    logger.info(
+        "reequilibrage",
+        extra={"fields": {"strategy": strategy, "before": before, "after": y.value_counts().to_dict()}},
+    )
+
+    if plot_path and strategy in ("undersample", "smote_sample", "smote"):
+        plot_distribution(y, plot_path, f"Distribution des classes après {strategy}")
+
+    return X, y, fit_params
@@ -0,0 +1,175 @@
+import hashlib
+import os
+
+import joblib
+import numpy as np
+
+from .bundle import save_sidecar
+
+# Colonnes standardisées par le collector
+SCALED_COLUMNS = ["response_time_ms", "attempts"]
+
+
+def _stats(X):
+    """(effectif, moyenne, somme des carrés des écarts) d'un lot"""
+    if len(X) == 0:
+        return 0, np.zeros(X.shape[1]), np.zeros(X.shape[1])
+    mean = X.mean(axis=0)
+    return len(X), mean, ((X - mean) ** 2).sum(axis=0)
+
+
+def _merge(a, b):
+    """Fusion de deux jeux de statistiques (Chan et al.)"""
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    total = n_a + n_b
+    if total == 0:
+        return a
+    delta = mean_b - mean_a
+    return total, mean_a + delta * (n_b / total), m2_a + m2_b + delta ** 2 * (n_a * n_b / total)
+
+
+def _digest(X):
+    return hashlib.blake2b(np.ascontiguousarray(X).tobytes(), digest_size=16).hexdigest()
+
+
+class StreamingScaler:
+    """
+    Standardisation (x - moyenne) / écart-type, mise à jour en flux :
+    - partial_fit() fusionne les statistiques d'un lot (Welford / Chan) sans garder les données
+    - update_source() ne fusionne que les lignes d'une source (fichier d'entrée) jamais vues :
+      chaque ligne n'est comptée qu'une fois, même si le fichier est relu après ajout
+    - transform() applique la standardisation en place sur un tableau float64
+    - `version` change à chaque mise à jour ; une copie figée est sauvegardée avec le modèle
+    Mêmes conventions que StandardScaler (variance de population, écart-type nul -> 1).
+    """
+
+    def __init__(self, columns=SCALED_COLUMNS):
+        self.columns = list(columns)
+        # Statistiques des lots fusionnés par partial_fit(), hors sources
+        self.loose = _stats(np.empty((0, len(self.columns))))
+        # source -> {"rows", "digest", "stats"} : lignes absorbées et empreinte de ce préfixe
+        self.sources = {}
+        self.version = 0
+        self._recompute()
+
+    def _recompute(self):
+        n, mean, m2 = self.loose
+        for state in self.sources.values():
+            n, mean, m2 = _merge((n, mean, m2), state["stats"])
+        self.n_samples, self.mean, self.m2 = n, mean, m2
+        self._refresh()
+
+    def _refresh(self):
+        var = self.m2 / self.n_samples if self.n_samples else np.ones(len(self.columns))
+        scale = np.sqrt(var)
+        scale[scale == 0] = 1.0
+        self.scale = scale
+        self._inv_scale = 1.0 / scale
+
+    def _as_matrix(self, X):
+        return np.asarray(X, dtype=np.float64).reshape(-1, len(self.columns))
+
+    # -------------------------------
+    # 📈 Mise à jour
+    # -------------------------------
+    def partial_fit(self, X):
+        """Fusionne moyenne et variance d'un lot (colonnes dans l'ordre de `columns`)"""
+        X = self._as_matrix(X)
+        if len(X) == 0:
+            return self
+        self.loose = _merge(self.loose, _stats(X))
+        self.version += 1
+        self._recompute()
+        return self
+
+    def update_source(self, source, X):
+        """
+        Absorbe les lignes de `source` (dans l'ordre du fichier) :
+        - préfixe déjà absorbé inchangé (même empreinte) : seule la fin nouvelle est fusionnée
+        - préfixe modifié (édition, suppression) : statistiques de la source recalculées
+        Retourne True si le scaler a changé
+        """
+        X = self._as_matrix(X)
+        state = self.sources.get(source)
+        rows = state["rows"] if state is not None else 0
+        if state is not None and rows <= len(X) and _digest(X[:rows]) == state["digest"]:
+            if rows == len(X):
+                return False
+            stats = _merge(state["stats"], _stats(X[rows:]))
+        else:
+            stats = _stats(X)
+
+        self.sources[source] = {"rows": len(X), "digest": _digest(X), "stats": stats}
+        self.version += 1
+        self._recompute()
+        return True
+
+    # -------------------------------
+    # ⚙️ Application
+    # -------------------------------
+    def transform(self, X, copy=True):
+        """Standardise X ; avec copy=False et un tableau float64, modifié en place sans copie"""
+        X = np.array(X, dtype=np.float64) if copy else np.asarray(X, dtype=np.float64)
+        np.subtract(X, self.mean, out=X)
+        np.multiply(X, self._inv_scale, out=X)
+        return X
+
+    def inverse_transform(self, X, copy=True):
+        X = np.array(X, dtype=np.float64) if copy else np.asarray(X, dtype=np.float64)
+        np.multiply(X, self.scale, out=X)
+        np.add(X, self.mean, out=X)
+        return X
+
+    def transform_frame(self, df):
+        """
+        Standardise les colonnes `columns` d'un DataFrame : une extraction des colonnes
+        (copie imposée par pandas), puis standardisation en place sur ce tableau
+        """
+        values = df[self.columns].to_numpy(dtype=np.float64)
+        if not values.flags.writeable:
+            values = values.copy()
+        df[self.columns] = self.transform(values, copy=False)
+        return df
+
+    def same_scaling(self, other):
+        """Même standardisation (moyenne et écart-type) qu'un autre scaler"""
+        return (
+            other is not None and self.columns == other.columns
+            and np.array_equal(self.mean, other.mean) and np.array_equal(self.scale, other.scale)
+        )
+
+    # -------------------------------
+    # 💾 Persistance
+    # -------------------------------
+    @classmethod
+    def from_sklearn(cls, scaler, columns=SCALED_COLUMNS):
+        """Reprend les statistiques d'un StandardScaler sauvegardé par une version antérieure"""
+        new = cls(columns)
+        n_samples = int(np.max(scaler.n_samples_seen_))
+        mean = np.asarray(scaler.mean_, dtype=np.float64)
+        new.loose = (n_samples, mean, np.asarray(scaler.var_, dtype=np.float64) * n_samples)
+        new.version = 1
+        new._recompute()
+        return new
+
+    @classmethod
+    def load(cls, path):
+        """Scaler sauvegardé (StandardScaler hérité converti), ou None"""
+        if not os.path.exists(path):
+            return None
+        scaler = joblib.load(path)
+        if not isinstance(scaler, cls):
+            scaler = cls.from_sklearn(scaler)
+        return scaler
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        joblib.dump(self, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def save_with_model(self, model_path):
+        """Copie figée rangée avec le modèle (sidecar) : le scoring utilise le scaler de l'entraînement"""
+        return save_sidecar(model_path, "scaler", self)
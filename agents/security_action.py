@@ -1,29 +1,54 @@
 from .OPT_store import OTPStore
+from .audit import AUDIT, ACTION
+from .did_registry import DIDRegistry
 from .email_MFA import EmailMFA
+from .log import get_logger
+
+logger = get_logger("security")
 
 class SecurityActions:
+    _registry = None
+
+    @staticmethod
+    def registry():
+        """Registre DID partagé (ouvert au premier besoin)"""
+        if SecurityActions._registry is None:
+            SecurityActions._registry = DIDRegistry()
+        return SecurityActions._registry
 
     @staticmethod
-    def trigger_mfa_email(row, email_from, email_password):
-        # Email statique pour MFA
-        to_email = "nouha.hadhri@enis.tn"
+    def trigger_mfa_email(row, email_from, email_password, registry=None):
+        """Envoi MFA synchrone (un seul challenge) ; voir MFADelivery pour l'envoi en lot"""
+        # Destinataire : email enregistré pour le DID de la tentative
+        registry = registry or SecurityActions.registry()
+        to_email = registry.email_for(row.get("did"))
+        if to_email is None:
+            logger.warning("aucun email MFA pour ce DID", extra={"fields": {"did": row.get("did")}})
+            AUDIT.record(ACTION, source_ip=row.get("source_ip"), did=row.get("did"), action="mfa_no_recipient")
+            return False
 
         otp = EmailMFA.generate_otp()
         sent = EmailMFA.send_email(to_email, otp, email_from, email_password)
+        AUDIT.record(
+            ACTION, source_ip=row.get("source_ip"), did=row.get("did"), tier="mfa",
+            action="mfa_sent" if sent else "mfa_failed", to=to_email,
+        )
 
         if sent:
             OTPStore.save(to_email, otp)
-            print("OTP généré automatiquement et envoyé à", to_email)
+            logger.info("OTP genere et envoye", extra={"fields": {"to": to_email}})
             return True
 
-        print("Erreur lors de l'envoi du mail")
+        logger.warning("erreur envoi OTP", extra={"fields": {"to": to_email}})
         return False
 
     @staticmethod
     def verify_mfa_email(email, code):
-        if OTPStore.verify(email, code):
-            print("MFA validé ✔️")
+        valid = OTPStore.verify(email, code)
+        AUDIT.record(ACTION, action="mfa_verified" if valid else "mfa_invalid", email=email)
+        if valid:
+            logger.info("MFA valide", extra={"fields": {"email": email}})
             return True
         else:
-            print("Code MFA invalide ❌")
+            logger.warning("code MFA invalide", extra={"fields": {"email": email}})
             return False
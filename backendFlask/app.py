@@ -1,4 +1,6 @@
-from flask import Flask, request, jsonify
+import os
+import sys
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
 import uuid
 import requests
@@ -7,24 +9,63 @@ from eth_account.messages import encode_defunct
 from eth_account import Account
 from web3 import Web3
 
+# Accès aux agents partagés (metrics, logs) depuis backendFlask/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agents.audit import AUDIT, AUTH_EVENT
+from agents.did_registry import DIDRegistry
+from agents.log import get_logger
+from agents.event_queue import EventQueue, QueueFull
+from agents.metrics import METRICS, PROFILER
+from agents.mfa_delivery import MFADelivery, transport_from_env
+from agents.rate_limiter import AuthRateLimiter, MFA, REJECT
+from agents.security_action import SecurityActions
+
 app = Flask(__name__)
 CORS(app)
 
-# Stockage en mémoire
-users = {}
+# DIDs persistés (registre partagé avec le Reactor pour l'email MFA), cache en mémoire
+registry = DIDRegistry()
+users = registry.load_all()
 challenges = {}
 w3 = Web3()
 
 # URL de votre API d'analyse AI
 AI_ANALYSIS_URL = "http://localhost:5000/analyze"
 
+# Mode d'analyse : "sync" (appel HTTP à /analyze, une attaque détectée bloque le login : 403)
+# ou "queue" (file durable consommée par consumer.py : scoring, alertes et MFA asynchrones,
+# aucun blocage du login en cours, le résultat ne revient pas à /auth/verify)
+AI_PIPELINE = os.environ.get("AI_PIPELINE", "sync")
+event_queue = EventQueue() if AI_PIPELINE == "queue" else None
+
+logger = get_logger("auth")
+
+LOCAL_ADDRS = {"127.0.0.1", "::1"}
+
+# Limitation de débit par IP et par DID, appliquée avant tout traitement coûteux
+limiter = AuthRateLimiter()
+
+# MFA forcée par le limiteur : OTP envoyé à l'email enregistré du DID, validé par /auth/mfa/verify
+mfa = MFADelivery(transport_from_env(), registry=registry)
+MFA_MAX_ATTEMPTS = 5
+
+def rate_limited_response():
+    """Rejet bon marché (aucun appel géoloc / ECDSA / IA)"""
+    METRICS.inc("rate_limited_rejects")
+    return jsonify({
+        "authenticated": False,
+        "reason": "Trop de requêtes, réessayez plus tard"
+    }), 429, {"Retry-After": "5"}
+
 def send_to_ai_analysis(auth_data):
     """Envoie les données d'authentification vers l'API d'analyse AI"""
     try:
-        response = requests.post(AI_ANALYSIS_URL, json=auth_data, timeout=5)
+        with METRICS.timer("ai_round_trip"):
+            response = requests.post(AI_ANALYSIS_URL, json=auth_data, timeout=5)
         return response.json()
     except Exception as e:
-        print(f" Erreur envoi vers AI: {e}")
+        METRICS.inc("ai_errors")
+        logger.warning("erreur envoi vers AI", extra={"fields": {"error": str(e)}})
         return None
 
 @app.route("/auth/register", methods=["POST"])
@@ -35,6 +76,8 @@ def register():
     did = data.get("did")
     public_keys = data.get("publicKeys")
     quorum = data.get("quorum")
+    # Email de contact pour les challenges MFA (optionnel)
+    email = data.get("email")
     
     if not did or not public_keys or not isinstance(public_keys, list):
         return jsonify({"error": "DID et publicKeys requis"}), 400
@@ -44,9 +87,11 @@ def register():
             "error": f"Quorum doit être entre 1 et {len(public_keys)}"
         }), 400
     
+    registry.register(did, public_keys, quorum, email=email)
     users[did] = {
         "publicKeys": public_keys,
-        "quorum": quorum
+        "quorum": quorum,
+        "email": email
     }
     
     return jsonify({
@@ -58,7 +103,13 @@ def register():
 def get_challenge(did):
     """Demander un challenge (début login)"""
     if did not in users:
+        # DID inconnu : limité par IP seulement (aucun bucket créé pour un DID arbitraire)
+        if limiter.check(request.remote_addr) == REJECT:
+            return rate_limited_response()
         return jsonify({"error": "DID inconnu"}), 404
+
+    if limiter.check(request.remote_addr, did) == REJECT:
+        return rate_limited_response()
     
     nonce = str(uuid.uuid4())
     challenges[did] = {
@@ -76,7 +127,8 @@ def get_geo_from_ip(ip):
     """Obtenir la géolocalisation à partir de l'IP"""
     try:
         # API gratuite ipapi.co (limite: 1000 requêtes/jour)
-        response = requests.get(f"https://ipapi.co/{ip}/json/", timeout=2)
+        with METRICS.timer("geo_lookup"):
+            response = requests.get(f"https://ipapi.co/{ip}/json/", timeout=2)
         if response.status_code == 200:
             data = response.json()
             return data.get('country_name', 'Unknown')
@@ -87,6 +139,36 @@ def get_geo_from_ip(ip):
 @app.route("/auth/verify", methods=["POST"])
 def verify():
     """Vérifier signatures (preuve DID + quorum)"""
+    with PROFILER.profile("verify"), METRICS.timer("verify_total"):
+        result = _verify()
+    audit_verify(result)
+    return result
+
+
+def audit_verify(result):
+    """Journal d'audit : une ligne par tentative, quelle que soit l'issue"""
+    response, status = (result[0], result[1]) if isinstance(result, tuple) else (result, 200)
+    body = response.get_json(silent=True) or {}
+    data = request.get_json(silent=True) or {}
+    auth_log = g.get("auth_log") or {}
+    AUDIT.record(
+        AUTH_EVENT,
+        source_ip=request.remote_addr,
+        did=data.get("did"),
+        user_agent=request.headers.get('User-Agent', 'Unknown'),
+        attack_probability=body.get("attack_probability"),
+        action="authenticated" if body.get("authenticated") else "rejected",
+        status=status,
+        reason=body.get("reason") or body.get("error"),
+        mfa_required=body.get("mfa_required", False),
+        attempts=auth_log.get("attempts"),
+        geo=auth_log.get("geo"),
+        valid_signatures=auth_log.get("valid_signatures"),
+        response_time_ms=auth_log.get("response_time_ms"),
+    )
+
+
+def _verify():
     start_time = datetime.now()
     data = request.get_json()
     
@@ -96,8 +178,19 @@ def verify():
     # Récupérer les infos de la requête
     source_ip = request.remote_addr
     user_agent = request.headers.get('User-Agent', 'Unknown')
+
+    # 🚦 Limitation de débit : rejet immédiat, ou MFA forcée sans géoloc ni appel au modèle ;
+    # le bucket DID n'est consulté que pour un DID enregistré
+    decision = limiter.check(source_ip, did if did in users else None)
+    if decision == REJECT:
+        return rate_limited_response()
+    forced_mfa = decision == MFA
+
     # ✅ Obtenir la géolocalisation
-    geo = get_geo_from_ip(source_ip) if source_ip != "127.0.0.1" else "Local"
+    if forced_mfa:
+        geo = "Unknown"
+    else:
+        geo = get_geo_from_ip(source_ip) if source_ip != "127.0.0.1" else "Local"
     
     challenge_data = challenges.get(did)
     if not challenge_data:
@@ -113,21 +206,51 @@ def verify():
     valid_count = 0
     valid_keys = []
     
-    for proof in signatures:
-        entry = next((k for k in user["publicKeys"] if k["id"] == proof["keyId"]), None)
-        if not entry:
-            continue
-        
-        try:
-            message = encode_defunct(text=nonce)
-            recovered_address = Account.recover_message(message, signature=proof["signature"])
-            
-            if recovered_address.lower() == entry["key"].lower():
-                valid_count += 1
-                valid_keys.append(proof["keyId"])
-        except Exception as e:
-            print(f"Erreur vérification {proof['keyId']}: {str(e)}")
+    with METRICS.timer("signature_recovery"):
+        for proof in signatures:
+            entry = next((k for k in user["publicKeys"] if k["id"] == proof["keyId"]), None)
+            if not entry:
+                continue
+
+            try:
+                message = encode_defunct(text=nonce)
+                recovered_address = Account.recover_message(message, signature=proof["signature"])
+
+                if recovered_address.lower() == entry["key"].lower():
+                    valid_count += 1
+                    valid_keys.append(proof["keyId"])
+            except Exception as e:
+                logger.info(
+                    "erreur verification signature",
+                    extra={"fields": {"did": did, "key_id": proof["keyId"], "error": str(e)}},
+                )
     
+    if forced_mfa:
+        METRICS.inc("rate_limited_mfa")
+        logger.info(
+            "MFA forcee par limitation de debit",
+            extra={"fields": {"did": did, "source_ip": source_ip, "valid_signatures": valid_count}},
+        )
+        if valid_count >= required:
+            if not registry.email_for(did):
+                # Aucun email enregistré : pas d'OTP possible, simple rejet temporaire
+                return rate_limited_response()
+            # Signatures valides : OTP envoyé (hors requête), login finalisé par /auth/mfa/verify
+            mfa.submit([{"did": did}])
+            challenge_data["mfa_pending"] = True
+            challenge_data["mfa_attempts"] = 0
+            challenge_data["valid_keys"] = valid_keys
+            return jsonify({
+                "authenticated": False,
+                "mfa_required": True,
+                "reason": "Trop de tentatives récentes : code MFA envoyé à l'email enregistré, "
+                          "à valider via /auth/mfa/verify"
+            }), 401
+        return jsonify({
+            "authenticated": False,
+            "reason": f"Quorum non atteint ({valid_count}/{required})"
+        })
+
     # Calculer le temps de réponse
     end_time = datetime.now()
     response_time_ms = int((end_time - start_time).total_seconds() * 1000)
@@ -147,8 +270,20 @@ def verify():
         "geo": geo  
     }
     
-    # 🤖 Envoyer vers l'analyse AI (asynchrone)
-    ai_result = send_to_ai_analysis(auth_log)
+    g.auth_log = auth_log
+
+    # 🤖 Analyse AI : mise en file durable (n'attend pas le modèle) ou appel synchrone
+    ai_result = None
+    if event_queue is not None:
+        try:
+            with METRICS.timer("enqueue"):
+                event_queue.enqueue(auth_log)
+        except QueueFull as e:
+            # Contre-pression : l'authentification continue, l'événement n'est pas analysé
+            METRICS.inc("queue_full_drops")
+            logger.warning("file d'analyse pleine", extra={"fields": {"did": did, "error": str(e)}})
+    else:
+        ai_result = send_to_ai_analysis(auth_log)
     
     # Vérifier si c'est une attaque détectée
     if ai_result and ai_result.get("status") == "success":
@@ -158,7 +293,11 @@ def verify():
             attack_prob = predictions[0].get("attack_probability", 0)
             
             if is_attack:
-                print(f"  ATTAQUE DÉTECTÉE! Probabilité: {attack_prob}")
+                METRICS.inc("attacks_blocked")
+                logger.warning(
+                    "attaque detectee",
+                    extra={"fields": {"did": did, "source_ip": source_ip, "attack_probability": attack_prob}},
+                )
                 # Tu peux bloquer l'authentification ici
                 return jsonify({
                     "authenticated": False,
@@ -180,6 +319,53 @@ def verify():
         "reason": f"Quorum non atteint ({valid_count}/{required})"
     })
 
+@app.route("/auth/mfa/verify", methods=["POST"])
+def verify_mfa():
+    """Finaliser un login soumis à MFA forcée : {"did": ..., "code": ...}"""
+    result = _verify_mfa()
+    audit_verify(result)
+    return result
+
+
+def _verify_mfa():
+    data = request.get_json(silent=True) or {}
+    did = data.get("did")
+
+    # Limite par IP seulement : le bucket DID est déjà vidé pendant une MFA forcée
+    if limiter.check(request.remote_addr) == REJECT:
+        return rate_limited_response()
+
+    challenge_data = challenges.get(did)
+    if not challenge_data or not challenge_data.get("mfa_pending"):
+        return jsonify({"error": "Aucune validation MFA en attente pour ce DID"}), 400
+
+    # Nombre de codes limité par challenge (pas de force brute sur 6 chiffres)
+    challenge_data["mfa_attempts"] += 1
+    if challenge_data["mfa_attempts"] > MFA_MAX_ATTEMPTS:
+        del challenges[did]
+        return jsonify({
+            "authenticated": False,
+            "reason": "Trop de codes invalides : recommencez l'authentification"
+        }), 401
+
+    email = registry.email_for(did)
+    if email is None or not SecurityActions.verify_mfa_email(email, data.get("code")):
+        return jsonify({"authenticated": False, "reason": "Code MFA invalide"}), 401
+
+    del challenges[did]
+    return jsonify({
+        "authenticated": True,
+        "validKeys": challenge_data["valid_keys"],
+        "message": "Validation MFA réussie"
+    })
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Métriques Prometheus (accès local uniquement)"""
+    if request.remote_addr not in LOCAL_ADDRS:
+        return jsonify({"error": "Accès local uniquement"}), 403
+    return Response(METRICS.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/auth/users", methods=["GET"])
 def list_users():
     """Lister les DIDs enregistrés (dev only)"""
@@ -196,5 +382,8 @@ def list_users():
 if __name__ == "__main__":
     print(" Server running on http://localhost:3000")
     print(" CORS enabled")
-    print(" AI Analysis enabled on http://localhost:5000")
+    if event_queue is not None:
+        print(f" AI Analysis via durable queue: {event_queue.path}")
+    else:
+        print(" AI Analysis enabled on http://localhost:5000")
     app.run(host="0.0.0.0", port=3000, debug=True)
\ No newline at end of file
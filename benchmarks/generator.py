@@ -0,0 +1,183 @@
+"""
+Générateur synthétique d'événements d'authentification.
+
+Reproduit le schéma de data/auth_attempts_separe.xlsx
+(id, timestamp, source_ip, user_agent, response_time_ms, signature_valid,
+attempts, device_id, geo, is_attack) avec un mélange d'attaques configurable.
+La génération est vectorisée et découpée en blocs : chaque bloc a sa propre
+graine (seed + index du bloc), ce qui rend la sortie reproductible quelle que
+soit la taille (jusqu'à 100M lignes en CSV, écrit bloc par bloc).
+
+Usage :
+    python -m benchmarks.generator --rows 1000000 --out data/synthetic.csv \\
+        --attack-mix bruteforce=0.05,stuffing=0.04,scan=0.03
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+GEOS = np.array(["DE", "FR", "TN", "UNKNOWN", "US"])
+USER_AGENTS = np.array([
+    "MobileApp/1.3",
+    "Mozilla/5.0",
+    "curl/7.68.0",
+    "python-requests/2.25.1",
+    "BotScanner/0.9",
+])
+
+# Profils par type de trafic :
+# ua_weights (ordre USER_AGENTS), signature valide, tentatives, temps de réponse, taille du pool d'IP
+PROFILES = {
+    "normal": {
+        "ua_weights": [0.23, 0.22, 0.22, 0.23, 0.10],
+        "sig_valid": 0.996,
+        "attempts": (0.9, 0, 5),
+        "response": (119, 48),
+        "ip_pool": 50_000,
+    },
+    "bruteforce": {
+        "ua_weights": [0.02, 0.02, 0.06, 0.20, 0.70],
+        "sig_valid": 0.30,
+        "attempts": (6.0, 2, 20),
+        "response": (90, 40),
+        "ip_pool": 200,
+    },
+    "stuffing": {
+        "ua_weights": [0.15, 0.60, 0.05, 0.15, 0.05],
+        "sig_valid": 0.60,
+        "attempts": (1.5, 1, 5),
+        "response": (130, 50),
+        "ip_pool": 200_000,
+    },
+    "scan": {
+        "ua_weights": [0.0, 0.0, 0.1, 0.1, 0.8],
+        "sig_valid": 0.90,
+        "attempts": (0.5, 0, 3),
+        "response": (60, 25),
+        "ip_pool": 2_000,
+    },
+}
+
+DEFAULT_MIX = {"bruteforce": 0.05, "stuffing": 0.04, "scan": 0.04}
+
+
+def parse_mix(text):
+    """'bruteforce=0.05,scan=0.03' -> {'bruteforce': 0.05, 'scan': 0.03}"""
+    mix = {}
+    for part in filter(None, text.split(",")):
+        name, value = part.split("=")
+        if name not in PROFILES or name == "normal":
+            raise ValueError(f"Type d'attaque inconnu : {name}")
+        mix[name] = float(value)
+    if sum(mix.values()) >= 1:
+        raise ValueError("La somme des proportions d'attaques doit être < 1")
+    return mix
+
+
+def _ips(rng, pool, n, salt):
+    """IPs tirées dans un pool déterministe de `pool` adresses"""
+    idx = rng.integers(0, pool, size=n, dtype=np.int64) * 2654435761 + salt
+    octets = [((idx >> shift) & 0xFF).astype(str) for shift in (24, 16, 8, 0)]
+    return octets[0].astype(object) + "." + octets[1] + "." + octets[2] + "." + octets[3]
+
+
+def generate_chunk(n, seed, attack_mix=None, start=None, events_per_second=5.0, id_offset=0):
+    """Génère `n` événements ; `start` = horodatage du premier événement"""
+    rng = np.random.default_rng(seed)
+    attack_mix = DEFAULT_MIX if attack_mix is None else attack_mix
+    start = pd.Timestamp(start or "2025-09-22T10:00:00")
+
+    names = ["normal"] + list(attack_mix)
+    probs = [1 - sum(attack_mix.values())] + list(attack_mix.values())
+    kinds = rng.choice(len(names), size=n, p=probs)
+
+    ua = np.empty(n, dtype=object)
+    source_ip = np.empty(n, dtype=object)
+    sig_valid = np.empty(n, dtype=np.int64)
+    attempts = np.empty(n, dtype=np.int64)
+    response = np.empty(n, dtype=np.int64)
+
+    for k, name in enumerate(names):
+        mask = kinds == k
+        m = int(mask.sum())
+        if m == 0:
+            continue
+        p = PROFILES[name]
+        ua[mask] = USER_AGENTS[rng.choice(len(USER_AGENTS), size=m, p=p["ua_weights"])]
+        source_ip[mask] = _ips(rng, p["ip_pool"], m, salt=k * 7919)
+        sig_valid[mask] = rng.random(m) < p["sig_valid"]
+        lam, lo, hi = p["attempts"]
+        attempts[mask] = np.clip(rng.poisson(lam, m), lo, hi)
+        mu, sigma = p["response"]
+        response[mask] = np.clip(rng.normal(mu, sigma, m), 30, 2000).astype(np.int64)
+
+    gaps = rng.exponential(1.0 / events_per_second, size=n)
+    timestamps = start + pd.to_timedelta(np.cumsum(gaps), unit="s")
+
+    return pd.DataFrame({
+        "id": np.arange(id_offset + 1, id_offset + n + 1),
+        "timestamp": np.datetime_as_string(timestamps.values, unit="us"),
+        "source_ip": source_ip,
+        "user_agent": ua,
+        "response_time_ms": response,
+        "signature_valid": sig_valid,
+        "attempts": attempts,
+        "device_id": "device_" + pd.Series(rng.integers(0, 400, size=n)).astype(str).values,
+        "geo": GEOS[rng.integers(0, len(GEOS), size=n)],
+        "is_attack": (kinds != 0).astype(np.int64),
+    })
+
+
+def generate(rows, seed=42, attack_mix=None, chunk_size=1_000_000, **kwargs):
+    """Itère sur des blocs reproductibles de `chunk_size` lignes"""
+    start = pd.Timestamp(kwargs.pop("start", "2025-09-22T10:00:00"))
+    produced = 0
+    chunk_index = 0
+    while produced < rows:
+        n = min(chunk_size, rows - produced)
+        chunk = generate_chunk(n, seed + chunk_index, attack_mix, start=start, id_offset=produced, **kwargs)
+        start = pd.Timestamp(chunk["timestamp"].iloc[-1])
+        yield chunk
+        produced += n
+        chunk_index += 1
+
+
+def write(rows, out, seed=42, attack_mix=None, chunk_size=1_000_000):
+    """Ecrit `rows` événements dans `out` (.csv, ou .xlsx pour les petits volumes)"""
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    if out.endswith(".xlsx"):
+        if rows > 1_000_000:
+            raise ValueError("Excel est limité à ~1M lignes, utilisez un .csv")
+        df = pd.concat(generate(rows, seed, attack_mix, chunk_size), ignore_index=True)
+        df.to_excel(out, index=False, engine="openpyxl")
+        return out
+
+    header = True
+    for chunk in generate(rows, seed, attack_mix, chunk_size):
+        chunk.to_csv(out, mode="w" if header else "a", header=header, index=False)
+        header = False
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Générateur de trafic d'authentification synthétique")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--out", default="data/synthetic/auth_attempts.csv")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--attack-mix", default="", help="ex: bruteforce=0.05,stuffing=0.04,scan=0.03")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.attack_mix) if args.attack_mix else None
+    t0 = time.perf_counter()
+    write(args.rows, args.out, args.seed, mix, args.chunk_size)
+    elapsed = time.perf_counter() - t0
+    print(f"[OK] {args.rows} lignes écrites dans {args.out} en {elapsed:.1f}s "
+          f"({args.rows / elapsed:,.0f} lignes/s)")
+
+
+if __name__ == "__main__":
+    main()
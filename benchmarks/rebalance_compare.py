@@ -0,0 +1,108 @@
+"""
+Comparaison des stratégies de rééquilibrage pour DetectorXGB.
+
+Pour chaque stratégie : temps de rééquilibrage + entraînement, pic mémoire Python
+(tracemalloc) et ROC-AUC sur un jeu de test stratifié jamais rééquilibré.
+
+Usage :
+    python -m benchmarks.rebalance_compare --rows 200000 --out bench_results/rebalance.json
+    python -m benchmarks.rebalance_compare --data data/processed/processed_data.csv
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agents.detector_XGBoost import DetectorXGB  # noqa: E402
+from agents.rebalance import STRATEGIES, rebalance  # noqa: E402
+from benchmarks.generator import generate, parse_mix  # noqa: E402
+
+
+def _processed_synthetic(rows, seed, attack_mix):
+    """Jeu prétraité à partir d'événements synthétiques (via DataCollector.load_data)"""
+    from agents.collector import DataCollector
+
+    with tempfile.TemporaryDirectory(prefix="rebalance-") as workdir:
+        raw = os.path.join(workdir, "raw.csv")
+        pd.concat(generate(rows, seed, attack_mix), ignore_index=True).to_csv(raw, index=False)
+        collector = DataCollector(
+            input_path=raw,
+            output_dir=os.path.join(workdir, "processed"),
+            scaler_path=os.path.join(workdir, "scaler.pkl"),
+        )
+        return collector.load_data()
+
+
+def compare(df, strategies=STRATEGIES, test_size=0.25, seed=42):
+    df = df[df["is_attack"].notna()]
+    train_df, test_df = train_test_split(df, test_size=test_size, stratify=df["is_attack"], random_state=seed)
+    X_test = test_df.select_dtypes(include=["int64", "float64"]).drop(columns=["is_attack"])
+    y_test = test_df["is_attack"].astype(int)
+
+    detector = DetectorXGB()
+    results = {}
+    for strategy in strategies:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        X, y, fit_params = rebalance(train_df, strategy, random_state=seed)
+        t_rebalance = time.perf_counter() - t0
+
+        model = detector.build_model()
+        model.fit(X, y, **fit_params)
+        t_total = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        proba = model.predict_proba(X_test.reindex(columns=X.columns, fill_value=0))[:, 1]
+        results[strategy] = {
+            "train_rows": len(X),
+            "rebalance_s": round(t_rebalance, 4),
+            "total_s": round(t_total, 4),
+            "peak_mem_mb": round(peak / 1024 ** 2, 1),
+            "roc_auc": round(roc_auc_score(y_test, proba), 4),
+        }
+        print(f"[BENCH] {strategy:<13} {results[strategy]}", flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparaison des stratégies de rééquilibrage")
+    parser.add_argument("--data", default=None, help="CSV prétraité (défaut : données synthétiques)")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--attack-mix", default="")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    if args.data:
+        df = pd.read_csv(args.data)
+    else:
+        mix = parse_mix(args.attack_mix) if args.attack_mix else None
+        df = _processed_synthetic(args.rows, args.seed, mix)
+
+    strategies = [s for s in args.strategies.split(",") if s]
+    report = {
+        "rows": len(df),
+        "seed": args.seed,
+        "results": compare(df, strategies, seed=args.seed),
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[OK] Résultats écrits dans {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""
+Suite de benchmarks de bout en bout.
+
+Chaque exécution travaille dans un répertoire temporaire (données, modèles et
+images générés n'écrasent rien dans le dépôt) et écrit un JSON de résultats
+comparable entre commits.
+
+Usage :
+    python -m benchmarks.run --rows 20000 --out bench_results/HEAD.json
+    python -m benchmarks.run --scenarios train,predict_batch --rows 100000
+    python -m benchmarks.run compare bench_results/old.json bench_results/new.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Pas de journal d'audit dans data/audit/ du dépôt (le scénario audit_query utilise le sien)
+os.environ.setdefault("AUDIT_LOG", "0")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "backendFlask"))
+
+from benchmarks.generator import generate, parse_mix  # noqa: E402
+
+MODEL_PATH = "models/xgboost_model.pkl"
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def _max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux : Ko, macOS : octets
+    return round(rss / 1024 if sys.platform != "darwin" else rss / 1024 ** 2, 1)
+
+
+def _measure(fn, repeat=1, rows=1):
+    """Exécute `fn` `repeat` fois ; médiane, min et débit en lignes/s"""
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    median = statistics.median(timings)
+    return {
+        "repeat": repeat,
+        "rows": rows,
+        "median_s": round(median, 6),
+        "min_s": round(min(timings), 6),
+        "rows_per_s": round(rows / median, 1) if median else None,
+        "max_rss_mb": _max_rss_mb(),
+    }
+
+
+class BenchContext:
+    """Répertoire de travail isolé + objets partagés entre scénarios"""
+
+    def __init__(self, rows, seed, attack_mix, workdir):
+        self.rows = rows
+        self.seed = seed
+        self.attack_mix = attack_mix
+        self.workdir = workdir
+        self.raw_path = os.path.join(workdir, "data", "auth_attempts.csv")
+        self.processed_path = os.path.join(workdir, "data", "processed", "processed_data.csv")
+        self.events = None
+        self.collector = None
+        self.detector = None
+
+    def prepare(self):
+        os.makedirs(os.path.join(self.workdir, "data", "processed"), exist_ok=True)
+        os.makedirs(os.path.join(self.workdir, "models"), exist_ok=True)
+        # Les détecteurs écrivent leurs images dans data/processed/ (chemin relatif)
+        os.chdir(self.workdir)
+
+        chunks = generate(self.rows, self.seed, self.attack_mix, chunk_size=min(self.rows, 1_000_000))
+        self.events = pd.concat(chunks, ignore_index=True)
+        self.events.to_csv(self.raw_path, index=False)
+
+        from agents.collector import DataCollector
+        from agents.detector_XGBoost import DetectorXGB
+
+        self.collector = DataCollector(
+            input_path=self.raw_path,
+            output_dir=os.path.dirname(self.processed_path),
+            scaler_path="models/scaler.pkl",
+        )
+        self.detector = DetectorXGB(processed_dir="data/processed", model_path=MODEL_PATH)
+
+    def sample_events(self, n):
+        records = self.events.drop(columns=["id", "is_attack"]).head(n).to_dict(orient="records")
+        for r in records:
+            r["signature_valid"] = bool(r["signature_valid"])
+        return records
+
+
+# -------------------------------
+# Scénarios
+# -------------------------------
+
+def bench_load_data(ctx):
+    return _measure(ctx.collector.load_data, rows=ctx.rows)
+
+
+def bench_add_new_data(ctx, n=20):
+    events = ctx.sample_events(n)
+    it = iter(events)
+    return _measure(lambda: ctx.collector.add_new_data(next(it)), repeat=n)
+
+
+def bench_train(ctx):
+    return _measure(lambda: ctx.detector.train(path=ctx.processed_path), rows=ctx.rows)
+
+
+def bench_predict_single(ctx, n=50):
+    row = ctx.collector.preprocess_single(ctx.sample_events(1)[0])
+    return _measure(lambda: ctx.detector.predict_df(row), repeat=n)
+
+
+def bench_predict_batch(ctx):
+    df = pd.read_csv(ctx.processed_path)
+    return _measure(lambda: ctx.detector.predict_df(df), repeat=3, rows=len(df))
+
+
+def bench_reactor(ctx, n=1000):
+    from agents.reactor import Reactor
+
+    df = ctx.detector.predict_df(pd.read_csv(ctx.processed_path).head(n))
+    reactor = Reactor("bench@example.com", "x", "bench@example.com")
+    # Pas d'envoi réel : on mesure la logique de réaction, pas le serveur SMTP
+    with mock.patch("smtplib.SMTP"):
+        return _measure(lambda: reactor.react(df), repeat=3, rows=len(df))
+
+
+def bench_mfa_delivery(ctx, n=5000):
+    from agents.did_registry import DIDRegistry
+    from agents.mfa_delivery import MFADelivery, FileTransport
+
+    registry = DIDRegistry(os.path.join(ctx.workdir, "data", "registry", "dids.db"))
+    for i in range(n):
+        registry.register(f"did:bench:{i}", [], 1, email=f"user{i}@example.com")
+    rows = [{"did": f"did:bench:{i}"} for i in range(n)]
+    outbox = os.path.join(ctx.workdir, "data", "mfa_outbox.jsonl")
+
+    def one():
+        # Nouvelle instance à chaque répétition : pas de fenêtre anti-rafale partagée
+        delivery = MFADelivery(FileTransport(outbox), registry=registry)
+        delivery.submit(rows)
+        delivery.stop()
+
+    return _measure(one, repeat=3, rows=n)
+
+
+def bench_audit_query(ctx, days=30, queries=20):
+    from agents.audit import AuditLog
+
+    # `rows` prédictions réparties sur un mois, écrites par lots puis compactées par heure
+    audit = AuditLog(root=os.path.join(ctx.workdir, "data", "audit"), flush_rows=float("inf"))
+    events = ctx.events.rename(columns={"device_id": "did"})
+    events["attack_probability"] = events["is_attack"].astype(float)
+    tiers = np.where(events["is_attack"] == 1, "critique", "normal")
+    start = pd.Timestamp("2025-09-01").timestamp()
+    ts = start + np.arange(len(events)) * (days * 86_400 / max(len(events), 1))
+    for lo in range(0, len(events), 50_000):
+        hi = lo + 50_000
+        audit.record_predictions(events.iloc[lo:hi], tiers=tiers[lo:hi].tolist(), ts=ts[lo:hi])
+        audit.flush()
+    audit.compact(older_than=0)
+
+    ips = iter(events["source_ip"].sample(queries, random_state=0).tolist())
+    return _measure(lambda: audit.query(ip=next(ips), tier="critique"), repeat=queries)
+
+
+def bench_flask_analyze(ctx, n=50):
+    import server
+
+    client = server.app.test_client()
+    events = iter(ctx.sample_events(n))
+    with mock.patch("smtplib.SMTP"):
+        return _measure(lambda: client.post("/analyze", json=next(events)), repeat=n)
+
+
+def bench_flask_verify(ctx, n=50):
+    from eth_account import Account
+    from eth_account.messages import encode_defunct
+    import app as auth_app
+    from agents.rate_limiter import ALLOW
+
+    accounts = [Account.create() for _ in range(3)]
+    auth_app.users["did:bench"] = {
+        "publicKeys": [{"id": f"key{i + 1}", "key": a.address} for i, a in enumerate(accounts)],
+        "quorum": 2,
+    }
+    assert auth_app.event_queue is None or auth_app.event_queue.path.startswith(ctx.workdir)
+    client = auth_app.app.test_client()
+
+    def one():
+        challenge = client.get("/auth/challenge/did:bench").get_json()["challenge"]
+        signatures = [
+            {"keyId": f"key{i + 1}", "signature": a.sign_message(encode_defunct(text=challenge)).signature.hex()}
+            for i, a in enumerate(accounts)
+        ]
+        response = client.post("/auth/verify", json={"did": "did:bench", "signatures": signatures})
+        assert response.status_code == 200 and response.get_json()["authenticated"], response.get_json()
+
+    # Géolocalisation et analyse AI coupées : on mesure le coût propre du serveur d'auth ;
+    # limiteur toujours passant (chemin nominal, toutes les requêtes viennent de 127.0.0.1)
+    allow_all = mock.Mock(check=mock.Mock(return_value=ALLOW))
+    with mock.patch.object(auth_app, "get_geo_from_ip", return_value="FR"), \
+            mock.patch.object(auth_app, "send_to_ai_analysis", return_value=None), \
+            mock.patch.object(auth_app, "limiter", allow_all):
+        return _measure(one, repeat=n)
+
+
+# L'ordre compte : train produit le modèle utilisé par les scénarios suivants
+SCENARIOS = {
+    "load_data": bench_load_data,
+    "add_new_data": bench_add_new_data,
+    "train": bench_train,
+    "predict_single": bench_predict_single,
+    "predict_batch": bench_predict_batch,
+    "reactor": bench_reactor,
+    "mfa_delivery": bench_mfa_delivery,
+    "audit_query": bench_audit_query,
+    "flask_analyze": bench_flask_analyze,
+    "flask_verify": bench_flask_verify,
+}
+REQUIRES = {name: ["load_data", "train"] for name in SCENARIOS}
+REQUIRES["load_data"] = []
+REQUIRES["add_new_data"] = ["load_data"]
+REQUIRES["train"] = ["load_data"]
+REQUIRES["flask_verify"] = []
+REQUIRES["mfa_delivery"] = []
+REQUIRES["audit_query"] = []
+
+
+def run(rows, seed=42, attack_mix=None, scenarios=None):
+    selected = scenarios or list(SCENARIOS)
+    needed = set(selected)
+    for name in selected:
+        needed.update(REQUIRES[name])
+
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        # File d'événements, registre DID et journal de campagnes dans le répertoire temporaire
+        # (chemins par défaut absolus dans le dépôt : un consommateur réel les verrait)
+        os.environ["EVENT_QUEUE_PATH"] = os.path.join(workdir, "data", "queue", "auth_events.db")
+        os.environ["DID_REGISTRY_PATH"] = os.path.join(workdir, "data", "registry", "dids.db")
+        os.environ["CAMPAIGN_STORE_PATH"] = os.path.join(workdir, "data", "campaign", "campaign.db")
+        ctx = BenchContext(rows, seed, attack_mix, workdir)
+        try:
+            ctx.prepare()
+            for name, fn in SCENARIOS.items():
+                if name not in needed:
+                    continue
+                print(f"[BENCH] {name} ...", flush=True)
+                try:
+                    res = fn(ctx)
+                except Exception as e:
+                    res = {"error": f"{type(e).__name__}: {e}"}
+                if name in selected:
+                    results[name] = res
+                print(f"[BENCH] {name} : {res}", flush=True)
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rows": rows,
+        "seed": seed,
+        "attack_mix": attack_mix,
+        "results": results,
+    }
+
+
+def compare(old_path, new_path):
+    """Affiche le ratio des médianes (nouveau / ancien) par scénario"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"{'scenario':<16} {'ancien (s)':>12} {'nouveau (s)':>12} {'ratio':>8}")
+    for name, res in new["results"].items():
+        before = old["results"].get(name, {})
+        if "median_s" not in res or "median_s" not in before:
+            continue
+        ratio = res["median_s"] / before["median_s"] if before["median_s"] else float("inf")
+        flag = "  <-- régression" if ratio > 1.10 else ""
+        print(f"{name:<16} {before['median_s']:>12.4f} {res['median_s']:>12.4f} {ratio:>8.2f}{flag}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        parser = argparse.ArgumentParser(prog="benchmarks.run compare")
+        parser.add_argument("old")
+        parser.add_argument("new")
+        args = parser.parse_args(sys.argv[2:])
+        compare(args.old, args.new)
+        return
+
+    parser = argparse.ArgumentParser(description="Benchmarks de bout en bout")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--attack-mix", default="")
+    parser.add_argument("--scenarios", default="", help=f"parmi : {','.join(SCENARIOS)}")
+    parser.add_argument("--out", default=None, help="fichier JSON (défaut : bench_results/<commit>.json)")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s] or None
+    unknown = set(scenarios or []) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"scénarios inconnus : {', '.join(sorted(unknown))}")
+
+    mix = parse_mix(args.attack_mix) if args.attack_mix else None
+    report = run(args.rows, args.seed, mix, scenarios)
+
+    out = args.out or os.path.join(ROOT, "bench_results", f"{report['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[OK] Résultats écrits dans {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import multiprocessing
+import signal
+
+from agents.event_queue import EventQueue, DEFAULT_PATH
+
+
+def run_worker(queue_path, batch_size, lease_seconds):
+    # Import dans le processus fils : chaque consommateur charge ses propres modèles
+    from agents.event_consumer import EventConsumer
+    from main import collector, detector, reactor
+
+    consumer = EventConsumer(
+        EventQueue(queue_path), collector, detector, reactor,
+        batch_size=batch_size, lease_seconds=lease_seconds, monitor=reactor.monitor,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: consumer.stop())
+    try:
+        consumer.run()
+    except KeyboardInterrupt:
+        consumer.stop()
+    finally:
+        # Processus fils : pas d'atexit, les challenges MFA en file sont livrés ici
+        if reactor.mfa is not None:
+            reactor.mfa.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consommateurs de la file d'événements d'authentification")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--queue", default=DEFAULT_PATH)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--lease-seconds", type=int, default=60)
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        run_worker(args.queue, args.batch_size, args.lease_seconds)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(args.queue, args.batch_size, args.lease_seconds))
+        for _ in range(args.workers)
+    ]
+    for p in processes:
+        p.start()
+    print(f" {args.workers} consommateurs démarrés sur {args.queue}")
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        for p in processes:
+            p.terminate()
+            p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,112 @@
+import os
+
+from agents.campaign import CampaignCorrelator, CampaignStore
 from agents.collector import DataCollector
+from agents.decision_cache import DecisionCache
 from agents.detector_XGBoost import DetectorXGB
-from agents.reactor import Reactor  
-
-collector = DataCollector(input_path="data/auth_attempts_separe.xlsx")
-df_processed = collector.load_data()
-
-# Ajouter donnée API sans label
-new_data = {
-    "timestamp": "2025-11-07T14:33:00",
-    "source_ip": "172.16.4.10",
-    "user_agent": "Python-urllib/3.10",
-    "response_time_ms": 300,
-    "signature_valid": True,
-    "attempts": 4,
-    "geo": "US",
-    
-    
-}
-
-collector.add_new_data(new_data)
+from agents.did_registry import DIDRegistry
+from agents.mfa_delivery import MFADelivery, transport_from_env
+from agents.metrics import METRICS
+from agents.monitor import DriftMonitor
+from agents.reactor import Reactor
 
-# Entraîner le modèle
-detector = DetectorXGB(processed_dir="data/processed", model_path="models/xgboost_model.pkl")
-clf, metrics = detector.train(path="data/processed/processed_data.csv")
+MODEL_PATH = "models/xgboost_model.pkl"
 
-print("\n=== Metrics du modèle XGBoost ===")
-for k, v in metrics.items():
-    print(f"{k}: {v}")
+# Corrélation de campagnes (IP <-> DID <-> UA), partagée entre features et alertes,
+# et entre processus (consommateurs de la file) via le journal SQLite commun
+campaigns = CampaignCorrelator(store=CampaignStore())
 
-# Données API
-latest = detector.load_processed()
-api_data = latest[latest['is_attack'].isna()]
+# Données à scorer normalisées avec le scaler figé du modèle
+collector = DataCollector(input_path="data/auth_attempts_separe.xlsx", model_path=MODEL_PATH,
+                          campaign=campaigns)
+# Cache des décisions pour les empreintes répétées (rafales d'attaques identiques)
+detector = DetectorXGB(processed_dir="data/processed", model_path=MODEL_PATH, cache=DecisionCache())
 
-# Prédiction
-result = detector.predict_df(api_data)
-
-print("\n=== Résultat Détecteur ===")
-print(result[['attack_probability', 'is_attack_pred']])
+# Moniteur de dérive (baseline sauvegardée avec le modèle)
+monitor = DriftMonitor.from_model(MODEL_PATH)
 
 # ============================
 #   CONFIGURATION EMAIL ICI
 # ============================
 
+# Livraison MFA concurrente ; destinataire résolu par DID
+# (MFA_EMAIL_FROM / MFA_EMAIL_PASSWORD, ou MFA_TRANSPORT=file : data/mfa_outbox.jsonl)
+mfa = MFADelivery(transport_from_env(), registry=DIDRegistry())
+
+# Alertes SOC : compte d'envoi et destinataire lus dans l'environnement
+# (ALERT_EMAIL_FROM / ALERT_EMAIL_PASSWORD / ALERT_EMAIL_TO), aucun secret dans le code
 reactor = Reactor(
-    email_from="nouha.hadhri@enis.tn",
-    email_password="cewdxwatrudddovz",
-    email_to="hadil.hssaien@enis.tn"
+    email_from=os.environ.get("ALERT_EMAIL_FROM", ""),
+    email_password=os.environ.get("ALERT_EMAIL_PASSWORD", ""),
+    email_to=os.environ.get("ALERT_EMAIL_TO", ""),
+    monitor=monitor,
+    mfa=mfa,
+    campaign=campaigns
 )
 
-# Lancer le système de réaction
-reactor.react(result)
+
+def process_attack(data):
+    """Analyse une tentative d'authentification reçue via /analyze"""
+    # Scoring avec le scaler du modèle ; la ligne est ajoutée au dataset à l'échelle du dataset
+    with METRICS.timer("preprocess"):
+        new_row = collector.preprocess_single(data)
+
+    with METRICS.timer("inference"):
+        result = detector.predict_df(new_row)
+
+    with METRICS.timer("persist"):
+        collector.append_processed(new_row)
+
+    # Remettre les informations brutes (supprimées au prétraitement) pour le Reactor
+    for col in ["source_ip", "user_agent", "did"]:
+        if col in data:
+            result[col] = data[col]
+
+    with METRICS.timer("reactor_dispatch"):
+        reactor.react(result)
+    return result
+
+
+if __name__ == "__main__":
+    df_processed = collector.load_data()
+
+    # Ajouter donnée API sans label
+    new_data = {
+        "timestamp": "2025-11-07T14:33:00",
+        "source_ip": "172.16.4.10",
+        "user_agent": "Python-urllib/3.10",
+        "response_time_ms": 300,
+        "signature_valid": True,
+        "attempts": 4,
+        "geo": "US",
+
+
+    }
+
+    collector.add_new_data(new_data)
+
+    # Entraîner le modèle
+    clf, metrics = detector.train(path="data/processed/processed_data.csv")
+
+    print("\n=== Metrics du modèle XGBoost ===")
+    for k, v in metrics.items():
+        print(f"{k}: {v}")
+
+    # Données API
+    latest = detector.load_processed()
+    api_data = latest[latest['is_attack'].isna()]
+
+    # Prédiction
+    result = detector.predict_df(api_data)
+
+    print("\n=== Résultat Détecteur ===")
+    print(result[['attack_probability', 'is_attack_pred']])
+
+    # Baseline fraîchement sauvegardée par train()
+    reactor.monitor = DriftMonitor.from_model(MODEL_PATH)
+
+    # Lancer le système de réaction
+    reactor.react(result)
+
+    print("\n=== Moniteur de dérive ===")
+    print(reactor.monitor.snapshot())
@@ -0,0 +1,34 @@
+import argparse
+
+from agents.batch_scorer import BatchScorer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-scoring hors ligne de l'historique d'authentification")
+    parser.add_argument("--input", required=True, help="fichier ou répertoire partitionné (.csv, .parquet, .xlsx)")
+    parser.add_argument("--output", required=True, help="répertoire de sortie Parquet")
+    parser.add_argument("--model", default="models/xgboost_model.pkl")
+    parser.add_argument("--if-model", default=None, help="ajoute anomaly_score (ex: models/isolation_forest.pkl)")
+    parser.add_argument("--scaler", default="models/scaler.pkl")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-resume", action="store_true", help="ignore le checkpoint existant")
+    args = parser.parse_args()
+
+    scorer = BatchScorer(
+        input_path=args.input,
+        output_dir=args.output,
+        xgb_model_path=args.model,
+        if_model_path=args.if_model,
+        scaler_path=args.scaler,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+    )
+    try:
+        scorer.run(resume=not args.no_resume)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
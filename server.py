@@ -1,11 +1,37 @@
-from flask import Flask, request, jsonify
+import os
+
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 
-from main import process_attack
+import pandas as pd
+
+from agents.audit import AUDIT, AUTH_EVENT, PREDICTION, ACTION
+from agents.calibration import TIERS
+from agents.event_queue import EventQueue, DEFAULT_PATH as QUEUE_PATH
+from agents.metrics import METRICS, PROFILER, MetricsRegistry
+from agents.monitor import DriftMonitor
+from main import process_attack, monitor, detector, mfa, campaigns
 
 app = Flask(__name__)
 CORS(app)
 
+_queue = None
+
+
+def event_queue():
+    """File partagée avec les consommateurs (AI_PIPELINE=queue), ou None si elle n'existe pas"""
+    global _queue
+    if _queue is None and os.path.exists(QUEUE_PATH):
+        _queue = EventQueue(QUEUE_PATH)
+    return _queue
+
+
+def worker_stats():
+    """États publiés par les consommateurs actifs (consumer.py), qui scorent hors de ce processus"""
+    queue = event_queue()
+    return queue.worker_stats() if queue is not None else {}
+
+
 @app.route("/analyze", methods=["POST"])
 def analyze():
     try:
@@ -13,7 +39,8 @@ def analyze():
         data = request.get_json()
 
         # ✅ Envoi vers main.py
-        result = process_attack(data)
+        with PROFILER.profile("analyze"), METRICS.timer("analyze_total"):
+            result = process_attack(data)
 
         return jsonify({
             "status": "success",
@@ -24,5 +51,87 @@ def analyze():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/monitor", methods=["GET"])
+def monitor_snapshot():
+    """
+    Snapshot du moniteur de dérive (PSI/KS, taux d'alertes par niveau, ce processus et
+    consommateurs de la file agrégés), du cache, de la livraison MFA et des campagnes
+    """
+    workers = worker_stats()
+    merged = DriftMonitor(monitor.baseline).merge_state(monitor.export_state())
+    for stats in workers.values():
+        if "monitor" in stats:
+            merged.merge_state(stats["monitor"])
+    snapshot = merged.snapshot()
+    if event_queue() is not None:
+        snapshot["queue"] = {**event_queue().stats(), "consumers": len(workers)}
+    if detector.cache is not None:
+        snapshot["decision_cache"] = detector.cache.stats()
+    snapshot["mfa_delivery"] = mfa.stats()
+    snapshot["campaigns"] = {**campaigns.stats(), "top": campaigns.top()}
+    return jsonify(snapshot)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Métriques Prometheus, ce processus et consommateurs de la file agrégés (accès local uniquement)"""
+    if request.remote_addr not in ("127.0.0.1", "::1"):
+        return jsonify({"error": "Accès local uniquement"}), 403
+    registry = MetricsRegistry(METRICS.prefix).merge_state(METRICS.export_state())
+    for stats in worker_stats().values():
+        registry.merge_state(stats["metrics"])
+    return Response(registry.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+AUDIT_MAX_LIMIT = 100_000
+
+
+def parse_audit_args(args):
+    """Filtres de /audit validés ; ValueError (message pour le client) si un paramètre est invalide"""
+    filters = {"ip": args.get("ip"), "did": args.get("did")}
+    for name in ("start", "end"):
+        value = args.get(name)
+        try:
+            filters[name] = None if value is None else pd.Timestamp(value)
+        except ValueError:
+            filters[name] = pd.NaT
+        if filters[name] is pd.NaT:
+            raise ValueError(f"'{name}' doit être une date ISO 8601 (ex. 2025-11-07T14:00:00)")
+    if filters["start"] is not None and filters["end"] is not None:
+        try:
+            ordered = filters["start"] < filters["end"]
+        except TypeError:
+            raise ValueError("'start' et 'end' doivent avoir le même fuseau (ou aucun)")
+        if not ordered:
+            raise ValueError("'start' doit précéder 'end'")
+
+    tier, kind = args.get("tier"), args.get("kind")
+    if tier is not None and tier not in TIERS:
+        raise ValueError(f"'tier' doit être parmi : {', '.join(TIERS)}")
+    if kind is not None and kind not in (AUTH_EVENT, PREDICTION, ACTION):
+        raise ValueError(f"'kind' doit être parmi : {AUTH_EVENT}, {PREDICTION}, {ACTION}")
+    filters.update(tier=tier, kind=kind)
+
+    limit = args.get("limit", "1000")
+    if not limit.isdigit() or not 0 < int(limit) <= AUDIT_MAX_LIMIT:
+        raise ValueError(f"'limit' doit être un entier entre 1 et {AUDIT_MAX_LIMIT}")
+    filters["limit"] = int(limit)
+    return filters
+
+
+@app.route("/audit", methods=["GET"])
+def audit():
+    """Journal d'audit filtré : ?ip=&did=&start=&end=&tier=&kind=&limit= (accès local uniquement)"""
+    if request.remote_addr not in ("127.0.0.1", "::1"):
+        return jsonify({"error": "Accès local uniquement"}), 403
+    try:
+        filters = parse_audit_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    records = AUDIT.query(**filters)
+    records["ts"] = records["ts"].astype(str)
+    return jsonify(records.astype(object).where(records.notna(), None).to_dict(orient="records"))
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
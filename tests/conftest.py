@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Pas de journal d'audit dans data/audit/ du dépôt pendant les tests
+os.environ.setdefault("AUDIT_LOG", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
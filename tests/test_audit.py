@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from agents.audit import ACTION, AUTH_EVENT, PREDICTION, AuditLog, _bloom, _bloom_contains, _bloom_hashes  # noqa: E402
+
+# 2024-01-01 00:00 UTC (epoch secondes) : heures closes depuis longtemps
+T0 = 1_704_067_200
+
+
+@pytest.fixture
+def audit(tmp_path):
+    # Vidages manuels : le thread d'écriture ne se réveille pas pendant le test
+    return AuditLog(str(tmp_path / "audit"), flush_rows=10**9, flush_interval=3600)
+
+
+def decoded(bloom):
+    import base64
+
+    return {**bloom, "_bytes": base64.b64decode(bloom["bits"])}
+
+
+def test_bloom_has_no_false_negatives():
+    values = [f"10.0.{i // 256}.{i % 256}" for i in range(1000)]
+    bloom = decoded(_bloom(values + [None]))
+
+    assert all(_bloom_contains(bloom, _bloom_hashes(v)) for v in values)
+    absent = [f"192.168.{i // 256}.{i % 256}" for i in range(1000)]
+    false_positives = sum(_bloom_contains(bloom, _bloom_hashes(v)) for v in absent)
+    assert false_positives < 50
+
+
+def fill(audit):
+    """Trois fichiers : deux dans l'heure 0, un dans l'heure 1"""
+    audit.record(AUTH_EVENT, source_ip="1.1.1.1", did="did:a", ts=T0 + 10)
+    audit.record(PREDICTION, source_ip="1.1.1.1", did="did:a", tier="critique", attack_probability=0.9, ts=T0 + 20)
+    audit.flush()
+    audit.record(AUTH_EVENT, source_ip="2.2.2.2", did="did:b", ts=T0 + 30)
+    audit.flush()
+    audit.record(ACTION, source_ip="3.3.3.3", did="did:c", action="block", ts=T0 + 3700)
+    audit.flush()
+
+
+def test_prune_uses_zone_maps_and_bloom(audit):
+    fill(audit)
+    entries = audit.manifest()
+    assert len(entries) == 3
+
+    def kept(**kwargs):
+        args = {"ip": None, "did": None, "start_ms": None, "end_ms": None, "tier": None, "kind": None, **kwargs}
+        return [e["rows"] for e in audit._prune(entries, **args)]
+
+    assert kept(ip="2.2.2.2") == [1]
+    assert kept(ip="9.9.9.9") == []
+    assert kept(did="did:a") == [2]
+    assert kept(start_ms=(T0 + 3600) * 1000) == [1]
+    assert kept(end_ms=(T0 + 25) * 1000) == [2]
+    assert kept(end_ms=(T0 + 35) * 1000) == [2, 1]
+    assert kept(tier="critique") == [2]
+    assert kept(kind=ACTION) == [1]
+
+
+def test_query_filters_rows(audit):
+    fill(audit)
+
+    assert audit.query(ip="1.1.1.1")["kind"].tolist() == [AUTH_EVENT, PREDICTION]
+    assert audit.query(tier="critique")["attack_probability"].tolist() == [0.9]
+    assert audit.query(start=T0 + 15, end=T0 + 3600)["source_ip"].tolist() == ["1.1.1.1", "2.2.2.2"]
+    assert audit.query(ip="9.9.9.9").empty
+    assert len(audit.query(limit=2)) == 2
+
+
+def test_compact_merges_closed_hours(audit):
+    fill(audit)
+    before = audit.query()
+
+    assert audit.compact(older_than=0) == 1
+    entries = audit.manifest()
+    assert sorted(e["rows"] for e in entries) == [1, 3]
+    on_disk = [f for _, _, files in os.walk(audit.root) for f in files if f.endswith(".parquet")]
+    assert len(on_disk) == 2
+
+    after = audit.query()
+    assert after.drop(columns="ts").equals(before.drop(columns="ts"))
+    assert audit.query(ip="2.2.2.2")["did"].tolist() == ["did:b"]
+    # Heure déjà compactée : rien à refaire
+    assert audit.compact(older_than=0) == 0
+
+
+def test_maybe_compact_runs_once_per_hour(audit):
+    fill(audit)
+    now = T0 + 2 * 3600 + 120
+
+    assert audit._maybe_compact(now=now) == 1
+    # Fichier tardif dans une heure déjà compactée : attendu jusqu'au prochain changement d'heure
+    audit.record(AUTH_EVENT, source_ip="4.4.4.4", ts=T0 + 40)
+    audit.flush()
+    assert audit._maybe_compact(now=now + 60) == 0
+    assert audit._maybe_compact(now=now + 3600) == 1
+
+
+def test_maybe_compact_with_delay_over_an_hour(tmp_path):
+    # flush_interval de 1 h : délai de compaction par défaut de 2 h
+    audit = AuditLog(str(tmp_path / "audit"), flush_rows=10**9, flush_interval=3600)
+    fill(audit)
+
+    assert audit.compact_delay == 7200
+    assert audit._maybe_compact(now=T0 + 5 * 3600) == 1
+
+
+def test_disabled_log_writes_nothing(tmp_path):
+    audit = AuditLog(str(tmp_path / "audit"), enabled=False)
+    audit.record(AUTH_EVENT, source_ip="1.1.1.1")
+
+    assert audit.flush() == 0
+    assert not os.path.exists(audit.root)
@@ -0,0 +1,104 @@
+import os
+
+import joblib
+import pandas as pd
+import pytest
+from xgboost import XGBClassifier
+
+from agents.batch_scorer import CHECKPOINT_FILE, BatchScorer
+from agents.campaign import CAMPAIGN_FEATURES, CampaignCorrelator
+from benchmarks.generator import generate_chunk
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    history = generate_chunk(2000, seed=0)
+    X = history[["response_time_ms", "signature_valid", "attempts"]]
+    model = XGBClassifier(n_estimators=5, max_depth=2).fit(X, history["is_attack"])
+    path = str(tmp_path / "models" / "xgb.pkl")
+    os.makedirs(os.path.dirname(path))
+    joblib.dump(model, path)
+    return path
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    root = tmp_path / "history"
+    for day, seed in (("date=2025-09-22", 1), ("date=2025-09-23", 2)):
+        os.makedirs(root / day)
+        generate_chunk(250, seed=seed).to_csv(root / day / "events.csv", index=False)
+    return str(root)
+
+
+def scorer(input_dir, model_path, tmp_path, chunk_size=100):
+    return BatchScorer(
+        input_dir, str(tmp_path / "out"), xgb_model_path=model_path,
+        scaler_path=str(tmp_path / "none.pkl"), processed_file=str(tmp_path / "none.csv"),
+        chunk_size=chunk_size, workers=1,
+    )
+
+
+def read_output(out_dir):
+    parts = sorted(
+        os.path.join(root, f) for root, _, files in os.walk(out_dir) for f in files if f.endswith(".parquet")
+    )
+    return parts, pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+
+
+def test_rescoring_is_chunked_and_partitioned(input_dir, model_path, tmp_path):
+    summary = scorer(input_dir, model_path, tmp_path).run()
+
+    assert summary["rows"] == 500
+    parts, out = read_output(str(tmp_path / "out"))
+    # 250 lignes par fichier, blocs de 100 : 3 parts par partition
+    assert [os.path.relpath(p, tmp_path / "out") for p in parts] == [
+        f"{day}/events/part-0000{i}.parquet" for day in ("date=2025-09-22", "date=2025-09-23") for i in range(3)
+    ]
+    assert len(out) == 500
+    assert out["id"].tolist() == list(range(1, 251)) * 2
+    assert out["attack_probability"].between(0, 1).all()
+    assert {"source_ip", "is_attack", "is_attack_pred"} <= set(out.columns)
+
+
+def test_resume_skips_finished_chunks(input_dir, model_path, tmp_path):
+    scorer(input_dir, model_path, tmp_path).run()
+    _, before = read_output(str(tmp_path / "out"))
+
+    # Crash simulé : le dernier bloc n'a été ni écrit ni enregistré dans le checkpoint
+    checkpoint_path = tmp_path / "out" / CHECKPOINT_FILE
+    checkpoint = pd.read_json(checkpoint_path, typ="series")
+    last = "date=2025-09-23/events/part-00002"
+    os.remove(tmp_path / "out" / (last + ".parquet"))
+    checkpoint["done"] = [key for key in checkpoint["done"] if key != last]
+    checkpoint.to_json(checkpoint_path)
+
+    summary = scorer(input_dir, model_path, tmp_path).run()
+
+    assert summary["rows"] == 50
+    assert summary["skipped_rows"] == 450
+    _, after = read_output(str(tmp_path / "out"))
+    pd.testing.assert_frame_equal(after, before)
+
+
+def test_resume_with_another_chunk_size_is_refused(input_dir, model_path, tmp_path):
+    scorer(input_dir, model_path, tmp_path).run()
+
+    with pytest.raises(ValueError, match="chunk_size=100"):
+        scorer(input_dir, model_path, tmp_path, chunk_size=50).run()
+
+    # Sans reprise : les anciens blocs sont supprimés avant de réécrire
+    summary = scorer(input_dir, model_path, tmp_path, chunk_size=50).run(resume=False)
+    assert summary["rows"] == 500
+    parts, _ = read_output(str(tmp_path / "out"))
+    assert len(parts) == 10
+
+
+def test_campaign_features_replayed_per_file(input_dir, model_path, tmp_path):
+    tasks = list(scorer(input_dir, model_path, tmp_path)._tasks(with_campaigns=True))
+
+    assert [key for key, _ in tasks][:3] == [f"date=2025-09-22/events/part-0000{i}" for i in range(3)]
+    for day, offset in (("date=2025-09-22", 0), ("date=2025-09-23", 3)):
+        chunked = pd.concat([chunk for _, chunk in tasks[offset:offset + 3]])[CAMPAIGN_FEATURES]
+        # Nouveau corrélateur par fichier : identique au rejeu du fichier entier
+        whole = CampaignCorrelator.replay(pd.read_csv(os.path.join(input_dir, day, "events.csv")))
+        pd.testing.assert_frame_equal(chunked.reset_index(drop=True), whole)
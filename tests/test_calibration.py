@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from agents.calibration import MIN_THRESHOLDS, CalibrationTable
+
+
+def holdout(seed=0, n=2000):
+    rng = np.random.default_rng(seed)
+    y = (rng.random(n) < 0.2).astype(int)
+    raw = np.clip(np.where(y == 1, rng.normal(0.8, 0.1, n), rng.normal(0.3, 0.15, n)), 0, 1)
+    return raw, y
+
+
+@pytest.mark.parametrize("method", ["isotonic", "platt"])
+def test_thresholds_meet_target_fpr(method):
+    raw, y = holdout()
+    table = CalibrationTable.fit(raw, y, method=method)
+
+    assert table.thresholds["mfa"] <= table.thresholds["critique"]
+    assert table.fpr["mfa"] <= 0.05
+    assert table.fpr["critique"] <= 0.01
+
+
+def test_tiers_and_calibration_are_monotonic():
+    raw, y = holdout()
+    table = CalibrationTable.fit(raw, y)
+
+    grid = np.linspace(0, 1, 101)
+    calibrated, codes = table.lookup(grid)
+    assert np.all(np.diff(codes) >= 0)
+    assert np.all(np.diff(calibrated) >= 0)
+    assert codes[0] == 0 and codes[-1] == 2
+
+
+def test_thresholds_floored_when_negatives_collapse_to_zero():
+    # Modèle très confiant : tous les négatifs arrondissent à 0 sur la grille
+    rng = np.random.default_rng(1)
+    raw = np.concatenate([rng.uniform(0, 0.0004, 500), rng.uniform(0.9, 1.0, 50)])
+    y = np.concatenate([np.zeros(500, dtype=int), np.ones(50, dtype=int)])
+
+    table = CalibrationTable.fit(raw, y)
+
+    assert table.thresholds == MIN_THRESHOLDS
+    assert table.lookup([0.001, 0.2, 0.6])[1].tolist() == [0, 1, 2]
+
+
+def test_rejects_holdout_without_enough_positives():
+    raw, y = holdout(n=200)
+    y[:] = 0
+    y[:3] = 1
+
+    with pytest.raises(ValueError):
+        CalibrationTable.fit(raw, y)
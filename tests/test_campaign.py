@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+from agents.campaign import DID, IP, UA, CampaignCorrelator, CampaignStore, UnionFind, ua_family
+
+
+def events(*rows):
+    return pd.DataFrame(rows, columns=["source_ip", "did", "user_agent"])
+
+
+def test_union_find_merges_stats():
+    uf = UnionFind()
+    ip_a, ip_b, did = uf.add(IP), uf.add(IP), uf.add(DID)
+
+    uf.union(ip_a, did)
+    root = uf.union(ip_b, did)
+
+    assert uf.find(ip_a) == uf.find(ip_b) == root
+    assert uf.stats[root] == [2, 1, 0, 0, 0]
+    # Union idempotente : pas de double comptage
+    assert uf.union(ip_a, ip_b) == root
+    assert uf.stats[root] == [2, 1, 0, 0, 0]
+
+
+def test_ua_family_drops_version():
+    assert ua_family("python-requests/2.25.1") == "python-requests"
+    assert ua_family("Mozilla/5.0 (X11)") == "mozilla"
+    assert ua_family(None) is None
+
+
+def test_shared_did_links_ips():
+    correlator = CampaignCorrelator()
+    correlator.link(events(("1.1.1.1", "did:a", None)), now=0)
+    features = correlator.link(events(("2.2.2.2", "did:a", None), ("3.3.3.3", "did:b", None)), now=1)
+
+    assert features["campaign_ips"].tolist() == [2.0, 1.0]
+    assert correlator.same_campaign((IP, "1.1.1.1"), (IP, "2.2.2.2"))
+    assert not correlator.same_campaign((IP, "1.1.1.1"), (IP, "3.3.3.3"))
+
+
+def test_record_counts_events_and_attacks():
+    correlator = CampaignCorrelator()
+    df = events(("1.1.1.1", "did:a", None), ("2.2.2.2", "did:a", None))
+    correlator.link(df, now=0)
+    correlator.record(df, [True, False], now=0)
+
+    summary = correlator.describe((DID, "did:a"))
+    assert summary["events"] == 2
+    assert summary["attacks"] == 1
+    assert correlator.link(events(("1.1.1.1", "did:a", None)), now=1)["campaign_events"].iloc[0] == 2.0
+
+
+def test_hub_user_agent_stops_linking():
+    correlator = CampaignCorrelator(max_hub_degree=2)
+    correlator.link(events(("1.1.1.1", None, "curl/8"), ("2.2.2.2", None, "curl/8")), now=0)
+    assert correlator.same_campaign((IP, "1.1.1.1"), (IP, "2.2.2.2"))
+
+    # Troisième IP : la famille d'UA devient un hub et le graphe est reconstruit sans elle
+    correlator.link(events(("3.3.3.3", None, "curl/8")), now=1)
+    assert correlator.stats()["hub_user_agents"] == ["curl"]
+    assert not correlator.same_campaign((IP, "1.1.1.1"), (IP, "2.2.2.2"))
+    assert (UA, "curl") not in correlator._ids
+
+
+def test_window_expiry_splits_campaign():
+    correlator = CampaignCorrelator(window=100, bucket=10)
+    correlator.link(events(("1.1.1.1", "did:a", None)), now=0)
+    correlator.link(events(("2.2.2.2", "did:a", None)), now=50)
+    assert correlator.campaign_of("1.1.1.1") == correlator.campaign_of("2.2.2.2")
+
+    features = correlator.link(events(("3.3.3.3", "did:a", None)), now=120)
+    # L'arête de 1.1.1.1 est sortie de la fenêtre
+    assert correlator.campaign_of("1.1.1.1") is None
+    assert features["campaign_ips"].iloc[0] == 2.0
+
+
+def test_shared_store_builds_one_graph(tmp_path):
+    store = CampaignStore(str(tmp_path / "campaign.db"))
+    first = CampaignCorrelator(store=store, clock=lambda: 1000.0)
+    second = CampaignCorrelator(store=store, clock=lambda: 1000.0)
+
+    first.link(events(("1.1.1.1", "did:a", None)))
+    features = second.link(events(("2.2.2.2", "did:a", None)))
+    assert features["campaign_ips"].iloc[0] == 2.0
+
+    features = first.link(events(("3.3.3.3", "did:a", None)))
+    assert features["campaign_ips"].iloc[0] == 3.0
+
+
+def test_replay_is_chronological_and_causal():
+    df = pd.DataFrame({
+        "timestamp": ["2024-01-01 00:00:10", "2024-01-01 00:00:00", "2024-01-01 00:00:20"],
+        "source_ip": ["2.2.2.2", "1.1.1.1", "3.3.3.3"],
+        "did": ["did:a", "did:a", "did:a"],
+    })
+
+    features = CampaignCorrelator.replay(df)
+
+    # Chaque ligne ne voit que les événements antérieurs (et elle-même)
+    assert features["campaign_ips"].tolist() == [2.0, 1.0, 3.0]
+    assert features["campaign_events"].tolist() == [1.0, 0.0, 2.0]
+
+
+def test_replay_in_chunks_matches_whole_history():
+    rng = np.random.default_rng(0)
+    n = 3000
+    df = pd.DataFrame({
+        "timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(np.sort(rng.uniform(0, 7200, n)), unit="s"),
+        "source_ip": [f"10.0.0.{i}" for i in rng.integers(0, 200, n)],
+        "did": [f"did:{i}" for i in rng.integers(0, 300, n)],
+        "user_agent": rng.choice(["curl/8", "Mozilla/5.0", "python-requests/2"], n),
+    })
+    whole = CampaignCorrelator.replay(df)
+
+    correlator = CampaignCorrelator()
+    chunked = pd.concat([correlator.replay_frame(df.iloc[i:i + 700]) for i in range(0, n, 700)])
+
+    pd.testing.assert_frame_equal(chunked, whole)
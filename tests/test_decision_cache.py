@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from agents.decision_cache import DecisionCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def frame(n=4, attempts=None):
+    return pd.DataFrame({
+        "response_time_ms": np.linspace(0.0, 0.01, n),
+        "attempts": np.arange(n, dtype=float) if attempts is None else attempts,
+    })
+
+
+def test_hits_after_put_and_quantized_keys():
+    cache = DecisionCache()
+    cache.ensure_version(1)
+    keys = cache.keys_for(frame())
+    cache.put_many(keys, [0.1, 0.2, 0.3, 0.4])
+
+    # response_time_ms quantifié au pas 0.05 : écart minime -> même clé
+    nearby = frame()
+    nearby["response_time_ms"] += 0.001
+    assert cache.get_many(cache.keys_for(nearby)) == [0.1, 0.2, 0.3, 0.4]
+    assert cache.stats()["hits"] == 4
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = DecisionCache(ttl=10, clock=clock)
+    keys = cache.keys_for(frame(1))
+    cache.put_many(keys, [0.5])
+
+    clock.now = 11
+    assert cache.get_many(keys) == [None]
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_evicts_oldest():
+    cache = DecisionCache(max_entries=2)
+    keys = cache.keys_for(frame(3))
+    cache.put_many(keys, [0.1, 0.2, 0.3])
+
+    assert cache.get_many(keys) == [None, 0.2, 0.3]
+
+
+def test_version_change_clears_entries():
+    cache = DecisionCache()
+    cache.ensure_version(1)
+    keys = cache.keys_for(frame())
+    cache.put_many(keys, [0.1] * 4)
+
+    cache.ensure_version(1)
+    assert cache.get_many(keys) == [0.1] * 4
+    cache.ensure_version(2)
+    assert cache.get_many(keys) == [None] * 4
+
+
+def test_version_change_resets_continuous_columns():
+    cache = DecisionCache(max_levels=8)
+    cache.ensure_version(1)
+    assert cache.keys_for(frame(20)) is None
+    assert cache.stats()["continuous_columns"] == ["attempts"]
+
+    # Nouveau modèle : la colonne est réévaluée au lieu de contourner le cache pour toujours
+    cache.ensure_version(2)
+    assert cache.stats()["continuous_columns"] == []
+    assert cache.keys_for(frame(4)) is not None
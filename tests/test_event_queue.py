@@ -0,0 +1,164 @@
+import pandas as pd
+import pytest
+
+from agents.event_consumer import EventConsumer
+from agents.event_queue import EventQueue, QueueFull
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return EventQueue(str(tmp_path / "queue.db"), max_attempts=3)
+
+
+def test_claim_hides_events_until_ack(queue):
+    ids = [queue.enqueue({"n": i}) for i in range(3)]
+
+    claimed = queue.claim(batch_size=10, lease_seconds=60)
+    assert [event_id for event_id, _ in claimed] == ids
+    assert [record["n"] for _, record in claimed] == [0, 1, 2]
+    # Bail en cours : rien à réserver pour un autre consommateur
+    assert queue.claim(batch_size=10) == []
+
+    queue.ack(ids)
+    assert queue.stats() == {"depth": 0, "in_flight": 0, "dead_letters": 0}
+
+
+def test_expired_lease_is_redelivered(queue):
+    event_id = queue.enqueue({"n": 1})
+    queue.claim(lease_seconds=0)
+
+    # Pas d'ack avant expiration : livraison au moins une fois
+    assert [i for i, _ in queue.claim(lease_seconds=60)] == [event_id]
+
+
+def test_extend_lease_keeps_batch_reserved(queue):
+    event_id = queue.enqueue({"n": 1})
+    queue.claim(lease_seconds=0)
+    queue.extend_lease([event_id], lease_seconds=60)
+
+    assert queue.claim() == []
+
+
+def test_nack_delays_redelivery(queue):
+    event_id = queue.enqueue({"n": 1})
+    queue.claim()
+
+    queue.nack([event_id], delay=60)
+    assert queue.claim() == []
+    queue.nack([event_id], delay=0)
+    assert [i for i, _ in queue.claim()] == [event_id]
+
+
+def test_dead_letter_after_max_attempts(queue):
+    queue.enqueue({"n": 1})
+    for _ in range(queue.max_attempts):
+        assert len(queue.claim(lease_seconds=0)) == 1
+
+    assert queue.claim(lease_seconds=0) == []
+    assert queue.stats()["dead_letters"] == 1
+    assert queue.stats()["depth"] == 0
+
+
+def test_enqueue_raises_when_full(tmp_path):
+    queue = EventQueue(str(tmp_path / "queue.db"), max_depth=2, depth_check_every=1)
+    queue.enqueue({"n": 1})
+    queue.enqueue({"n": 2})
+
+    with pytest.raises(QueueFull):
+        queue.enqueue({"n": 3})
+
+
+class _Collector:
+    def __init__(self, poison_in="preprocess"):
+        self.poison_in = poison_in
+        self.appended = []
+
+    def preprocess_batch(self, raw):
+        if self.poison_in == "preprocess" and raw["poison"].any():
+            raise ValueError("evenement invalide")
+        return raw
+
+    def append_processed(self, features):
+        self.appended.extend(features["n"].tolist())
+
+
+class _Detector:
+    def predict_df(self, features):
+        return features.copy()
+
+
+class _Reactor:
+    def __init__(self, poison_in="preprocess"):
+        self.poison_in = poison_in
+        self.seen = []
+
+    def react(self, result):
+        self.seen.extend(result["n"].tolist())
+        if self.poison_in == "react" and result["poison"].any():
+            raise RuntimeError("echec SMTP")
+
+
+def remaining_ids(queue):
+    return [row[0] for row in queue._conn().execute("SELECT id FROM events ORDER BY id")]
+
+
+def test_consumer_isolates_poison_event(queue):
+    ids = [queue.enqueue({"n": i, "poison": i == 5}) for i in range(8)]
+    collector, reactor = _Collector(), _Reactor()
+    consumer = EventConsumer(queue, collector, _Detector(), reactor, batch_size=8, retry_delay=60)
+
+    assert consumer.run_once() == 7
+    # Bissection du scoring seulement : une persistance et une réaction par événement sain
+    assert sorted(collector.appended) == [0, 1, 2, 3, 4, 6, 7]
+    assert sorted(reactor.seen) == [0, 1, 2, 3, 4, 6, 7]
+    # Seul l'événement fautif reste en file (nacké)
+    assert remaining_ids(queue) == [ids[5]]
+
+
+def test_reaction_failure_does_not_replay_side_effects(queue):
+    ids = [queue.enqueue({"n": i, "poison": i == 11}) for i in range(16)]
+    collector, reactor = _Collector("react"), _Reactor("react")
+    consumer = EventConsumer(queue, collector, _Detector(), reactor, batch_size=16, retry_delay=60)
+
+    assert consumer.run_once() == 15
+    assert sorted(collector.appended) == list(range(16))
+    assert sorted(reactor.seen) == list(range(16))
+    assert remaining_ids(queue) == [ids[11]]
+
+
+def test_persistence_failure_nacks_scored_events(queue):
+    ids = [queue.enqueue({"n": i, "poison": False}) for i in range(4)]
+    collector, reactor = _Collector(), _Reactor()
+
+    def fail(features):
+        raise OSError("disque plein")
+
+    collector.append_processed = fail
+    consumer = EventConsumer(queue, collector, _Detector(), reactor, batch_size=4, retry_delay=60)
+
+    assert consumer.run_once() == 0
+    assert reactor.seen == []
+    assert remaining_ids(queue) == ids
+
+
+def test_consumer_stats_are_aggregated_across_processes(queue):
+    from agents.metrics import MetricsRegistry
+    from agents.monitor import DriftMonitor
+
+    baseline = {"edges": {"attack_probability": [0.5]}, "expected": {"attack_probability": [0.5, 0.5]}}
+    monitor = DriftMonitor(baseline)
+    monitor.update_df(pd.DataFrame({"attack_probability": [0.1, 0.9, 0.8]}))
+    monitor.record_tier("critique", 2)
+    consumer = EventConsumer(queue, _Collector(), _Detector(), _Reactor(), monitor=monitor)
+    consumer.publish_stats()
+
+    (stats,) = queue.worker_stats().values()
+    merged = DriftMonitor(baseline).merge_state(monitor.export_state()).merge_state(stats["monitor"])
+    assert merged.snapshot()["rows"] == 6
+    assert merged.tier_counts == {"critique": 4}
+    assert merged.histograms["attack_probability"].counts.tolist() == [2, 4]
+
+    registry = MetricsRegistry().merge_state(stats["metrics"]).merge_state(stats["metrics"])
+    assert registry.snapshot()["counters"] == {k: 2 * v for k, v in stats["metrics"]["counters"].items()}
+    # Consommateur arrêté : son état n'est plus agrégé
+    assert queue.worker_stats(max_age=-1) == {}
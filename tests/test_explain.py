@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+from xgboost import XGBClassifier
+
+from agents.explain import contributions, explain, format_explanation, top_k
+
+
+def test_top_k_orders_by_magnitude_and_keeps_sign():
+    contribs = np.array([
+        [0.1, -2.0, 0.5, 1.0],
+        [0.0, 0.0, 0.0, 0.3],
+    ])
+    result = top_k(contribs, ["a", "b", "c", "d"], k=3)
+
+    assert result[0] == [("b", -2.0), ("d", 1.0), ("c", 0.5)]
+    assert result[1][0] == ("d", 0.3)
+    assert len(result[1]) == 3
+
+
+def test_top_k_caps_k_and_handles_empty_input():
+    contribs = np.array([[0.2, -0.1]])
+    assert top_k(contribs, ["a", "b"], k=5) == [[("a", 0.2), ("b", -0.1)]]
+    assert top_k(np.empty((0, 2)), ["a", "b"]) == []
+    assert top_k(contribs, ["a", "b"], k=0) == [[]]
+
+
+def test_explain_matches_model_margin():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({
+        "attempts": rng.poisson(2, 500).astype(float),
+        "response_time_ms": rng.normal(0, 1, 500),
+        "noise": rng.normal(0, 1, 500),
+    })
+    y = (X["attempts"] > 3).astype(int)
+    model = XGBClassifier(n_estimators=20, max_depth=3).fit(X, y)
+
+    contribs = contributions(model, X)
+    assert contribs.shape == X.shape
+    # Contributions + biais = marge (log-odds) du modèle
+    margin = model.predict(X, output_margin=True)
+    bias = margin - contribs.sum(axis=1)
+    assert np.allclose(bias, bias[0], atol=1e-4)
+
+    explanations = explain(model, X.iloc[:10], k=2)
+    assert len(explanations) == 10
+    assert all(len(e) == 2 for e in explanations)
+    assert all(e[0][0] == "attempts" for e in explanations)
+
+
+def test_format_explanation():
+    assert format_explanation([("attempts", 1.214), ("geo_CN", -0.4)]) == "attempts (+1.21), geo_CN (-0.40)"
+    assert format_explanation(None) == "non disponible"
@@ -0,0 +1,32 @@
+import multiprocessing
+import time
+
+from agents.file_lock import file_lock
+
+
+def _hold(path, started, seconds):
+    with file_lock(path):
+        started.set()
+        time.sleep(seconds)
+
+
+def test_lock_excludes_other_processes(tmp_path):
+    path = str(tmp_path / "sub" / "data.lock")
+    started = multiprocessing.Event()
+    holder = multiprocessing.Process(target=_hold, args=(path, started, 0.5))
+    holder.start()
+    assert started.wait(10)
+
+    start = time.monotonic()
+    with file_lock(path):
+        waited = time.monotonic() - start
+    holder.join()
+
+    assert waited > 0.2
+
+
+def test_lock_is_released_after_block(tmp_path):
+    path = str(tmp_path / "data.lock")
+    for _ in range(3):
+        with file_lock(path):
+            pass
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from benchmarks.generator import generate, generate_chunk, parse_mix, write
+
+COLUMNS = ["id", "timestamp", "source_ip", "user_agent", "response_time_ms", "signature_valid",
+           "attempts", "device_id", "geo", "is_attack"]
+
+
+def test_schema_matches_dataset():
+    df = generate_chunk(100, seed=1)
+
+    assert df.columns.tolist() == COLUMNS
+    assert df["id"].tolist() == list(range(1, 101))
+    assert pd.to_datetime(df["timestamp"]).is_monotonic_increasing
+
+
+def test_output_is_reproducible_whatever_the_chunk_size():
+    a = generate_chunk(50, seed=7)
+    b = generate_chunk(50, seed=7)
+    pd.testing.assert_frame_equal(a, b)
+
+    chunks = list(generate(2500, seed=7, chunk_size=1000))
+    assert [len(c) for c in chunks] == [1000, 1000, 500]
+    df = pd.concat(chunks, ignore_index=True)
+    assert df["id"].is_unique and df["id"].iloc[-1] == 2500
+    assert pd.to_datetime(df["timestamp"]).is_monotonic_increasing
+
+
+def test_attack_mix_proportions():
+    df = generate_chunk(20_000, seed=3, attack_mix={"bruteforce": 0.1, "scan": 0.05})
+
+    assert df["is_attack"].mean() == pytest.approx(0.15, abs=0.01)
+    assert generate_chunk(1000, seed=3, attack_mix={})["is_attack"].sum() == 0
+
+
+def test_parse_mix_validation():
+    assert parse_mix("bruteforce=0.05,scan=0.03") == {"bruteforce": 0.05, "scan": 0.03}
+    with pytest.raises(ValueError):
+        parse_mix("normal=0.1")
+    with pytest.raises(ValueError):
+        parse_mix("bruteforce=0.6,scan=0.5")
+
+
+def test_write_csv_in_chunks(tmp_path):
+    out = write(1500, str(tmp_path / "out" / "synthetic.csv"), seed=5, chunk_size=400)
+    df = pd.read_csv(out)
+
+    assert len(df) == 1500
+    assert df.columns.tolist() == COLUMNS
@@ -0,0 +1,75 @@
+import re
+
+import pytest
+
+from agents.metrics import LatencyHistogram, MetricsRegistry
+
+
+def test_small_values_are_exact():
+    hist = LatencyHistogram()
+    for us in range(1, 11):
+        hist.record(us)
+
+    assert hist.percentile(0.5) == 5
+    assert hist.percentile(1.0) == 10
+    assert hist.count == 10 and hist.sum_us == 55
+
+
+@pytest.mark.parametrize("us", [100, 1_234, 98_765, 5_000_000])
+def test_relative_error_is_bounded(us):
+    hist = LatencyHistogram(sub_bits=5)
+    hist.record(us)
+    hist.record(us * 2)
+
+    # Borne haute du bac : au plus ~1/16 au-dessus de la valeur (2^(sub_bits-1) sous-bacs par octave)
+    estimate = hist.percentile(0.5)
+    assert us <= estimate <= us * (1 + 1 / 16)
+
+
+def test_values_are_clamped():
+    hist = LatencyHistogram(max_us=1000)
+    hist.record(-5)
+    hist.record(10**9)
+
+    assert hist.percentile(0.0) == 0
+    assert hist.percentile(1.0) == 1000
+
+
+def test_empty_histogram():
+    assert LatencyHistogram().percentile(0.99) == 0
+
+
+def test_snapshot_and_counters():
+    registry = MetricsRegistry()
+    for ms in (1, 2, 3, 100):
+        registry.observe_ns("inference", ms * 1_000_000)
+    registry.inc("events_consumed", 3)
+
+    snapshot = registry.snapshot()
+    stage = snapshot["stages"]["inference"]
+    assert stage["count"] == 4
+    assert stage["max_ms"] == 100.0
+    assert stage["p50_ms"] == pytest.approx(2.0, rel=0.07)
+    assert snapshot["counters"] == {"events_consumed": 3}
+
+
+def test_prometheus_exposition():
+    registry = MetricsRegistry(prefix="test")
+    registry.observe_ns("verify", 2_000_000)
+    registry.inc("rate_limited_rejects")
+
+    text = registry.render_prometheus()
+    assert "# TYPE test_stage_latency_seconds summary" in text
+    assert re.search(r'^test_stage_latency_seconds\{stage="verify",quantile="0.99"\} 0\.00\d+$', text, re.M)
+    assert 'test_stage_latency_seconds_count{stage="verify"} 1' in text
+    assert "# TYPE test_rate_limited_rejects_total counter\ntest_rate_limited_rejects_total 1" in text
+    assert text.endswith("\n")
+
+
+def test_timer_records_even_on_error():
+    registry = MetricsRegistry()
+    with pytest.raises(ValueError):
+        with registry.timer("react"):
+            raise ValueError
+
+    assert registry.snapshot()["stages"]["react"]["count"] == 1
@@ -0,0 +1,109 @@
+import json
+import threading
+
+from agents.mfa_delivery import FileTransport, MFADelivery
+from agents.OPT_store import OTPStore
+
+
+class Registry:
+    def __init__(self, emails):
+        self.emails = emails
+
+    def emails_for(self, dids):
+        return {did: self.emails[did] for did in dids if did in self.emails}
+
+
+class FlakyTransport:
+    """Échoue pour les destinataires listés, mémorise les envois réussis"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def send(self, to_email, otp):
+        if to_email in self.failing:
+            raise ConnectionError("smtp indisponible")
+        with self._lock:
+            self.sent.append((to_email, otp))
+
+    def close(self):
+        self.closed = True
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_submit_delivers_through_file_transport(tmp_path):
+    outbox = tmp_path / "outbox.jsonl"
+    registry = Registry({f"did:{i}": f"user{i}@example.com" for i in range(20)})
+    delivery = MFADelivery(FileTransport(str(outbox)), registry=registry, workers=4)
+
+    assert delivery.submit([{"did": f"did:{i}"} for i in range(20)]) == 20
+    delivery.stop()
+
+    lines = [json.loads(line) for line in outbox.read_text().splitlines()]
+    assert sorted(line["to"] for line in lines) == sorted(f"user{i}@example.com" for i in range(20))
+    assert delivery.stats()["sent"] == 20
+    # OTP enregistré après l'envoi, à usage unique
+    first = lines[0]
+    assert OTPStore.verify(first["to"], first["otp"])
+    assert not OTPStore.verify(first["to"], first["otp"])
+
+
+def test_unknown_did_uses_fallback_or_is_skipped():
+    transport = FlakyTransport()
+    delivery = MFADelivery(transport, registry=Registry({}), workers=2)
+    assert delivery.submit([{"did": "did:unknown"}]) == 0
+    assert delivery.stats()["skipped"] == 1
+
+    delivery.fallback_to = "soc@example.com"
+    assert delivery.submit([{"did": "did:unknown"}]) == 1
+    delivery.stop()
+    assert [to for to, _ in transport.sent] == ["soc@example.com"]
+    assert transport.closed
+
+
+def test_cooldown_only_after_successful_send():
+    clock = Clock()
+    transport = FlakyTransport(failing={"down@example.com"})
+    registry = Registry({"did:ok": "ok@example.com", "did:down": "down@example.com"})
+    delivery = MFADelivery(transport, registry=registry, workers=2, cooldown=30, clock=clock)
+
+    delivery.submit([{"did": "did:ok"}, {"did": "did:down"}])
+    delivery.drain(timeout=5)
+    assert delivery.stats()["failed"] == 1
+
+    # Rafale : le destinataire servi est en fenêtre anti-rafale, celui en échec est retenté
+    assert delivery.submit([{"did": "did:ok"}, {"did": "did:down"}]) == 1
+    delivery.drain(timeout=5)
+
+    clock.now = 31
+    assert delivery.submit([{"did": "did:ok"}]) == 1
+    delivery.stop()
+    assert [to for to, _ in transport.sent] == ["ok@example.com", "ok@example.com"]
+    assert delivery.stats()["failed"] == 2
+
+
+def test_duplicates_in_one_batch_are_throttled():
+    transport = FlakyTransport()
+    delivery = MFADelivery(transport, registry=Registry({"did:a": "a@example.com"}), workers=2)
+
+    assert delivery.submit([{"did": "did:a"}] * 5) == 1
+    delivery.stop()
+    assert len(transport.sent) == 1
+    assert delivery.stats()["skipped"] == 4
+
+
+def test_otp_store_rejects_non_ascii_and_missing_codes():
+    OTPStore.save("x@example.com", "123456")
+    assert not OTPStore.verify("x@example.com", "12345é")
+    assert not OTPStore.verify("x@example.com", None)
+    assert not OTPStore.verify("nobody@example.com", "123456")
+    assert OTPStore.verify("x@example.com", 123456)
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents.monitor import MIN_ROWS_FOR_DRIFT, DriftMonitor, FeatureHistogram, ks, psi
+
+
+def training(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({
+        "response_time_ms": rng.gamma(2.0, 150.0, n),
+        "signature_valid": rng.integers(0, 2, n),
+    })
+    return X, rng.beta(1, 8, n)
+
+
+def test_histogram_counts_overflow_bins_and_skips_nan():
+    hist = FeatureHistogram([1.0, 2.0])
+    hist.update_many([0.5, 1.0, 1.5, 2.5, np.nan])
+
+    assert hist.counts.tolist() == [1, 2, 1]
+    assert hist.total == 4
+    np.testing.assert_allclose(hist.proportions(), [0.25, 0.5, 0.25])
+
+
+def test_psi_and_ks_are_zero_for_identical_distributions():
+    p = [0.2, 0.3, 0.5]
+
+    assert psi(p, p) == pytest.approx(0.0)
+    assert ks(p, p) == pytest.approx(0.0)
+    assert psi(p, [0.5, 0.3, 0.2]) > 0.2
+    assert ks(p, [0.5, 0.3, 0.2]) == pytest.approx(0.3)
+
+
+def test_baseline_uses_quantile_edges_and_binary_split():
+    X, scores = training()
+    baseline = DriftMonitor.build_baseline(X, scores={"attack_probability": scores})
+
+    assert len(baseline["edges"]["response_time_ms"]) == 9
+    assert baseline["edges"]["signature_valid"] == [0.5]
+    assert len(baseline["edges"]["attack_probability"]) == 19
+    np.testing.assert_allclose(sum(baseline["expected"]["response_time_ms"]), 1.0)
+
+
+def test_no_drift_on_training_distribution():
+    X, scores = training()
+    monitor = DriftMonitor(DriftMonitor.build_baseline(X, scores={"attack_probability": scores}))
+
+    live, live_scores = training(seed=1)
+    monitor.update_df(live.assign(attack_probability=live_scores))
+    snapshot = monitor.snapshot()
+
+    assert snapshot["rows"] == len(live)
+    assert not snapshot["drift_detected"]
+
+
+def test_shift_is_detected_once_enough_rows():
+    X, scores = training()
+    monitor = DriftMonitor(DriftMonitor.build_baseline(X, scores={"attack_probability": scores}))
+    shifted = X.assign(response_time_ms=X["response_time_ms"] * 3)
+
+    monitor.update_df(shifted.head(MIN_ROWS_FOR_DRIFT - 1))
+    assert not monitor.snapshot()["drift_detected"]
+
+    monitor.update_df(shifted)
+    snapshot = monitor.snapshot()
+    assert snapshot["drift_detected"]
+    assert snapshot["features"]["response_time_ms"]["drift"]
+    assert not snapshot["features"]["signature_valid"]["drift"]
+
+
+def test_tier_rates():
+    monitor = DriftMonitor()
+    monitor.record_tier("normal", 8)
+    monitor.record_tier("mfa")
+    monitor.record_tier("critique")
+
+    tiers = monitor.snapshot()["tiers"]
+    assert tiers["normal"] == {"count": 8, "rate": 0.8}
+    assert tiers["critique"]["rate"] == 0.1
@@ -0,0 +1,85 @@
+from agents.rate_limiter import AdaptiveTokenBucket, AuthRateLimiter, ALLOW, MFA, REJECT
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_escalates_allow_mfa_reject():
+    bucket = AdaptiveTokenBucket(rate=1.0, burst=10, mfa_fraction=0.3, clock=Clock())
+
+    decisions = [bucket.hit("ip") for _ in range(11)]
+
+    assert decisions[:7] == [ALLOW] * 7
+    assert decisions[7:10] == [MFA] * 3
+    assert decisions[10] == REJECT
+
+
+def test_bucket_refills_over_time():
+    clock = Clock()
+    bucket = AdaptiveTokenBucket(rate=1.0, burst=2, mfa_fraction=0.0, clock=clock)
+    bucket.hit("ip")
+    bucket.hit("ip")
+    assert bucket.hit("ip") == REJECT
+
+    clock.now += 60
+    assert bucket.hit("ip") == ALLOW
+
+
+def test_penalty_is_capped():
+    clock = Clock()
+    bucket = AdaptiveTokenBucket(rate=1.0, burst=1, max_penalty=3.0, clock=clock)
+    for _ in range(1000):
+        bucket.hit("ip")
+
+    assert bucket._state["ip"][2] == 3.0
+
+
+def test_did_bucket_takes_no_penalty_from_rotating_ips():
+    clock = Clock()
+    limiter = AuthRateLimiter(clock=clock)
+    owner = []
+    # 2 requêtes/s pendant une heure, chaque IP n'est vue qu'une fois
+    for i in range(7200):
+        clock.now += 0.5
+        limiter.check(f"10.0.{i // 250}.{i % 250}", "did:victim")
+        if i % 60 == 0:
+            owner.append(limiter.check("192.0.2.1", "did:victim"))
+
+    # Bucket DID vide : MFA forcée pour le propriétaire, jamais de rejet
+    assert REJECT not in owner
+    assert owner[-1] == MFA
+
+    assert limiter.by_did._state["did:victim"][2] == 0.0
+    # L'attaque s'arrête : le vrai propriétaire repasse en moins d'une minute
+    clock.now += 60
+    assert limiter.check("192.0.2.1", "did:victim") == ALLOW
+
+
+def test_ip_reject_does_not_drain_did_bucket():
+    clock = Clock()
+    limiter = AuthRateLimiter(ip_rate=0.0, ip_burst=1, clock=clock)
+    limiter.check("ip", "did")
+    for _ in range(50):
+        assert limiter.check("ip", "did") == REJECT
+
+    assert limiter.by_did._state["did"][0] == limiter.by_did.burst - 1
+
+
+def test_did_bucket_alone_never_rejects():
+    limiter = AuthRateLimiter(did_rate=0.0, did_burst=1, clock=Clock())
+
+    assert [limiter.check(f"10.0.0.{i}", "did") for i in range(3)] == [MFA, MFA, MFA]
+
+
+def test_lru_eviction_bounds_memory():
+    bucket = AdaptiveTokenBucket(rate=1.0, burst=5, max_keys=3, clock=Clock())
+    for key in "abcde":
+        bucket.hit(key)
+
+    assert len(bucket) == 3
+    assert list(bucket._state) == ["c", "d", "e"]
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from xgboost import XGBClassifier
+
+from agents.detector_XGBoost import DetectorXGB
+from agents.rebalance import STRATEGIES, class_weights, rebalance
+
+
+class SpyXGB(XGBClassifier):
+    """XGBClassifier qui mémorise les arguments de fit (niveau module : picklable)"""
+    fit_kwargs = {}
+
+    def fit(self, X, y, **kwargs):
+        SpyXGB.fit_kwargs = kwargs
+        return super().fit(X, y, **kwargs)
+
+
+def dataset(n=1000, positives=0.1, seed=0):
+    rng = np.random.default_rng(seed)
+    y = (rng.random(n) < positives).astype(int)
+    return pd.DataFrame({
+        "response_time_ms": rng.normal(100, 20, n) + 50 * y,
+        "attempts": rng.poisson(1 + 4 * y).astype("int64"),
+        "geo": "FR",
+        "is_attack": y,
+    })
+
+
+def test_class_weights_balance_total_mass():
+    y = np.array([0] * 90 + [1] * 10)
+    weights = class_weights(y)
+
+    assert weights[y == 0].sum() == pytest.approx(weights[y == 1].sum())
+    assert weights.sum() == pytest.approx(len(y))
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_strategies_keep_numeric_features_only(strategy):
+    if strategy == "smote":
+        pytest.importorskip("imblearn")
+    df = dataset()
+    X, y, fit_params = rebalance(df, strategy)
+
+    assert X.columns.tolist() == ["response_time_ms", "attempts"]
+    assert len(X) == len(y)
+    assert ("sample_weight" in fit_params) == (strategy == "weights")
+    counts = np.bincount(y, minlength=2)
+    if strategy in ("none", "weights"):
+        assert len(X) == len(df)
+    else:
+        # Classes équilibrées (ratio 1.0 par défaut)
+        assert counts[0] == counts[1]
+
+
+def test_undersample_keeps_all_minority_rows():
+    df = dataset()
+    X, y, _ = rebalance(df, "undersample", ratio=0.5)
+
+    assert (y == 1).sum() == df["is_attack"].sum()
+    assert (y == 0).sum() == 2 * df["is_attack"].sum()
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        rebalance(dataset(), "adasyn")
+
+
+def test_weights_strategy_reaches_xgboost_fit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data" / "processed").mkdir(parents=True)
+    path = tmp_path / "processed.csv"
+    dataset().to_csv(path, index=False)
+
+    monkeypatch.setattr(DetectorXGB, "build_model", lambda self: SpyXGB(n_estimators=5, max_depth=2))
+    detector = DetectorXGB(model_path=str(tmp_path / "model.pkl"), rebalance="weights", calibration=None,
+                           scaler_path=str(tmp_path / "scaler.pkl"))
+    detector.train(path=str(path))
+
+    weights = SpyXGB.fit_kwargs["sample_weight"]
+    assert len(weights) == 1000
+    assert weights.max() > weights.min()
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from agents.scaler import StreamingScaler
+
+
+def data(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.gamma(2.0, 150.0, n), rng.integers(1, 10, n)]).astype(float)
+
+
+def assert_matches(scaler, X):
+    reference = StandardScaler().fit(X)
+    assert scaler.n_samples == len(X)
+    np.testing.assert_allclose(scaler.mean, reference.mean_)
+    np.testing.assert_allclose(scaler.scale, reference.scale_)
+
+
+def test_partial_fit_batches_match_full_fit():
+    X = data(1000)
+    scaler = StreamingScaler()
+    for batch in np.array_split(X, 7):
+        scaler.partial_fit(batch)
+
+    assert_matches(scaler, X)
+
+
+def test_constant_column_scale_is_one():
+    X = np.column_stack([np.arange(10.0), np.full(10, 3.0)])
+    scaler = StreamingScaler().partial_fit(X)
+
+    assert scaler.scale[1] == 1.0
+    np.testing.assert_allclose(scaler.transform(X)[:, 1], 0.0)
+
+
+def test_update_source_absorbs_only_new_rows():
+    X = data(500)
+    scaler = StreamingScaler()
+    assert scaler.update_source("a.csv", X[:300])
+    version = scaler.version
+
+    # Relecture du même fichier : rien à absorber
+    assert not scaler.update_source("a.csv", X[:300])
+    assert scaler.version == version
+
+    # Fichier complété : seule la fin est fusionnée, chaque ligne comptée une fois
+    assert scaler.update_source("a.csv", X)
+    assert_matches(scaler, X)
+
+
+def test_update_source_recomputes_edited_prefix():
+    X = data(400)
+    scaler = StreamingScaler()
+    scaler.update_source("a.csv", X)
+
+    edited = X[100:].copy()
+    scaler.update_source("a.csv", edited)
+
+    assert_matches(scaler, edited)
+
+
+def test_sources_and_loose_batches_merge():
+    a, b, c = data(200, seed=1), data(300, seed=2), data(50, seed=3)
+    scaler = StreamingScaler()
+    scaler.update_source("a.csv", a)
+    scaler.update_source("b.csv", b)
+    scaler.partial_fit(c)
+
+    assert_matches(scaler, np.vstack([a, b, c]))
+
+
+def test_transform_round_trip_and_frame():
+    X = data(100)
+    scaler = StreamingScaler().partial_fit(X)
+
+    np.testing.assert_allclose(scaler.inverse_transform(scaler.transform(X)), X)
+    df = pd.DataFrame(X, columns=scaler.columns)
+    np.testing.assert_allclose(scaler.transform_frame(df).to_numpy(), StandardScaler().fit_transform(X))
+
+
+def test_from_sklearn_keeps_statistics():
+    X = data(250)
+    scaler = StreamingScaler.from_sklearn(StandardScaler().fit(X))
+
+    assert_matches(scaler, X)
+    # Puis mise à jour en flux à partir de ces statistiques
+    extra = data(50, seed=4)
+    scaler.partial_fit(extra)
+    assert_matches(scaler, np.vstack([X, extra]))